@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Effect switch latency benchmark
+
+Compares switching effects the old way (KILL, join, drain, new thread per effect)
+against handing the effect over to the runner's long-lived EffectThread.
+
+Two numbers are measured for each switch:
+ * call - how long the caller (the runner's main loop) is blocked by the switch
+ * start - time from asking for the switch to the new effect starting to render
+
+Usage: python benchmarks/effect_switch.py [switches] [delay ms]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import sys
+import time
+
+try:
+    # Py3
+    from queue import Queue
+except ImportError:
+    # Py2
+    from Queue import Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from octoprint_ws281x_led_status import constants  # noqa: E402
+from octoprint_ws281x_led_status.effects import error_handled_effect  # noqa: E402
+from octoprint_ws281x_led_status.framebuffer import FrameBuffer  # noqa: E402
+from octoprint_ws281x_led_status.runner import (  # noqa: E402
+    BrightnessManager,
+    EffectThread,
+)
+from octoprint_ws281x_led_status.util import start_daemon_thread  # noqa: E402
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+class NullStrip:
+    """Stands in for PixelStrip, so this can run off-Pi"""
+
+    def __init__(self, num=30):
+        self.num = num
+        self.brightness = 255
+
+    def numPixels(self):
+        return self.num
+
+    def setPixelColor(self, *args):
+        pass
+
+    def setPixelColorRGB(self, *args):
+        pass
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+
+    def getBrightness(self):
+        return self.brightness
+
+    def show(self):
+        pass
+
+
+def q_poll_milli_sleep(m_secs, queue):
+    """How effects used to wait: check the queue, then sleep blind"""
+    if not queue.empty():
+        return False
+    time.sleep(m_secs / 1000)
+    return True
+
+
+def polling_effect(strip, queue, started, delay, *args, **kwargs):
+    """An effect written for thread per effect, polls the queue between frames"""
+    started.append(timer())
+    while True:
+        for i in range(strip.numPixels()):
+            strip.setPixelColorRGB(i, 255, 0, 0)
+        strip.show()
+        if not q_poll_milli_sleep(delay, queue):
+            return
+
+
+def frame_effect(strip, started, delay, *args, **kwargs):
+    """The same effect written for the EffectThread's frame clock"""
+    started.append(timer())
+    while True:
+        for i in range(strip.numPixels()):
+            strip.setPixelColorRGB(i, 255, 0, 0)
+        yield delay
+
+
+class ThreadPerEffect:
+    """What EffectRunner.run_effect used to do"""
+
+    effect = staticmethod(polling_effect)
+
+    def __init__(self, strip, logger):
+        self.logger = logger
+        self.queue = Queue()
+        self.thread = None
+
+    def swap(self, target, kwargs, name):
+        if self.thread and self.thread.is_alive():
+            self.queue.put(constants.KILL_MSG)
+            self.thread.join()
+            while not self.queue.empty():
+                self.queue.get(False)
+        kwargs["queue"] = self.queue
+        self.thread = start_daemon_thread(
+            target=error_handled_effect,
+            kwargs={"target": target, "logger": self.logger, "effect_args": kwargs},
+            name=name,
+        )
+
+    def stop(self):
+        self.swap(lambda **kwargs: None, {}, "stop")
+        self.thread.join()
+
+
+class PersistentThread:
+    effect = staticmethod(frame_effect)
+
+    def __init__(self, strip, logger):
+        brightness_manager = BrightnessManager(
+            strip, 255, {"fade": {"enabled": False, "time": 100}}
+        )
+        self.effect_thread = EffectThread(strip, brightness_manager, logger)
+        self.frame_buffer = FrameBuffer(strip)
+
+    def swap(self, target, kwargs, name):
+        kwargs["strip"] = self.frame_buffer
+        self.effect_thread.swap(target, kwargs, name)
+
+    def stop(self):
+        self.effect_thread.stop()
+
+
+def run(runner, strip, switches, delay):
+    calls = []
+    starts = []
+    for _ in range(switches):
+        started = []
+        requested = timer()
+        runner.swap(
+            runner.effect,
+            {"strip": strip, "started": started, "delay": delay},
+            name="benchmark",
+        )
+        calls.append((timer() - requested) * 1000)
+        while not started:
+            time.sleep(0.0001)
+        starts.append((started[0] - requested) * 1000)
+        # Let the effect run for a couple of frames, like a real switch would
+        time.sleep(min(delay * 2.5, 100) / 1000)
+
+    runner.stop()
+    return summarise(calls), summarise(starts)
+
+
+def summarise(latencies):
+    latencies = sorted(latencies)
+    return {
+        "mean": sum(latencies) / len(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "max": latencies[-1],
+    }
+
+
+def main():
+    switches = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = int(sys.argv[2]) if len(sys.argv) > 2 else 10  # a typical fast effect
+    logger = logging.getLogger("benchmark")
+
+    print(
+        "Switching {} times between effects with a {}ms frame delay\n".format(
+            switches, delay
+        )
+    )
+    print(
+        "{:<28} {:>9} {:>9} {:>9} {:>9}".format(
+            "", "mean ms", "p50 ms", "p99 ms", "max ms"
+        )
+    )
+    strip = NullStrip()
+    for name, runner in (
+        ("thread per effect", ThreadPerEffect(strip, logger)),
+        ("persistent thread", PersistentThread(strip, logger)),
+    ):
+        results = run(runner, strip, switches, delay)
+        for measure, result in zip(("call", "start"), results):
+            print(
+                "{:<28} {mean:>9.3f} {p50:>9.3f} {p99:>9.3f} {max:>9.3f}".format(
+                    "{} ({})".format(name, measure), **result
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
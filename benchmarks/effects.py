@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Effect throughput benchmark
+
+Drives every effect in constants.EFFECTS & PROGRESS_EFFECTS against a VirtualStrip,
+the same way the runner does (render into a FrameBuffer over segment 1, commit, show),
+at several strip lengths & strip types. For each it reports:
+ * fps - frames rendered, committed & shown per second, with the virtual strip
+   simulating the time taken to send each frame down the wire. It is never shown
+   faster than this, so effects with a shorter delay (in ms) than `min delay` can't
+   keep up with it.
+ * CPU time per frame, which is what the effect & commit cost the Pi
+ * allocations per frame, from tracemalloc in a separate run without the wire time.
+   `peak` is the most memory allocated at once while rendering a frame, `retained`
+   is any that is left allocated after it (which should be 0).
+
+Animated effects are run with a delay of 0, progress effects are rendered at each
+progress value in turn. The runner skips showing frames identical to the last one,
+here every frame is shown.
+
+Python 3.9+, for tracemalloc.reset_peak().
+
+Usage: python benchmarks/effects.py [--seconds S] [--json FILE] [--effect NAME ...]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from octoprint_ws281x_led_status import constants, framebuffer  # noqa: E402
+from octoprint_ws281x_led_status._version import get_versions  # noqa: E402
+from octoprint_ws281x_led_status.runner import BrightnessManager  # noqa: E402
+from octoprint_ws281x_led_status.runner.backends import VirtualStrip  # noqa: E402
+from octoprint_ws281x_led_status.runner.segments import StripSegment  # noqa: E402
+
+
+STRIP_LENGTHS = [30, 300, 3000]
+# 24 & 32 bits per LED
+STRIP_TYPES = ["WS2811_STRIP_GRB", "SK6812_STRIP_RGBW"]
+# Frames rendered while tracing allocations
+TRACED_FRAMES = 50
+
+EFFECT_ARGS = {
+    "color": (255, 0, 0, 0),
+    "delay": 0,
+    "progress_color": (0, 255, 0, 0),
+    "base_color": (0, 0, 30, 0),
+    "reverse": False,
+}
+
+
+def frames(target, progress, strip_buffer, brightness_manager):
+    """
+    Generator rendering the effect's frames, forever
+    """
+    kwargs = dict(
+        EFFECT_ARGS, strip=strip_buffer, brightness_manager=brightness_manager
+    )
+    if progress:
+        while True:
+            for value in range(101):
+                target(value=value, **kwargs)
+                yield
+
+    while True:
+        effect_frames = target(**kwargs)
+        if not isinstance(effect_frames, types.GeneratorType):
+            # Static effect, renders a frame each time it is started
+            yield
+            continue
+
+        for _ in effect_frames:
+            yield
+
+
+def create_strip(num, strip_type, simulate_wire_time):
+    strip = VirtualStrip(
+        num, strip_type=strip_type, history=1, simulate_wire_time=simulate_wire_time
+    )
+    brightness_manager = BrightnessManager(
+        strip, 255, {"fade": {"enabled": False, "time": 750}}
+    )
+    strip_buffer = framebuffer.FrameBuffer(StripSegment(strip, 0, end=num))
+    return strip, strip_buffer, brightness_manager
+
+
+def step(effect_frames, strip, strip_buffer):
+    next(effect_frames)
+    strip_buffer.commit()
+    strip.show()
+
+
+def throughput(target, progress, num, strip_type, seconds):
+    """
+    :return: tuple (fps, CPU us per frame)
+    """
+    strip, strip_buffer, brightness_manager = create_strip(num, strip_type, True)
+    effect_frames = frames(target, progress, strip_buffer, brightness_manager)
+
+    count = 0
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    end = start + seconds
+    while True:
+        step(effect_frames, strip, strip_buffer)
+        count += 1
+        now = time.perf_counter()
+        if now >= end:
+            return (
+                count / (now - start),
+                (time.process_time() - cpu_start) * 1e6 / count,
+            )
+
+
+def allocations(target, progress, num, strip_type):
+    """
+    :return: tuple (peak, retained) bytes per frame
+    """
+    strip, strip_buffer, brightness_manager = create_strip(num, strip_type, False)
+    effect_frames = frames(target, progress, strip_buffer, brightness_manager)
+    # First frame creates the effect's state (eg. its palette indices)
+    step(effect_frames, strip, strip_buffer)
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        for _ in range(TRACED_FRAMES):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            step(effect_frames, strip, strip_buffer)
+            peak += tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+
+    return peak / TRACED_FRAMES, retained / TRACED_FRAMES
+
+
+def run(effects, seconds):
+    results = []
+    print(
+        "{:<16} {:>5} {:<18} {:>8} {:>10} {:>12} {:>10} {:>10}".format(
+            "effect",
+            "LEDs",
+            "strip type",
+            "fps",
+            "min delay",
+            "CPU us/frame",
+            "peak B",
+            "retained B",
+        )
+    )
+    for name, (target, progress) in effects.items():
+        for num in STRIP_LENGTHS:
+            for strip_type in STRIP_TYPES:
+                fps, cpu_us = throughput(target, progress, num, strip_type, seconds)
+                peak, retained = allocations(target, progress, num, strip_type)
+                result = {
+                    "effect": name,
+                    "progress": progress,
+                    "leds": num,
+                    "strip_type": strip_type,
+                    "fps": round(fps, 1),
+                    "min_delay_ms": round(1000 / fps, 2),
+                    "cpu_us_per_frame": round(cpu_us, 1),
+                    "peak_bytes_per_frame": round(peak),
+                    "retained_bytes_per_frame": round(retained, 1),
+                }
+                results.append(result)
+                print(
+                    "{effect:<16} {leds:>5} {strip_type:<18} {fps:>8.1f} "
+                    "{min_delay_ms:>10.2f} {cpu_us_per_frame:>12.1f} "
+                    "{peak_bytes_per_frame:>10} {retained_bytes_per_frame:>10.1f}".format(
+                        **result
+                    )
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Effect throughput benchmark")
+    parser.add_argument(
+        "--seconds", type=float, default=0.5, help="time to run each effect for"
+    )
+    parser.add_argument("--json", help="file to write the results to")
+    parser.add_argument(
+        "--effect", action="append", help="only run this effect, can be repeated"
+    )
+    args = parser.parse_args()
+
+    effects = {}
+    for name, target in constants.EFFECTS.items():
+        effects[name] = (target, False)
+    for name, target in constants.PROGRESS_EFFECTS.items():
+        effects[name] = (target, True)
+    if args.effect:
+        effects = {name: effects[name] for name in args.effect}
+
+    pixel_buffer = "numpy" if framebuffer.numpy is not None else "array"
+    print("Frame buffer backend: {}\n".format(pixel_buffer))
+    results = run(effects, args.seconds)
+
+    if args.json:
+        output = {
+            "version": get_versions()["version"],
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "pixel_buffer": pixel_buffer,
+            "seconds": args.seconds,
+            "results": results,
+        }
+        with io.open(args.json, "wt", encoding="utf-8") as f:
+            # Indented & sorted, so results from two versions diff line by line
+            f.write(json.dumps(output, indent=2, sort_keys=True))
+            f.write("\n")
+        print("\nResults written to {}".format(args.json))
+
+
+if __name__ == "__main__":
+    main()
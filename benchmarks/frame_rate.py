@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Effect frame rate benchmark
+
+Measures how many frames per second can be rendered & committed to the strip's LED
+buffer, rendering per pixel through PixelStrip (how effects used to work) against
+rendering into a FrameBuffer and committing it in one copy.
+
+show() is not included, it is limited by the time taken to send the data down the
+wire (about 30us per LED at 800kHz), not by Python.
+
+PixelStrip's C LED buffer only exists on a Pi once started, so here it is replaced by
+a ctypes array. All of PixelStrip's Python-side work per pixel is still measured.
+
+Usage: python benchmarks/frame_rate.py [seconds per run] [--no-numpy]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ctypes
+import math
+import os
+import sys
+import time
+
+if "--no-numpy" in sys.argv:
+    sys.argv.remove("--no-numpy")
+    # Force the array module fallback
+    sys.modules["numpy"] = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rpi_ws281x import PixelStrip  # noqa: E402
+
+from octoprint_ws281x_led_status import framebuffer  # noqa: E402
+from octoprint_ws281x_led_status.effects import progress, standard  # noqa: E402
+from octoprint_ws281x_led_status.util import blend_two_colors, wheel  # noqa: E402
+
+timer = getattr(time, "perf_counter", time.time)
+
+STRIP_LENGTHS = [30, 300, 3000]
+
+
+class BenchmarkStrip(PixelStrip):
+    """PixelStrip, with a ctypes array standing in for the LED buffer"""
+
+    def __init__(self, num):
+        PixelStrip.__init__(self, num=num, pin=18)
+        self.leds = (ctypes.c_uint32 * num)()
+
+    def _cleanup(self):
+        # Never started, so there is nothing for rpi_ws281x to clean up
+        pass
+
+    def __setitem__(self, pos, value):
+        self.leds[pos] = value
+
+    def setPixels(self, start, pixels):
+        # What FrameBuffer.commit() does with a started strip's LED buffer
+        ctypes.memmove(
+            ctypes.addressof(self.leds) + start * framebuffer.PIXEL_BYTES,
+            framebuffer.buffer_address(pixels),
+            len(pixels) * framebuffer.PIXEL_BYTES,
+        )
+
+
+class NullBrightnessManager:
+    max_brightness = 255
+
+    def reset_brightness(self):
+        pass
+
+    def set_brightness(self, value):
+        pass
+
+
+# How the effects used to render, one call per pixel
+
+
+def per_pixel_solid_color(strip, color, *args, **kwargs):
+    while True:
+        for p in range(strip.numPixels()):
+            strip.setPixelColorRGB(p, *color)
+        yield
+
+
+def per_pixel_rainbow_cycle(strip, *args, **kwargs):
+    while True:
+        for j in range(256):
+            for i in range(strip.numPixels()):
+                strip.setPixelColorRGB(
+                    i, *wheel((int(i * 256 / strip.numPixels()) + j) & 255)
+                )
+            yield
+
+
+def per_pixel_progress_bar(strip, progress_color, base_color, *args, **kwargs):
+    num_pixels = strip.numPixels()
+    while True:
+        for value in range(101):
+            upper_remainder, upper_whole = math.modf((value / 100) * num_pixels)
+            for i in range(int(upper_whole)):
+                strip.setPixelColorRGB(i, *progress_color)
+            pixel = int(upper_whole)
+            if upper_remainder > 0.0:
+                strip.setPixelColorRGB(
+                    pixel,
+                    *blend_two_colors(progress_color, base_color, upper_remainder)
+                )
+                pixel += 1
+            for i in range(pixel, num_pixels):
+                strip.setPixelColorRGB(i, *base_color)
+            yield
+
+
+def frame_buffer_solid_color(strip, color, brightness_manager, *args, **kwargs):
+    while True:
+        standard.solid_color(strip, color, brightness_manager)
+        yield
+
+
+def frame_buffer_progress_bar(
+    strip, brightness_manager, progress_color, base_color, *args, **kwargs
+):
+    while True:
+        for value in range(101):
+            progress.progress_bar(
+                strip, brightness_manager, value, progress_color, base_color, False
+            )
+            yield
+
+
+EFFECTS = [
+    ("Solid Color", per_pixel_solid_color, frame_buffer_solid_color),
+    ("Rainbow Cycle", per_pixel_rainbow_cycle, standard.rainbow_cycle),
+    ("Progress Bar", per_pixel_progress_bar, frame_buffer_progress_bar),
+]
+
+
+def frames_per_second(effect, strip, commit, seconds):
+    frames = effect(
+        strip=strip,
+        color=(255, 0, 0),
+        progress_color=(0, 255, 0),
+        base_color=(0, 0, 30),
+        delay=0,
+        brightness_manager=NullBrightnessManager(),
+    )
+    count = 0
+    start = timer()
+    end = start + seconds
+    while True:
+        next(frames)
+        commit()
+        count += 1
+        # Checking the time is cheap compared to a frame
+        now = timer()
+        if now >= end:
+            return count / (now - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    print(
+        "Frame buffer backend: {}\n".format(
+            "numpy" if framebuffer.numpy is not None else "array"
+        )
+    )
+    print(
+        "{:<16} {:>6} {:>14} {:>14} {:>9}".format(
+            "effect", "LEDs", "per pixel fps", "buffer fps", "speedup"
+        )
+    )
+    for name, per_pixel, buffered in EFFECTS:
+        for num in STRIP_LENGTHS:
+            strip = BenchmarkStrip(num)
+            frame_buffer = framebuffer.FrameBuffer(strip)
+
+            before = frames_per_second(per_pixel, strip, lambda: None, seconds)
+            after = frames_per_second(
+                buffered, frame_buffer, frame_buffer.commit, seconds
+            )
+            print(
+                "{:<16} {:>6} {:>14.1f} {:>14.1f} {:>8.1f}x".format(
+                    name, num, before, after, after / before
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+G-code trigger dispatch benchmark
+
+Pushes a synthetic G-code stream through the plugin's gcode queuing hook, with 0,
+10 & 500 custom gcode trigger rules configured (a mix of G/M code, exact line and
+regex rules, which mostly don't match, as in a real print). Regex rules mean every
+line has to be checked, so each count is also run without them, where lines that
+can't match any rule return straight away.
+
+The hook runs on OctoPrint's comm thread, and only queues lines that need looking
+at for the plugin's hook worker thread. The time taken by the hook (which holds up
+the serial link) and by the worker to match the queued lines are shown separately.
+
+The previous implementation, which scanned every rule for every line and had no
+way to skip lines, is measured on a sample of the stream for comparison. So is a
+hook that does nothing at all, which is the least any hook can cost.
+
+Usage: python benchmarks/gcode_triggers.py [lines]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from octoprint_ws281x_led_status import WS281xLedStatusPlugin  # noqa: E402
+from octoprint_ws281x_led_status.settings import SettingsSnapshot  # noqa: E402
+from octoprint_ws281x_led_status.triggers import Trigger  # noqa: E402
+
+timer = getattr(time, "perf_counter", time.time)
+
+RULE_COUNTS = [0, 10, 500]
+# Lines scanned by the old implementation, it is too slow for the full stream
+LINEAR_SAMPLE = 20000
+# Lines queued before the worker catches up, a real worker is rarely far behind
+BATCH = 100
+
+
+class NullQueue:
+    def put(self, msg):
+        pass
+
+
+class StubSettings:
+    def get(self, path):
+        return None
+
+    def get_boolean(self, path):
+        return True
+
+    def get_int(self, path):
+        return 0
+
+
+class LinearTrigger(Trigger):
+    """How Trigger.on_gcode_command used to work, scanning every rule"""
+
+    def compile_gcode_subscriptions(self):
+        Trigger.compile_gcode_subscriptions(self)
+        # Every line used to be checked
+        self.gcodes = None
+
+    def on_gcode_command(self, gcode, cmd):
+        for gcode_command in self.gcode_command_subscriptions:
+            if gcode_command["match"] == gcode:
+                self.effect_queue.put({"effect": gcode_command["effect"]})
+                break
+        for gcode_exact in self.gcode_exact_subscriptions:
+            if gcode_exact["match"] == cmd:
+                self.effect_queue.put({"effect": gcode_exact["effect"]})
+                break
+        for gcode_regex in self.gcode_regex_subscriptions:
+            if re.match(gcode_regex["match"], cmd):
+                self.effect_queue.put({"effect": gcode_regex["effect"]})
+                break
+
+
+def create_rules(count, regex=True):
+    match_types = ("gcode", "exact", "regex") if regex else ("gcode", "exact")
+    rules = []
+    for i in range(count):
+        match_type = match_types[i % len(match_types)]
+        if match_type == "gcode":
+            match = "M{}".format(800 + i)
+        elif match_type == "exact":
+            match = "M117 Layer {}".format(i)
+        else:
+            match = "M{}0 S\\d+".format(900 + i)
+        rules.append(
+            {
+                "match_type": match_type,
+                "match": match,
+                "effect": "Solid Color",
+                "color": "#ffffff",
+                "delay": 10,
+            }
+        )
+    return {"atcommand": [], "event": [], "gcode": rules}
+
+
+def create_stream(lines):
+    """Mostly moves, with the odd temperature, fan & display command"""
+    random.seed(0)
+    stream = []
+    for _ in range(lines):
+        choice = random.random()
+        if choice < 0.97:
+            line = "G1 X{:.3f} Y{:.3f} E{:.5f}".format(
+                random.uniform(0, 200), random.uniform(0, 200), random.random()
+            )
+        elif choice < 0.98:
+            line = "M104 S{}".format(random.randint(180, 230))
+        elif choice < 0.99:
+            line = "M106 S{}".format(random.randint(0, 255))
+        else:
+            line = "M117 Layer {}".format(random.randint(0, 300))
+        stream.append((line.split(" ")[0], line))
+    return stream
+
+
+def create_plugin(trigger_class, rules):
+    plugin = WS281xLedStatusPlugin()
+    plugin._settings = StubSettings()
+    plugin.settings_snapshot = SettingsSnapshot.from_settings(plugin._settings)
+    plugin.custom_triggers = trigger_class(NullQueue())
+    plugin.custom_triggers.process_settings(rules)
+    plugin.update_interesting_gcodes()
+    return plugin
+
+
+def empty_hook(*args, **kwargs):
+    pass
+
+
+def lines_per_second(hook, stream):
+    start = timer()
+    for gcode, line in stream:
+        hook(None, "queuing", line, None, gcode)
+    return len(stream) / (timer() - start)
+
+
+def ns_per_line(plugin, stream):
+    """
+    :return: tuple (hook, worker) ns/line
+    """
+    hook_time = worker_time = 0
+    for i in range(0, len(stream), BATCH):
+        hook_time += 1 / lines_per_second(plugin.process_gcode_q, stream[i : i + BATCH])
+
+        start = timer()
+        plugin.queue_hook_work(None)
+        plugin.run_hook_worker()
+        worker_time += timer() - start
+    return hook_time * BATCH * 1e9 / len(stream), worker_time * 1e9 / len(stream)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    stream = create_stream(lines)
+
+    print("{} lines of G-code through the queuing hook\n".format(lines))
+    empty = lines_per_second(empty_hook, stream)
+    print("Empty hook: {:.0f} lines/s, {:.0f} ns/line\n".format(empty, 1e9 / empty))
+
+    print("ns/line, for the comm thread hook & the hook worker thread")
+    print(
+        "{:>6} {:>6} {:>14} {:>14} {:>14} {:>14}".format(
+            "rules", "regex", "indexed hook", "worker", "linear hook", "worker"
+        )
+    )
+    for count in RULE_COUNTS:
+        for regex in (True, False) if count else (False,):
+            rules = create_rules(count, regex)
+            indexed = ns_per_line(create_plugin(Trigger, rules), stream)
+            linear = ns_per_line(
+                create_plugin(LinearTrigger, rules), stream[:LINEAR_SAMPLE]
+            )
+            print(
+                "{:>6} {:>6} {:>14.0f} {:>14.0f} {:>14.0f} {:>14.0f}".format(
+                    count, "yes" if regex else "no", *(indexed + linear)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Plugin to effect runner IPC benchmark
+
+Sends the plugin's messages (lights, progress, M150, standard, custom & a pickled
+reconfigure), stamped with the time they were sent as the plugin does, to a spawned
+process reading them the way the runner does, over a multiprocessing.Queue and the
+shared memory ipc.RingBufferQueue. For each it reports:
+ * latency - from put() in the plugin until get() returns in the runner, with messages
+   sent one at a time, p50/p99/max in us
+ * CPU time per message in the plugin (put & the Queue's feeder thread) and in the
+   runner (get & decoding), sending a burst of messages as fast as they are taken
+ * messages per second over the burst
+
+Python 3.8+, for multiprocessing.shared_memory.
+
+Usage: python benchmarks/ipc.py [message count]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from octoprint_ws281x_led_status import constants, ipc  # noqa: E402
+
+MESSAGES = [
+    constants.ON_MSG,
+    {"type": "progress", "effect": "progress_print", "value": 42},
+    {"type": "M150", "command": "M150 R255 U0 B0"},
+    {"type": "standard", "effect": "printing"},
+    {
+        "type": "custom",
+        "effect": "Solid Color",
+        "color": "#ff0000",
+        "delay": 10,
+        "trigger": "gcode match: M600",
+    },
+    {
+        "type": "reconfigure",
+        "state": {"type": "standard", "effect": "idle"},
+        "lights_on": True,
+        "debug": False,
+        "effects": {"idle": {"enabled": True, "color": "#00ff00", "delay": 10}},
+    },
+]
+PACED_INTERVAL = 0.002  # Seconds between messages sent one at a time
+
+
+def runner(queue, conn):
+    while True:
+        command = queue.get()
+        if command == constants.KILL_MSG:
+            return
+
+        lags = []
+        cpu_start = time.process_time()
+        for _ in range(command["count"]):
+            msg = queue.get()
+            lags.append(time.monotonic() - msg["sent"])
+        conn.send((lags, time.process_time() - cpu_start))
+
+
+def put(queue, msg):
+    while True:
+        try:
+            queue.put(dict(msg, sent=time.monotonic()))
+            return
+        except ipc.Full:
+            # Faster than the runner can keep up, wait for it like the plugin would
+            time.sleep(0.0001)
+
+
+def send(queue, conn, count, interval):
+    queue.put({"type": "benchmark", "count": count})
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for index in range(count):
+        put(queue, MESSAGES[index % len(MESSAGES)])
+        if interval:
+            time.sleep(interval)
+    lags, runner_cpu = conn.recv()
+    return (
+        time.perf_counter() - start,
+        time.process_time() - cpu_start,
+        runner_cpu,
+        sorted(lags),
+    )
+
+
+def measure(name, queue, context, count):
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=runner, args=(queue, sender))
+    process.start()
+
+    # Warm up, both processes have imported everything & the Queue's thread is started
+    send(queue, receiver, 100, 0)
+
+    lags = send(queue, receiver, min(count, 2000), PACED_INTERVAL)[3]
+    elapsed, plugin_cpu, runner_cpu, _ = send(queue, receiver, count, 0)
+
+    queue.put(constants.KILL_MSG)
+    process.join()
+
+    print(
+        "{:<16} {:>8.1f} {:>8.1f} {:>8.1f} {:>14.2f} {:>14.2f} {:>10.0f}".format(
+            name,
+            lags[len(lags) // 2] * 1e6,
+            lags[int(len(lags) * 0.99)] * 1e6,
+            lags[-1] * 1e6,
+            plugin_cpu * 1e6 / count,
+            runner_cpu * 1e6 / count,
+            count / elapsed,
+        )
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    context = multiprocessing.get_context("spawn")
+
+    print(
+        "Latency in us, CPU in us per message, {} messages\n".format(count)
+        + "{:<16} {:>8} {:>8} {:>8} {:>14} {:>14} {:>10}".format(
+            "queue", "p50", "p99", "max", "plugin CPU", "runner CPU", "msgs/s"
+        )
+    )
+    measure("mp.Queue", context.Queue(), context, count)
+    queue = ipc.RingBufferQueue(context)
+    try:
+        measure("RingBufferQueue", queue, context, count)
+    finally:
+        queue.close()
+
+    compact = sum(ipc.encode(dict(msg, sent=0.0))[4] != ipc.PICKLED for msg in MESSAGES)
+    print(
+        "\n{} of {} message types packed compactly, record bytes: {}".format(
+            compact,
+            len(MESSAGES),
+            ", ".join(
+                "{} {}".format(msg["type"], len(ipc.encode(dict(msg, sent=0.0))))
+                for msg in MESSAGES
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Effect runner process start benchmark
+
+Starts a process the way the plugin starts the effect runner, from a parent that has
+imported OctoPrint's server (& optionally some extra heap, to stand in for a running
+OctoPrint), with each of multiprocessing's start methods. For each it reports:
+ * start - time from Process.start() until the runner's modules are imported
+ * RSS & USS (memory used only by that process) once started
+ * the same after a garbage collection in the child. Collections touch every object
+   tracked by the GC, so a forked child's shared pages become private copies, which
+   is what happens to a forked runner over time as refcounts change.
+
+The child only imports the runner, it doesn't start a strip, so this can run off-Pi.
+The forkserver's own server process is not included. Linux only, memory is read from
+/proc/<pid>/smaps_rollup.
+
+Usage: python benchmarks/runner_start.py [MB of extra heap in the parent]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import gc
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import octoprint_ws281x_led_status_runner as runner_process  # noqa: E402
+
+timer = getattr(time, "perf_counter", time.time)
+
+START_METHODS = ["fork", "forkserver", "spawn"]
+
+
+def memory(pid):
+    """
+    :return: tuple (RSS, USS) in MB
+    """
+    values = {}
+    with open("/proc/{}/smaps_rollup".format(pid)) as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    uss = values["Private_Clean"] + values["Private_Dirty"]
+    return values["Rss"] / 1024, uss / 1024
+
+
+def child(conn):
+    runner_process.import_runner()
+    conn.send("started")
+    conn.recv()
+    gc.collect()
+    conn.send("collected")
+    conn.recv()
+
+
+def measure(method):
+    context = multiprocessing.get_context(method)
+    parent_conn, child_conn = context.Pipe()
+
+    start = timer()
+    process = context.Process(target=child, args=(child_conn,))
+    process.start()
+    parent_conn.recv()
+    start_time = timer() - start
+
+    started = memory(process.pid)
+    parent_conn.send("collect")
+    parent_conn.recv()
+    collected = memory(process.pid)
+    parent_conn.send("exit")
+    process.join()
+
+    return (start_time * 1000,) + started + collected
+
+
+def main():
+    extra_heap = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+
+    # Stand in for OctoPrint, which has imported its server & the plugin, and the
+    # runner too when it used to be forked
+    import octoprint.server  # noqa: F401
+
+    import octoprint_ws281x_led_status  # noqa: F401
+
+    runner_process.import_runner()
+    # Roughly 100 bytes per entry
+    heap = [{"value": i} for i in range(extra_heap * 10000)]  # noqa: F841
+
+    print("Parent RSS/USS: {:.1f}/{:.1f} MB\n".format(*memory(os.getpid())))
+    print(
+        "{:<12} {:>10} {:>10} {:>10} {:>14} {:>14}".format(
+            "method", "start ms", "RSS MB", "USS MB", "RSS after gc", "USS after gc"
+        )
+    )
+    for method in START_METHODS:
+        print(
+            "{:<12} {:>10.0f} {:>10.1f} {:>10.1f} {:>14.1f} {:>14.1f}".format(
+                method, *measure(method)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
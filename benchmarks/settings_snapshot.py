@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Settings snapshot benchmark
+
+Times the plugin's hot paths (heating progress from temperature reports, print
+progress & @ commands) reading settings from the SettingsSnapshot, against looking
+each one up through OctoPrint's layered settings every time as they used to.
+
+OctoPrint's settings are created in a temporary directory, with the plugin's defaults.
+
+Usage: python benchmarks/settings_snapshot.py [calls]
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from octoprint.plugin import PluginSettings  # noqa: E402
+from octoprint.settings import Settings  # noqa: E402
+
+from octoprint_ws281x_led_status import WS281xLedStatusPlugin, settings  # noqa: E402
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+class NullQueue:
+    def put(self, msg):
+        pass
+
+
+class StubPrinter:
+    def get_current_temperatures(self):
+        return {"tool0": {"target": 210}, "bed": {"target": 60}}
+
+    def is_printing(self):
+        return True
+
+
+class EnabledEffects:
+    def __init__(self, plugin_settings):
+        self._settings = plugin_settings
+
+    def __contains__(self, effect):
+        return self._settings.get(["effects", effect, "enabled"])
+
+
+class LiveSettings:
+    """Same attributes as SettingsSnapshot, looked up on every access"""
+
+    def __init__(self, plugin_settings):
+        self._settings = plugin_settings
+        self.enabled_effects = EnabledEffects(plugin_settings)
+
+    @property
+    def torch_toggle(self):
+        return self._settings.get_boolean(["effects", "torch", "toggle"])
+
+    @property
+    def idle_timeout(self):
+        return self._settings.get_int(["effects", "idle", "timeout"])
+
+    @property
+    def return_to_idle(self):
+        return self._settings.get_int(["effects", "success", "return_to_idle"])
+
+    @property
+    def tool_key(self):
+        return self._settings.get(["effects", "progress_heatup", "tool_key"])
+
+    @property
+    def cooling_heater(self):
+        return self._settings.get(["effects", "progress_cooling", "bed_or_tool"])
+
+    @property
+    def cooling_threshold(self):
+        return self._settings.get_int(["effects", "progress_cooling", "threshold"])
+
+    @property
+    def progress_temp_start(self):
+        return self._settings.get_int(["progress_temp_start"])
+
+    @property
+    def at_command_reaction(self):
+        return self._settings.get(["features", "at_command_reaction"])
+
+
+def create_plugin(plugin_settings, live):
+    plugin = WS281xLedStatusPlugin()
+    plugin._settings = plugin_settings
+    plugin._logger = logging.getLogger("benchmark")
+    plugin._printer = StubPrinter()
+    plugin.effect_queue = NullQueue()
+    plugin.settings_snapshot = settings.SettingsSnapshot.from_settings(plugin_settings)
+    if live:
+        plugin.settings_snapshot = LiveSettings(plugin_settings)
+
+    return plugin
+
+
+def hot_paths(plugin_settings, live):
+    heating = create_plugin(plugin_settings, live)
+    heating.heating = True
+    heating.current_heater_heating = "tool"
+    printing = create_plugin(plugin_settings, live)
+    return [
+        ("Heating progress", heating.process_temperatures, ({"T0": (150, 210)},)),
+        ("Print progress", printing.on_print_progress, ("local", "file.gcode", 50)),
+        ("@ command", printing.on_at_command, ("WS", "UNKNOWN")),
+    ]
+
+
+def us_per_call(function, args, calls):
+    start = timer()
+    for _ in range(calls):
+        function(*args)
+    return (timer() - start) * 1e6 / calls
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    basedir = tempfile.mkdtemp()
+    try:
+        plugin_settings = PluginSettings(
+            Settings(basedir=basedir), "ws281x_led_status", defaults=settings.defaults
+        )
+        snapshot = hot_paths(plugin_settings, live=False)
+        live = hot_paths(plugin_settings, live=True)
+
+        print("{} calls each, us/call\n".format(calls))
+        print(
+            "{:<18} {:>10} {:>10} {:>9}".format("", "settings", "snapshot", "speedup")
+        )
+        for (name, function, args), (_, live_function, _) in zip(snapshot, live):
+            before = us_per_call(live_function, args, calls)
+            after = us_per_call(function, args, calls)
+            print(
+                "{:<18} {:>10.2f} {:>10.2f} {:>8.1f}x".format(
+                    name, before, after, before / after
+                )
+            )
+    finally:
+        shutil.rmtree(basedir)
+
+
+if __name__ == "__main__":
+    main()
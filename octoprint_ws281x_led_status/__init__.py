@@ -7,9 +7,9 @@ __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the ter
 
 import io
 import logging
-import multiprocessing
 import os
 import re
+import threading
 import time
 
 # noinspection PyPackageRequirements
@@ -20,19 +20,24 @@ from octoprint.util.version import (
     is_python_compatible,
 )
 
+import octoprint_ws281x_led_status_runner as runner_process
 from octoprint_ws281x_led_status import (
     api,
     constants,
+    debug_ring,
+    ipc,
     settings,
+    throttle,
     triggers,
     util,
+    watchdog,
     wizard,
 )
 from octoprint_ws281x_led_status.constants import (
     AtCommands,
     DeprecatedAtCommands,
 )
-from octoprint_ws281x_led_status.runner import EffectRunner
+from octoprint_ws281x_led_status.effects import progress
 from octoprint_ws281x_led_status.util import RestartableTimer
 
 from ._version import get_versions
@@ -43,6 +48,15 @@ del get_versions
 
 PI_MODEL = None
 
+# Events with a standard effect, here not in constants so the runner doesn't import events
+SUPPORTED_EVENTS = {
+    Events.CONNECTED: "idle",
+    Events.DISCONNECTED: "disconnected",
+    Events.PRINT_FAILED: "failed",
+    Events.PRINT_DONE: "success",
+    Events.PRINT_PAUSED: "paused",
+}
+
 
 class WS281xLedStatusPlugin(
     octoprint.plugin.StartupPlugin,
@@ -63,8 +77,28 @@ class WS281xLedStatusPlugin(
         self.api = api.PluginApi(self)  # type: api.PluginApi
         self.wizard = wizard.PluginWizard(PI_MODEL)  # type: wizard.PluginWizard
 
-        self.current_effect_process = None  # type: multiprocessing.Process
-        self.effect_queue = multiprocessing.Queue()  # type: multiprocessing.Queue
+        # Started from runner_context, so a spawned process on Py3
+        self.current_effect_process = None
+        self.runner_context = runner_process.get_context()
+        # Recent events on the plugin's side, the runner keeps its own
+        self.debug_ring = debug_ring.DebugRing()  # type: debug_ring.DebugRing
+        self.effect_queue = throttle.ThrottledQueue(
+            ipc.create_queue(self.runner_context),
+            intervals=constants.MESSAGE_INTERVALS,
+            key=self.effect_message_key,
+            timestamp=True,
+            is_alive=self.is_runner_alive,
+            debug_ring=self.debug_ring,
+        )  # type: throttle.ThrottledQueue
+        # Latest stats sent by the runner, see EffectRunner.get_stats
+        self.runner_stats = None  # type: dict
+        # Monotonic time the runner last beat, see EffectRunner.beat
+        self.runner_heartbeat = self.runner_context.RawValue("d", 0.0)
+        # Held while starting or stopping the runner, so the watchdog doesn't too
+        self.runner_lock = threading.RLock()
+        self.runner_watchdog = watchdog.RunnerWatchdog(
+            self
+        )  # type: watchdog.RunnerWatchdog
 
         self.custom_triggers = triggers.Trigger(
             self.effect_queue
@@ -110,8 +144,27 @@ class WS281xLedStatusPlugin(
         )
         self.idle_timed_out = False
 
+        # Settings used in hot paths, see settings.SettingsSnapshot
+        self.settings_snapshot = None  # type: settings.SettingsSnapshot
+
+        # G/M codes process_gcode_q has to look at, None for every line
+        self.interesting_gcodes = frozenset()  # type: frozenset
+
+        # Work passed on by the hooks that run on OctoPrint's comm thread
+        self.hook_queue = util.SimpleQueue()
+        self.hook_worker = None
+
+        # Used to work out if a progress value would change the LEDs
+        self.segment_length = 0  # type: int
+        self.progress_frames = {}  # type: dict
+
     # Called when injections are complete
     def initialize(self):
+        self.settings_snapshot = settings.SettingsSnapshot.from_settings(self._settings)
+        self._logger.addHandler(
+            debug_ring.DumpOnErrorHandler(self.debug_ring, self._logger.info)
+        )
+
         if self._settings.get_boolean(["effects", "startup", "enabled"]):
             self.current_state["effect"] = "startup"
 
@@ -120,6 +173,8 @@ class WS281xLedStatusPlugin(
         else:
             self.lights_on = False
 
+        self.cache_progress_frames()
+
     # Asset plugin
     def get_assets(self):
         css_assets = ["css/ws281x_led_status.css"]
@@ -137,6 +192,10 @@ class WS281xLedStatusPlugin(
         self.custom_triggers.process_settings(
             self._settings.get(["custom"], merged=True)
         )
+        self.update_interesting_gcodes()
+        self.hook_worker = util.start_daemon_thread(
+            target=self.run_hook_worker, name="WS281x LED Status hook worker"
+        )
         util.start_daemon_thread(
             target=self.run_os_config_check,
             kwargs={"send_ui": False},
@@ -145,30 +204,36 @@ class WS281xLedStatusPlugin(
 
     def on_after_startup(self):
         self.start_effect_process()
+        self.runner_watchdog.start()
 
     # Shutdown plugin
     def on_shutdown(self):
-        self.stop_effect_process()
+        self.queue_hook_work(None)
+        self.runner_watchdog.stop()
+        with self.runner_lock:
+            self.stop_effect_process()
+        self.effect_queue.queue.close()
 
     # Settings plugin
     def on_settings_save(self, data):
+        previous_runner_settings = self.get_runner_settings()
+
         octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
 
+        self.settings_snapshot = settings.SettingsSnapshot.from_settings(self._settings)
+
         self.custom_triggers.process_settings(
             self._settings.get(["custom"], merged=True)
         )
+        self.update_interesting_gcodes()
 
-        self.torch_timer.interval = self._settings.get_int(
-            ["effects", "torch", "timer"]
-        )
-        self.return_timer.interval = self._settings.get_int(
-            ["effects", "success", "return_to_idle"]
-        )
-        self.idle_timer.interval = self._settings.get_int(
-            ["effects", "idle", "timeout"]
-        )
+        self.torch_timer.interval = self.settings_snapshot.torch_timer
+        self.return_timer.interval = self.settings_snapshot.return_to_idle
+        self.idle_timer.interval = self.settings_snapshot.idle_timeout
+
+        self.cache_progress_frames()
 
-        self.restart_strip()
+        self.apply_runner_settings(previous_runner_settings)
 
     def get_settings_defaults(self):
         return settings.defaults
@@ -257,8 +322,8 @@ class WS281xLedStatusPlugin(
                 }
             )
 
-        if event in constants.SUPPORTED_EVENTS.keys():
-            effect = constants.SUPPORTED_EVENTS[event]
+        if event in SUPPORTED_EVENTS.keys():
+            effect = SUPPORTED_EVENTS[event]
             self.update_effect({"type": "standard", "effect": effect})
             # Record the event's effect so that it can used when progress expires
             self.previous_event = effect
@@ -267,29 +332,20 @@ class WS281xLedStatusPlugin(
 
     # Progress plugin
     def on_print_progress(self, storage="", path="", progress=1):
+        enabled_effects = self.settings_snapshot.enabled_effects
         if (
             (
                 progress == 100
                 and self.current_state["type"] == "standard"
                 and self.current_state["effect"] == "success"
             )
-            or (
-                self.heating
-                and self._settings.get_boolean(
-                    ["effects", "progress_heatup", "enabled"]
-                )
-            )
-            or (
-                self.cooling
-                and self._settings.get_boolean(
-                    ["effects", "progress_cooling", "enabled"]
-                )
-            )
+            or (self.heating and "progress_heatup" in enabled_effects)
+            or (self.cooling and "progress_cooling" in enabled_effects)
         ):
             # Skip 100% if necessary, as success event usually comes before this
             return
 
-        if self._settings.get_boolean(["effects", "printing", "enabled"]):
+        if "printing" in enabled_effects:
             self.update_effect({"type": "standard", "effect": "printing"})
         else:
             self.update_effect(
@@ -309,29 +365,81 @@ class WS281xLedStatusPlugin(
         # Sanity check that I don't call this while it is alive
         if self.current_effect_process and not self.current_effect_process.is_alive():
             self.stop_effect_process()
+        if self.current_effect_process is not None:
+            # A runner that died or was terminated may have left messages queued, or
+            # even the queue's lock held, so each new runner gets a fresh queue
+            self.effect_queue.replace_queue(
+                ipc.create_queue(self.runner_context)
+            ).close()
+        # New runner starts from current_state, nothing has been sent to it yet
+        self.effect_queue.reset()
+        runner_settings = self.get_runner_settings()
+        stats_receiver, stats_sender = self.runner_context.Pipe(duplex=False)
         # Start effect runner here
-        self.current_effect_process = multiprocessing.Process(
-            target=EffectRunner,
+        self.current_effect_process = self.runner_context.Process(
+            target=runner_process.run,
             name="WS281x LED Status Effect Process",
             kwargs={
-                "debug": self._settings.get_boolean(["features", "debug_logging"]),
-                "queue": self.effect_queue,
-                "strip_settings": self._settings.get(["strip"], merged=True),
-                "effect_settings": self._settings.get(["effects"], merged=True),
-                "features_settings": self._settings.get(["features"], merged=True),
+                "debug": runner_settings["debug"],
+                "queue": self.effect_queue.queue,
+                "strip_settings": runner_settings["strip"],
+                "effect_settings": runner_settings["effects"],
+                "features_settings": runner_settings["features"],
                 "previous_state": self.current_state,
                 "log_path": self._settings.get_plugin_logfile_path(postfix="debug"),
                 "saved_lights_on": self.lights_on,
+                "stats_conn": stats_sender,
+                "heartbeat": self.runner_heartbeat,
             },
         )
         self.current_effect_process.daemon = True
+        self.runner_watchdog.runner_started(util.monotonic())
+        self.debug_ring.record("runner_started")
         self.current_effect_process.start()
+        # Only the runner sends, with this end closed the receiver sees when it exits
+        stats_sender.close()
+        self.runner_stats = None
+        util.start_daemon_thread(
+            target=self.receive_runner_stats,
+            args=(stats_receiver,),
+            name="WS281x LED Status runner stats",
+        )
         self._logger.info("WS281x LED Status runner started")
         if self.lights_on:
             self.effect_queue.put(constants.ON_MSG)
         else:
             self.effect_queue.put(constants.OFF_MSG)
 
+    def receive_runner_stats(self, conn):
+        """
+        Keep the latest stats sent by the runner, until it exits
+        :param conn: receiving end of the runner's stats pipe
+        """
+        try:
+            while True:
+                self.runner_stats = conn.recv()
+        except (EOFError, OSError, IOError):
+            pass
+        finally:
+            conn.close()
+
+    def is_runner_alive(self):
+        return bool(
+            self.current_effect_process and self.current_effect_process.is_alive()
+        )
+
+    def get_runner_status(self):
+        """
+        :return: (dict) whether the runner is running, counters of the plugin's side of
+            the effect queue & the latest stats from the runner
+        """
+        return {
+            "alive": self.is_runner_alive(),
+            "queue": self.effect_queue.stats(),
+            "stats": self.runner_stats,
+            "watchdog": self.runner_watchdog.status(util.monotonic()),
+        }
+
     def stop_effect_process(self):
         """
         Stop the runner
@@ -341,16 +449,82 @@ class WS281xLedStatusPlugin(
         if self.current_effect_process is not None:
             if self.current_effect_process.is_alive():
                 self.effect_queue.put("KILL")
-            self.current_effect_process.join()
+            self.current_effect_process.join(constants.RUNNER_STOP_TIMEOUT)
+            if self.current_effect_process.is_alive():
+                self._logger.warning(
+                    "WS281x LED Status runner did not stop within {} seconds, "
+                    "terminating it".format(constants.RUNNER_STOP_TIMEOUT)
+                )
+                self.current_effect_process.terminate()
+                self.current_effect_process.join(constants.RUNNER_STOP_TIMEOUT)
         self._logger.info("WS281x LED Status runner stopped")
 
+    def dump_debug_ring(self):
+        """
+        Write the plugin's debug ring to its log, and ask the runner to write its own
+        to the debug log
+        """
+        if not self.debug_ring.dump(self._logger.info, "requested"):
+            self._logger.info("Debug ring: no events since it was last written")
+        self.effect_queue.put({"type": "debug_ring"})
+
     def restart_strip(self):
         """
         Shortcut to restart the LED runner process.
         :return: None
         """
-        self.stop_effect_process()
-        self.start_effect_process()
+        with self.runner_lock:
+            self.stop_effect_process()
+            self.start_effect_process()
+
+    def get_runner_settings(self):
+        """
+        Settings the LED runner is started with, compared when settings are saved
+        :return: (dict) merged copies of the settings
+        """
+        return {
+            "debug": self._settings.get_boolean(["features", "debug_logging"]),
+            "strip": self._settings.get(["strip"], merged=True),
+            "effects": self._settings.get(["effects"], merged=True),
+            "features": self._settings.get(["features"], merged=True),
+        }
+
+    def apply_runner_settings(self, previous):
+        """
+        Apply changed settings to the LED runner. Most changes are sent to the runner to
+        apply in place, so the strip doesn't go dark or flicker. The process is only
+        restarted for changes to the strip's hardware setup.
+        :param previous: (dict) runner settings from before saving
+        :return: None
+        """
+        current = self.get_runner_settings()
+        if (
+            self.current_effect_process is None
+            or not self.current_effect_process.is_alive()
+            or any(
+                current["strip"][key] != previous["strip"][key]
+                for key in constants.STRIP_HARDWARE_SETTINGS
+            )
+            or any(
+                current["features"][key] != previous["features"][key]
+                for key in constants.SEGMENT_FEATURES
+            )
+        ):
+            self._logger.debug("Restarting the LED runner to apply settings")
+            self.restart_strip()
+            return
+
+        if current == previous:
+            return
+
+        self._logger.debug("Reconfiguring the LED runner")
+        msg = {
+            "type": "reconfigure",
+            "state": self.current_state,
+            "lights_on": self.lights_on,
+        }
+        msg.update(current)
+        self.effect_queue.put(msg)
 
     # OS Config test
     def run_os_config_check(self, send_ui=True):
@@ -418,8 +592,8 @@ class WS281xLedStatusPlugin(
     def activate_torch(self):
         self.torch_timer.stop()
 
-        toggle = self._settings.get_boolean(["effects", "torch", "toggle"])
-        torch_time = self._settings.get_int(["effects", "torch", "timer"])
+        toggle = self.settings_snapshot.torch_toggle
+        torch_time = self.settings_snapshot.torch_timer
 
         self.next_state = self.current_state
 
@@ -471,23 +645,22 @@ class WS281xLedStatusPlugin(
             self._send_custom_effect(mode)
 
     def _send_standard_effect(self, mode):
+        snapshot = self.settings_snapshot
+
         # Check the effect is enabled
-        if not self._settings.get(["effects", mode["effect"], "enabled"]):
+        if mode["effect"] not in snapshot.enabled_effects:
             return
 
         # Stop timers, new effects take priority over return to idle or idle timout
         if self.return_timer.is_alive():
-            self._logger.debug("Stopping return to idle timer, new effect")
+            self.debug_ring.record("timer_stopped", timer="return to idle")
             self.return_timer.stop()
         if self.idle_timer.is_alive():
-            self._logger.debug("Stopping idle timeout timer, new effect")
+            self.debug_ring.record("timer_stopped", timer="idle timeout")
             self.idle_timer.stop()
 
         # Start idle timeout
-        if (
-            mode["effect"] == "idle"
-            and self._settings.get_int(["effects", "idle", "timeout"]) > 0
-        ):
+        if mode["effect"] == "idle" and snapshot.idle_timeout > 0:
             self.idle_timer.start()
 
         elif self.idle_timed_out:
@@ -496,35 +669,70 @@ class WS281xLedStatusPlugin(
             self.idle_timed_out = False
 
         # Start return to idle timer
-        if (
-            mode["effect"] == "success"
-            and self._settings.get_int(["effects", "success", "return_to_idle"]) > 0
-        ):
+        if mode["effect"] == "success" and snapshot.return_to_idle > 0:
             self.return_timer.start()
 
         # Finally, start actually updating the effect
-        self._logger.debug("Updating effect to {}".format(mode))
+        self.debug_ring.record("update_effect", **debug_ring.message_fields(mode))
         self.effect_queue.put(mode)
         if mode["effect"] != "torch":
             self.set_state(mode)
 
     def _send_custom_effect(self, data):
-        self._logger.debug("Updating custom effect, parameters: {}".format(data))
-
         parameters = data["data"]
         parameters["type"] = "custom"
+        self.debug_ring.record("update_effect", **debug_ring.message_fields(parameters))
 
         self.set_state(parameters)
         self.effect_queue.put(parameters)
 
+    def cache_progress_frames(self):
+        """
+        Store what is needed to work out progress frames, see `effect_message_key`
+        """
+        strip_settings = self._settings.get(["strip"], merged=True)
+        color_correction = util.ColorCorrection(strip_settings)
+
+        # Same segment as the runner renders progress on
+        self.segment_length = int(strip_settings["count"])
+        if self._settings.get_boolean(["features", "sacrifice_pixel"]):
+            self.segment_length -= 1
+
+        self.progress_frames = {}
+        for mode in ["progress_print", "progress_heatup", "progress_cooling"]:
+            effect_settings = self._settings.get(["effects", mode], merged=True)
+            self.progress_frames[mode] = (
+                effect_settings["effect"],
+                color_correction.apply(*util.hex_to_rgb(effect_settings["color"])),
+                color_correction.apply(*util.hex_to_rgb(effect_settings["base"])),
+            )
+
+    def effect_message_key(self, msg):
+        """
+        Progress messages are compared by the frame they render, so that a new value
+        is only sent when it changes at least one pixel. Other messages as they are.
+        """
+        if msg["type"] != "progress" or msg["effect"] not in self.progress_frames:
+            return msg
+
+        effect, progress_color, base_color = self.progress_frames[msg["effect"]]
+        return (
+            "progress",
+            msg["effect"],
+            progress.frame_key(
+                effect, msg["value"], self.segment_length, progress_color, base_color
+            ),
+        )
+
     def set_state(self, new_state):
         self.previous_state = self.current_state
         self.current_state = new_state
 
     def calculate_heatup_progress(self, current, target):
         # Allows for setting a baseline, so heating display doesn't start halfway down the strip.
-        current = max(current - self._settings.get_int(["progress_temp_start"]), 0)
-        target = max(target - self._settings.get_int(["progress_temp_start"]), 0)
+        temp_start = self.settings_snapshot.progress_temp_start
+        current = max(current - temp_start, 0)
+        target = max(target - temp_start, 0)
 
         try:
             return round((current / target) * 100)
@@ -548,6 +756,43 @@ class WS281xLedStatusPlugin(
         self.switch_lights(False)
 
     # Hooks
+    # These run on OctoPrint's comm thread, so they only decide what needs doing and
+    # queue it, the hook worker thread then updates the effects. The serial link never
+    # waits for settings lookups, messages to the runner or saving settings.
+    def queue_hook_work(self, function, *args):
+        """
+        Run `function(*args)` on the hook worker thread, in the order queued
+        :param function: callable, or None to stop the worker
+        """
+        self.hook_queue.put((function, args))
+
+    def run_hook_worker(self):
+        while True:
+            function, args = self.hook_queue.get()
+            if function is None:
+                return
+
+            try:
+                function(*args)
+            except Exception:
+                self._logger.exception("Error handling work queued from a hook")
+
+    def update_interesting_gcodes(self):
+        """
+        Work out which G/M codes process_gcode_q needs to handle, so it can ignore
+        everything else (almost every line of a print) as cheaply as possible
+        """
+        trigger_gcodes = self.custom_triggers.gcodes
+        if trigger_gcodes is None:
+            # Custom regex triggers need to see every line
+            self.interesting_gcodes = None
+            return
+
+        gcodes = set(constants.BLOCKING_TEMP_GCODES.keys()) | trigger_gcodes
+        if self.settings_snapshot.intercept_m150:
+            gcodes.add("M150")
+        self.interesting_gcodes = frozenset(gcodes)
+
     def process_gcode_q(
         self,
         _comm_instance,
@@ -560,49 +805,66 @@ class WS281xLedStatusPlugin(
         *_args,
         **_kwargs
     ):
+        if (
+            self.interesting_gcodes is not None
+            and gcode not in self.interesting_gcodes
+            and not self.heating
+        ):
+            # Nothing to do for this line
+            return
+
+        # The heating flags are set here, not by the worker, so that the next line
+        # can't skip the check for the end of heating before the worker catches up
         if gcode in constants.BLOCKING_TEMP_GCODES.keys():
             # New M109 or M190, start tracking heating
             self.heating = True
             self.current_heater_heating = constants.BLOCKING_TEMP_GCODES[gcode]
 
-        elif gcode == "M150" and self._settings.get_boolean(
-            ["features", "intercept_m150"]
-        ):
+        elif gcode == "M150" and self.settings_snapshot.intercept_m150:
             # Update effect to M150 and suppress it
-            self.update_effect({"type": "M150", "command": cmd})
+            self.queue_hook_work(self.update_effect, {"type": "M150", "command": cmd})
             return (None,)
 
-        else:
-            if self.heating:
-                # Currently heating, now stopping - go back to last event
-                self.heating = False
-                if self._printer.is_printing():
-                    # If printing, go back to print progress immediately
-                    self.on_print_progress(progress=self.current_progress)
-                else:
-                    # Otherwise go back to the previous effect
-                    self.process_previous_event()
+        elif self.heating:
+            # Currently heating, now stopping - go back to last event
+            self.heating = False
+            self.queue_hook_work(self.heating_finished)
+
+        self.queue_hook_work(self.custom_triggers.on_gcode_command, gcode, cmd)
 
-        self.custom_triggers.on_gcode_command(gcode, cmd)
+    def heating_finished(self):
+        if self._printer.is_printing():
+            # If printing, go back to print progress immediately
+            self.on_print_progress(progress=self.current_progress)
+        else:
+            # Otherwise go back to the previous effect
+            self.process_previous_event()
 
     def temperatures_received(self, _comm, parsed_temps, *_args, **_kwargs):
         if not self.heating and not self.cooling:
             # Don't waste time if we're not doing anything
             return parsed_temps
 
+        # Copied, as OctoPrint carries on using parsed_temps
+        self.queue_hook_work(self.process_temperatures, dict(parsed_temps))
+        return parsed_temps
+
+    def process_temperatures(self, parsed_temps):
+        if not self.heating and not self.cooling:
+            # Finished since this was queued
+            return
+
         def abort():
             self.process_previous_event()
-            return parsed_temps
+
+        snapshot = self.settings_snapshot
+        current_temperatures = self._printer.get_current_temperatures()
 
         # Find the tool target temperature from OctoPrint
-        tool_target = self._printer.get_current_temperatures()[
-            "tool{}".format(
-                self._settings.get(["effects", "progress_heatup", "tool_key"])
-            )
-        ]["target"]
+        tool_target = current_temperatures["tool{}".format(snapshot.tool_key)]["target"]
 
         # Find the bed target temperature from OctoPrint
-        bed_target = self._printer.get_current_temperatures()["bed"]["target"]
+        bed_target = current_temperatures["bed"]["target"]
 
         if tool_target is not None and tool_target > 0:
             self.previous_target["tool"] = tool_target
@@ -613,9 +875,7 @@ class WS281xLedStatusPlugin(
         if self.heating:
             # Find out current temperature from parsed
             if self.current_heater_heating == "tool":
-                heater = "T{}".format(
-                    self._settings.get(["effects", "progress_heatup", "tool_key"])
-                )
+                heater = "T{}".format(snapshot.tool_key)
                 target = tool_target
             else:
                 heater = "B"
@@ -645,13 +905,8 @@ class WS281xLedStatusPlugin(
             )
 
         elif self.cooling:
-            if (
-                self._settings.get(["effects", "progress_cooling", "bed_or_tool"])
-                == "tool"
-            ):
-                heater = "T{}".format(
-                    self._settings.get(["effects", "progress_heatup", "tool_key"])
-                )
+            if snapshot.cooling_heater == "tool":
+                heater = "T{}".format(snapshot.tool_key)
                 target = self.previous_target["tool"]
             else:
                 heater = "B"
@@ -667,9 +922,7 @@ class WS281xLedStatusPlugin(
                 self.heating = False
                 return abort()
 
-            if current < self._settings.get_int(
-                ["effects", "progress_cooling", "threshold"]
-            ):
+            if current < snapshot.cooling_threshold:
                 self.cooling = False
                 return abort()
 
@@ -681,12 +934,13 @@ class WS281xLedStatusPlugin(
                 }
             )
 
-        return parsed_temps
-
     def process_at_command(
         self, _comm, _phase, cmd, params, _tags=None, *_args, **_kwargs
     ):
-        if not self._settings.get(["features", "at_command_reaction"]):
+        self.queue_hook_work(self.on_at_command, cmd, params)
+
+    def on_at_command(self, cmd, params):
+        if not self.settings_snapshot.at_command_reaction:
             return
 
         cmd = cmd.upper()
@@ -702,12 +956,11 @@ class WS281xLedStatusPlugin(
                 self.switch_lights(not self.lights_on)
             elif params in [AtCommands.TORCH, AtCommands.TORCH_ON]:
                 self.activate_torch()
-            elif params == AtCommands.TORCH_OFF and self._settings.get_boolean(
-                ["effects", "torch", "toggle"]
-            ):
+            elif params == AtCommands.TORCH_OFF and self.settings_snapshot.torch_toggle:
                 self.deactivate_torch()
-            elif params == AtCommands.TORCH_TOGGLE and self._settings.get_boolean(
-                ["effects", "torch", "toggle"]
+            elif (
+                params == AtCommands.TORCH_TOGGLE
+                and self.settings_snapshot.torch_toggle
             ):
                 if self.torch_on:
                     self.deactivate_torch()
@@ -729,8 +982,9 @@ class WS281xLedStatusPlugin(
             ]:
                 self.activate_torch()
                 self.deprecated_at_command(cmd)
-            elif cmd == DeprecatedAtCommands.TORCH_OFF and self._settings.get_boolean(
-                ["effects", "torch", "toggle"]
+            elif (
+                cmd == DeprecatedAtCommands.TORCH_OFF
+                and self.settings_snapshot.torch_toggle
             ):
                 self.deactivate_torch()
                 self.deprecated_at_command(cmd)
@@ -6,9 +6,9 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
 
 # noinspection PyPackageRequirements
-from flask import jsonify
+from flask import Response, jsonify
 
-from octoprint_ws281x_led_status import util
+from octoprint_ws281x_led_status import metrics, util
 
 # Define API commands
 CMD_LIGHTS_ON = "lights_on"
@@ -18,6 +18,8 @@ CMD_TORCH_ON = "torch_on"
 CMD_TORCH_OFF = "torch_off"
 CMD_TEST_OS = "test_os_config"
 CMD_TEST_LED = "test_led"
+CMD_LOG_FRAME_STATS = "log_frame_stats"
+CMD_DUMP_DEBUG_RING = "dump_debug_ring"
 WIZ_ADDUSER = "wiz_adduser"
 WIZ_ENABLE_SPI = "wiz_enable_spi"
 WIZ_INCREASE_BUFFER = "wiz_increase_buffer"
@@ -39,6 +41,8 @@ class PluginApi:
             CMD_TORCH_OFF: [],
             CMD_TEST_OS: [],
             CMD_TEST_LED: ["color"],
+            CMD_LOG_FRAME_STATS: [],
+            CMD_DUMP_DEBUG_RING: [],
             WIZ_ADDUSER: ["password"],
             WIZ_ENABLE_SPI: ["password"],
             WIZ_INCREASE_BUFFER: ["password"],
@@ -61,18 +65,33 @@ class PluginApi:
             self.start_os_config_test()
         elif command == CMD_TEST_LED:
             self.test_led(data)
+        elif command == CMD_LOG_FRAME_STATS:
+            self.plugin.effect_queue.put({"type": "frame_stats"})
+        elif command == CMD_DUMP_DEBUG_RING:
+            self.plugin.dump_debug_ring()
         elif command.startswith("wiz"):
             # Pass to wizard command handler
             return self.plugin.wizard.on_api_command(command, data)
 
-        return self.on_api_get()
+        return jsonify(self.get_state())
 
-    def on_api_get(self, **kwargs):
-        response = {
+    def on_api_get(self, request=None, **kwargs):
+        state = self.get_state()
+        runner = self.plugin.get_runner_status()
+        if request is not None and request.args.get("format") == "prometheus":
+            return Response(
+                metrics.prometheus_text(state, runner),
+                content_type=metrics.CONTENT_TYPE,
+            )
+
+        state["runner"] = runner
+        return jsonify(state)
+
+    def get_state(self):
+        return {
             "lights_on": self.plugin.lights_on,
             "torch_on": self.plugin.torch_on,
         }
-        return jsonify(response)
 
     def start_os_config_test(self):
         util.start_daemon_thread(
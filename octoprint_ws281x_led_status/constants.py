@@ -7,11 +7,6 @@ __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the ter
 
 import re
 
-import rpi_ws281x
-
-# noinspection PyPackageRequirements
-from octoprint.events import Events
-
 from octoprint_ws281x_led_status.effects import progress, standard
 
 # ~~ Documentation
@@ -67,32 +62,24 @@ class DeprecatedAtCommands:
     TORCH_OFF = "WS_TORCH_OFF"
 
 
-SUPPORTED_EVENTS = {
-    Events.CONNECTED: "idle",
-    Events.DISCONNECTED: "disconnected",
-    Events.PRINT_FAILED: "failed",
-    Events.PRINT_DONE: "success",
-    Events.PRINT_PAUSED: "paused",
-}
-
-
-STRIP_TYPES = {
-    "WS2811_STRIP_GRB": rpi_ws281x.WS2811_STRIP_GRB,
-    "WS2812_STRIP": rpi_ws281x.WS2812_STRIP,
-    "WS2811_STRIP_RGB": rpi_ws281x.WS2811_STRIP_RGB,
-    "WS2811_STRIP_RBG": rpi_ws281x.WS2811_STRIP_RBG,
-    "WS2811_STRIP_GBR": rpi_ws281x.WS2811_STRIP_GBR,
-    "WS2811_STRIP_BGR": rpi_ws281x.WS2811_STRIP_BGR,
-    "WS2811_STRIP_BRG": rpi_ws281x.WS2811_STRIP_BRG,
-    "SK6812_STRIP": rpi_ws281x.SK6812_STRIP,
-    "SK6812W_STRIP": rpi_ws281x.SK6812W_STRIP,
-    "SK6812_STRIP_RGBW": rpi_ws281x.SK6812_STRIP_RGBW,
-    "SK6812_STRIP_RBGW": rpi_ws281x.SK6812_STRIP_RBGW,
-    "SK6812_STRIP_GRBW": rpi_ws281x.SK6812_STRIP_GRBW,
-    "SK6812_STRIP_GBRW": rpi_ws281x.SK6812_STRIP_GBRW,
-    "SK6812_STRIP_BRGW": rpi_ws281x.SK6812_STRIP_BRGW,
-    "SK6812_STRIP_BGRW": rpi_ws281x.SK6812_STRIP_BGRW,
-}
+# Names of rpi_ws281x's strip type constants
+STRIP_TYPES = [
+    "WS2811_STRIP_GRB",
+    "WS2812_STRIP",
+    "WS2811_STRIP_RGB",
+    "WS2811_STRIP_RBG",
+    "WS2811_STRIP_GBR",
+    "WS2811_STRIP_BGR",
+    "WS2811_STRIP_BRG",
+    "SK6812_STRIP",
+    "SK6812W_STRIP",
+    "SK6812_STRIP_RGBW",
+    "SK6812_STRIP_RBGW",
+    "SK6812_STRIP_GRBW",
+    "SK6812_STRIP_GBRW",
+    "SK6812_STRIP_BRGW",
+    "SK6812_STRIP_BGRW",
+]
 EFFECTS = {
     "Solid Color": standard.solid_color,
     "Color Wipe": standard.color_wipe,
@@ -135,7 +122,62 @@ regex_b_param = re.compile(r"(^|[^A-Za-z])[Bb](?P<value>\d{1,3})")
 regex_w_param = re.compile(r"(^|[^A-Za-z])[Ww](?P<value>\d{1,3})")
 regex_p_param = re.compile(r"(^|[^A-Za-z])[Pp](?P<value>\d{1,3})")
 
+# Effect runner frame clock
+MAX_FPS = 100  # Global cap, no effect renders frames faster than this
+FADE_STEP_MS = 20  # Time between brightness steps of a fade
+FRAME_STATS_INTERVAL = 600  # Seconds between frame timing summaries in the debug log
+RUNNER_STATS_INTERVAL = 5  # Seconds between the runner sending stats to the plugin
+# Events kept in memory by the plugin & the runner, see debug_ring.DebugRing
+DEBUG_RING_SIZE = 500
+
+# Effect runner watchdog, see watchdog.RunnerWatchdog. Times in seconds
+RUNNER_WATCHDOG_INTERVAL = 5  # Between checks on the runner
+RUNNER_START_TIMEOUT = 60  # For a new runner's first heartbeat
+RUNNER_HEARTBEAT_TIMEOUT = 30  # Without a heartbeat before the runner is restarted
+RUNNER_STOP_TIMEOUT = 5  # For the runner to exit, before it is terminated
+# The first failure is restarted straight away. If it fails again in a row, the restart
+# waits RUNNER_RESTART_BACKOFF, doubling with each further failure up to the maximum
+RUNNER_RESTART_BACKOFF = 5
+RUNNER_RESTART_BACKOFF_MAX = 600
+RUNNER_STABLE_TIME = 60  # Running before a failure no longer counts as in a row
+
 # Queue message constants
+MESSAGE_INTERVALS = {
+    # Minimum seconds between messages of a type, see throttle.ThrottledQueue
+    "progress": 0.5,
+}
 ON_MSG = {"type": "lights", "action": "on"}
 OFF_MSG = {"type": "lights", "action": "off"}
 KILL_MSG = "KILL"
+# Never throttled, since they change the lights or ask the runner to log something
+UNTHROTTLED_MESSAGES = ["lights", "frame_stats", "debug_ring"]
+# Bytes of shared memory for queued messages, see ipc.RingBufferQueue
+IPC_QUEUE_SIZE = 64 * 1024
+# Messages queued, where there is no shared memory & a multiprocessing.Queue is used
+IPC_QUEUE_MAXSIZE = 1000
+# Seconds to wait for the queue's lock, before giving up on the queue
+IPC_LOCK_TIMEOUT = 1
+# Seconds between tries to send messages held back while the queue is full
+IPC_FULL_RETRY_INTERVAL = 0.1
+# Messages that replace the state shown, by the class a newer one supersedes them in
+STATE_MESSAGE_CLASSES = {
+    "standard": "state",
+    "progress": "state",
+    "custom": "custom",
+    "M150": "M150",
+}
+
+# Strip settings the runner can only apply by starting the strip again, changes to any
+# others are sent to the running runner in a reconfigure message
+STRIP_HARDWARE_SETTINGS = [
+    "backend",
+    "pin",
+    "dma",
+    "channel",
+    "freq_hz",
+    "type",
+    "count",
+    "invert",
+]
+# Features that change the strip's segments, which are also set up at start
+SEGMENT_FEATURES = ["sacrifice_pixel"]
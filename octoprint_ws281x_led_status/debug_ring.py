@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import collections
+import itertools
+import logging
+import threading
+import time
+
+from octoprint_ws281x_led_status import constants
+
+# Fields of a queue message worth recording, reconfigure messages carry all the settings
+MESSAGE_FIELDS = ("type", "effect", "value", "action", "command", "trigger")
+
+
+class DebugRing:
+    """
+    The last DEBUG_RING_SIZE events, kept in memory and only written to the log when
+    something goes wrong (see DumpOnErrorHandler) or it is asked for, so diagnostics
+    can be left on without writing every message to the SD card.
+
+    Recording is an append of a tuple to a bounded deque, so it is cheap enough for
+    the hot paths, and safe from any thread. Events are only formatted when dumped.
+    """
+
+    def __init__(self, size=constants.DEBUG_RING_SIZE):
+        self._events = collections.deque(maxlen=size)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dumped = 0  # Sequence number of the last event dumped
+
+    def record(self, event, **fields):
+        """
+        :param event: (str) what happened
+        :param fields: details, eg. the effect & timings
+        """
+        self._events.append((next(self._sequence), time.time(), event, fields))
+
+    def dump(self, log, reason):
+        """
+        Write the events recorded since the last dump as one log message
+        :param log: logging function, eg. logger.info
+        :param reason: (str) why the ring is being dumped
+        :return: (int) number of events dumped
+        """
+        with self._lock:
+            events = [event for event in list(self._events) if event[0] > self._dumped]
+            if not events:
+                return 0
+
+            lost = events[0][0] - self._dumped - 1
+            self._dumped = events[-1][0]
+
+        lines = [
+            "Debug ring, {}: {} events{}".format(
+                reason,
+                len(events),
+                " ({} older were overwritten)".format(lost) if lost else "",
+            )
+        ]
+        lines.extend(format_event(*event[1:]) for event in events)
+        log("\n".join(lines))
+        return len(events)
+
+
+def format_event(timestamp, event, fields):
+    return "  {}.{:03d} {}{}".format(
+        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)),
+        int(timestamp % 1 * 1000),
+        event,
+        "".join(
+            " {}={}".format(
+                key, "{:.2f}".format(value) if isinstance(value, float) else value
+            )
+            for key, value in fields.items()
+        ),
+    )
+
+
+def message_fields(msg):
+    """
+    :param msg: queue message, or constants.KILL_MSG
+    :return: (dict) the fields of the message to record
+    """
+    if not isinstance(msg, dict):
+        return {"type": msg}
+    return {key: msg[key] for key in MESSAGE_FIELDS if key in msg}
+
+
+class DumpOnErrorHandler(logging.Handler):
+    """
+    Dumps a DebugRing when an error is logged, so the events leading up to it are in
+    the log too
+    """
+
+    def __init__(self, ring, log):
+        logging.Handler.__init__(self, level=logging.ERROR)
+        self.ring = ring
+        self.log = log
+
+    def emit(self, record):
+        self.ring.dump(self.log, "error logged")
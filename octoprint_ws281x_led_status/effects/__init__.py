@@ -1,11 +1,41 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import types
+
 
 def error_handled_effect(target, logger, effect_args):
+    """
+    Start an effect. Static effects render their frame here, animated effects return
+    a generator of frames to be stepped through with `error_handled_frame`.
+    :return: generator of frame delays, or None if there are no more frames
+    """
+    try:
+        frames = target(**effect_args)
+    except Exception as e:
+        log_effect_error(logger, effect_args, e)
+        return None
+
+    if isinstance(frames, types.GeneratorType):
+        return frames
+    return None
+
+
+def error_handled_frame(frames, logger, effect_args):
+    """
+    Render the next frame of an animated effect
+    :return: delay in ms until the next frame, or None if the effect has finished
+    """
     try:
-        target(**effect_args)
+        return next(frames)
+    except StopIteration:
+        return None
     except Exception as e:
-        logger.error("Error running effect")
-        logger.error("Args: {}".format(effect_args))
-        logger.exception(e)
+        log_effect_error(logger, effect_args, e)
+        return None
+
+
+def log_effect_error(logger, effect_args, e):
+    logger.error("Error running effect")
+    logger.error("Args: {}".format(effect_args))
+    logger.exception(e)
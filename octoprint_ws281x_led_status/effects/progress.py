@@ -7,12 +7,36 @@ __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the ter
 
 import math
 
-from octoprint_ws281x_led_status.util import blend_two_colors, q_poll_sleep
+from octoprint_ws281x_led_status.util import blend_two_colors
+
+
+def fill_progress(strip, start, end, value, progress_color, base_color, reverse=False):
+    """
+    Render a progress bar between pixels `start` and `end`, with the partially
+    complete pixel blended between the two colours
+    """
+    num_pixels = end - start
+    upper_remainder, upper_whole = math.modf((value / 100) * num_pixels)
+    upper_whole = int(upper_whole)
+    tween = 1 if upper_remainder > 0.0 else 0
+
+    if reverse:
+        strip.fill(progress_color, end - upper_whole, end)
+        tween_pixel = end - upper_whole - 1
+        strip.fill(base_color, start, end - upper_whole - tween)
+    else:
+        strip.fill(progress_color, start, start + upper_whole)
+        tween_pixel = start + upper_whole
+        strip.fill(base_color, start + upper_whole + tween, end)
+
+    if tween:
+        strip.setPixelColorRGB(
+            tween_pixel, *blend_two_colors(progress_color, base_color, upper_remainder)
+        )
 
 
 def progress_bar(
     strip,
-    queue,
     brightness_manager,
     value,
     progress_color,
@@ -22,70 +46,33 @@ def progress_bar(
     **kwargs
 ):
     brightness_manager.reset_brightness()
-    num_pixels = strip.numPixels()
-    upper_bar = (value / 100) * num_pixels
-    upper_remainder, upper_whole = math.modf(upper_bar)
-    pixels_remaining = num_pixels
-
-    for i in range(int(upper_whole)):
-        pixel = ((num_pixels - 1) - i) if reverse else i
-        strip.setPixelColorRGB(pixel, *progress_color)
-        pixels_remaining -= 1
-
-    if upper_remainder > 0.0:
-        tween_color = blend_two_colors(progress_color, base_color, upper_remainder)
-        pixel = ((num_pixels - int(upper_whole)) - 1) if reverse else int(upper_whole)
-        strip.setPixelColorRGB(pixel, *tween_color)
-        pixels_remaining -= 1
-
-    for i in range(pixels_remaining):
-        pixel = (
-            ((pixels_remaining - 1) - i)
-            if reverse
-            else ((num_pixels - pixels_remaining) + i)
-        )
-        strip.setPixelColorRGB(pixel, *base_color)
-
-    strip.show()
-    if not q_poll_sleep(0.1, queue):
-        return
+    fill_progress(
+        strip, 0, strip.numPixels(), value, progress_color, base_color, reverse
+    )
 
 
 def gradient(
-    strip, queue, value, brightness_manager, progress_color, base_color, *args, **kwargs
+    strip, value, brightness_manager, progress_color, base_color, *args, **kwargs
 ):
     brightness_manager.reset_brightness()
 
-    color = blend_two_colors(progress_color, base_color, float(value) / 100)
-
-    for i in range(strip.numPixels()):
-        strip.setPixelColorRGB(i, *color)
-
-    strip.show()
-    if not q_poll_sleep(0.1, queue):
-        return
+    strip.fill(blend_two_colors(progress_color, base_color, float(value) / 100))
 
 
 def single_pixel(
-    strip, queue, brightness_manager, value, progress_color, base_color, *args, **kwargs
+    strip, brightness_manager, value, progress_color, base_color, *args, **kwargs
 ):
     brightness_manager.reset_brightness()
 
     # Calculate which pixel needs to be lit
     pixel_number = int(round(float(value) / 100 * strip.numPixels(), 0))
 
-    for i in range(strip.numPixels()):
-        strip.setPixelColorRGB(i, *base_color)
-
+    strip.fill(base_color)
     strip.setPixelColorRGB(pixel_number, *progress_color)
 
-    strip.show()
-    if not q_poll_sleep(0.1, queue):
-        return
-
 
 def both_ends(
-    strip, queue, brightness_manager, value, progress_color, base_color, *args, **kwargs
+    strip, brightness_manager, value, progress_color, base_color, *args, **kwargs
 ):
     brightness_manager.reset_brightness()
     num_pixels = strip.numPixels()
@@ -94,38 +81,60 @@ def both_ends(
         # Set the unused pixel to off
         strip.setPixelColorRGB(num_pixels, 0, 0, 0)
 
-    def progress(min_pixel, max_pixel, val, reverse):
-        number_pixels = max_pixel - min_pixel
-        upper_bar = (val / 100) * number_pixels
-        upper_remainder, upper_whole = math.modf(upper_bar)
-        pixels_remaining = number_pixels
-
-        for i in range(int(upper_whole)):
-            pixel = ((max_pixel - 1) - i) if reverse else i
-            strip.setPixelColorRGB(pixel, *progress_color)
-            pixels_remaining -= 1
-
-        if upper_remainder > 0.0:
-            tween_color = blend_two_colors(progress_color, base_color, upper_remainder)
-            pixel = (
-                ((max_pixel - int(upper_whole)) - 1) if reverse else int(upper_whole)
-            )
-            strip.setPixelColorRGB(pixel, *tween_color)
-            pixels_remaining -= 1
-
-        for i in range(pixels_remaining):
-            pixel = (
-                ((min_pixel + pixels_remaining - 1) - i)
-                if reverse
-                else ((number_pixels - pixels_remaining) + i)
-            )
-            strip.setPixelColorRGB(pixel, *base_color)
-
     # Set the progress to either end of the strip
+    fill_progress(strip, 0, num_pixels // 2, value, progress_color, base_color)
+    fill_progress(
+        strip, num_pixels // 2, num_pixels, value, progress_color, base_color, True
+    )
+
+
+def progress_bar_key(value, num_pixels, progress_color, base_color):
+    upper_remainder, upper_whole = math.modf((value / 100) * num_pixels)
+    if upper_remainder > 0.0:
+        return (
+            int(upper_whole),
+            blend_two_colors(progress_color, base_color, upper_remainder),
+        )
+    return int(upper_whole), None
+
+
+def gradient_key(value, num_pixels, progress_color, base_color):
+    return blend_two_colors(progress_color, base_color, float(value) / 100)
+
+
+def single_pixel_key(value, num_pixels, progress_color, base_color):
+    return int(round(float(value) / 100 * num_pixels, 0))
+
+
+def both_ends_key(value, num_pixels, progress_color, base_color):
+    # Both halves are the same length, so they always render the same bar
+    return progress_bar_key(value, num_pixels // 2, progress_color, base_color)
+
+
+# Keyed the same as constants.PROGRESS_EFFECTS
+FRAME_KEYS = {
+    "Progress Bar": progress_bar_key,
+    "Gradient": gradient_key,
+    "Single Pixel": single_pixel_key,
+    "Both Ends": both_ends_key,
+}
+
 
-    progress(0, num_pixels // 2, value, False)
-    progress(num_pixels // 2, num_pixels, value, True)
+def frame_key(effect, value, num_pixels, progress_color, base_color):
+    """
+    Identify the frame a progress effect renders, without rendering it. Two values
+    with the same key produce exactly the same pixels, eg. 41% and 42% on a 24 LED
+    single pixel effect, so only a change of key needs to reach the runner.
 
-    strip.show()
-    if not q_poll_sleep(0.1, queue):
-        return
+    Must be kept in step with the effects above.
+    :param effect: (str) name of the effect, from constants.PROGRESS_EFFECTS
+    :param value: progress, 0-100
+    :param num_pixels: (int) length of the segment the effect is rendered on
+    :param progress_color: colour correction applied (r, g, b, w)
+    :param base_color: colour correction applied (r, g, b, w)
+    :return: hashable key
+    """
+    value = min(max(int(value), 0), 100)  # As the runner does
+    if effect not in FRAME_KEYS:
+        return value
+    return FRAME_KEYS[effect](value, num_pixels, progress_color, base_color)
@@ -9,74 +9,54 @@ import math
 import random
 import time
 
-from octoprint_ws281x_led_status.util import q_poll_milli_sleep, wheel
+from octoprint_ws281x_led_status.framebuffer import WHEEL, new_indices
+from octoprint_ws281x_led_status.util import wheel
 
 DIRECTIONS = [
     "forward",
     "backward",
 ]  # Used for effects that go 'out and back' kind of thing
 
+# Effects are run by the runner's EffectThread, which owns the frame clock.
+# Animated effects are generators: render a frame into the strip, then yield the
+# delay in ms until the next frame is due. The thread calls show(), effects never do.
+# Static effects are plain functions that render a single frame.
+# `strip` is a FrameBuffer, prefer its whole-frame operations to a loop over pixels.
 
-def solid_color(
-    strip, queue, color, brightness_manager, wait=True, show=True, *args, **kwargs
-):
+
+def solid_color(strip, color, brightness_manager, *args, **kwargs):
     brightness_manager.reset_brightness()
     # Set pixels to a solid color
-    for p in range(strip.numPixels()):
-        strip.setPixelColorRGB(p, *color)
-    if show:
-        strip.show()
-
-    while wait:
-        if not q_poll_milli_sleep(100, queue):
-            return
+    strip.fill(color)
 
 
-def color_wipe(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def color_wipe(strip, color, delay, brightness_manager, *args, **kwargs):
     while True:
         brightness_manager.reset_brightness()
         for i in range(strip.numPixels()):
             strip.setPixelColorRGB(i, *color)
-            strip.show()
-            if not q_poll_milli_sleep(delay, queue):
-                return
+            yield delay
         for i in range(strip.numPixels()):
             strip.setPixelColorRGB(i, 0, 0, 0)
-            strip.show()
-            if not q_poll_milli_sleep(delay, queue):
-                return
-
+            yield delay
 
-def color_wipe_2(strip, queue, color, delay, brightness_manager, *args, **kwargs):
-    def set_pixel(pixel, pixel_color):
-        strip.setPixelColorRGB(pixel, *pixel_color)
-        strip.show()
 
+def color_wipe_2(strip, color, delay, brightness_manager, *args, **kwargs):
     brightness_manager.reset_brightness()
     while True:
         for i in range(strip.numPixels()):
-            set_pixel(i, color)
-            if not q_poll_milli_sleep(delay, queue):
-                return
+            strip.setPixelColorRGB(i, *color)
+            yield delay
         for i in reversed(range(strip.numPixels())):
-            set_pixel(i, (0, 0, 0))
-            if not q_poll_milli_sleep(delay, queue):
-                return
+            strip.setPixelColorRGB(i, 0, 0, 0)
+            yield delay
 
 
-def simple_pulse(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def simple_pulse(strip, color, delay, brightness_manager, *args, **kwargs):
     max_brightness = brightness_manager.max_brightness
-    solid_color(
-        strip=strip,
-        queue=queue,
-        color=color,
-        brightness_manager=brightness_manager,
-        wait=False,
-    )
+    strip.fill(color)
 
     while True:
-        brightness_manager.set_brightness(1)
-
         for direction in DIRECTIONS:
             for b in (
                 range(max_brightness)
@@ -84,40 +64,29 @@ def simple_pulse(strip, queue, color, delay, brightness_manager, *args, **kwargs
                 else reversed(range(max_brightness))
             ):
                 brightness_manager.set_brightness(b)
-
-                if not q_poll_milli_sleep(delay, queue):
-                    return
+                yield delay
 
 
-def rainbow(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def rainbow(strip, color, delay, brightness_manager, *args, **kwargs):
     while True:
+        brightness_manager.reset_brightness()
         for i in range(256):
-            solid_color(
-                strip=strip,
-                queue=queue,
-                color=wheel(i),
-                delay=delay,
-                wait=False,
-                brightness_manager=brightness_manager,
-            )
-            if not q_poll_milli_sleep(delay, queue):
-                return
+            strip.fill(wheel(i))
+            yield delay
 
 
-def rainbow_cycle(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def rainbow_cycle(strip, color, delay, brightness_manager, *args, **kwargs):
+    num_pixels = strip.numPixels()
+    # Position of each pixel on the colour wheel, the wheel is rotated every frame
+    positions = new_indices([int(i * 256 / num_pixels) for i in range(num_pixels)])
     while True:
         brightness_manager.reset_brightness()
         for j in range(256):
-            for i in range(strip.numPixels()):
-                strip.setPixelColorRGB(
-                    i, *wheel((int(i * 256 / strip.numPixels()) + j) & 255)
-                )
-            strip.show()
-            if not q_poll_milli_sleep(delay, queue):
-                return
+            strip.setPixelsFromPalette(WHEEL, positions, j)
+            yield delay
 
 
-def solo_bounce(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def solo_bounce(strip, color, delay, brightness_manager, *args, **kwargs):
     while True:
         brightness_manager.reset_brightness()
         for direction in DIRECTIONS:
@@ -126,21 +95,12 @@ def solo_bounce(strip, queue, color, delay, brightness_manager, *args, **kwargs)
                 if direction == "forward"
                 else reversed(range(strip.numPixels()))
             ):
-                solid_color(
-                    strip=strip,
-                    queue=queue,
-                    color=(0, 0, 0),
-                    brightness_manager=brightness_manager,
-                    wait=False,
-                    show=False,
-                )
+                strip.fill((0, 0, 0))
                 strip.setPixelColorRGB(i, *color)
-                strip.show()
-                if not q_poll_milli_sleep(delay, queue):
-                    return
+                yield delay
 
 
-def bounce(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def bounce(strip, color, delay, brightness_manager, *args, **kwargs):
     while True:
         brightness_manager.reset_brightness()
         red, green, blue, white = color
@@ -151,14 +111,7 @@ def bounce(strip, queue, color, delay, brightness_manager, *args, **kwargs):
                 if direction == "forward"
                 else range((strip.numPixels() - size - 2), 0, -1)
             ):
-                solid_color(
-                    strip=strip,
-                    queue=queue,
-                    color=(0, 0, 0),
-                    brightness_manager=brightness_manager,
-                    wait=False,
-                    show=False,
-                )
+                strip.fill((0, 0, 0))
                 strip.setPixelColorRGB(
                     i,
                     *(
@@ -168,8 +121,7 @@ def bounce(strip, queue, color, delay, brightness_manager, *args, **kwargs):
                         int(math.floor(white / 10)),
                     )
                 )
-                for j in range(1, (size + 1)):
-                    strip.setPixelColorRGB(i + j, *(red, green, blue))
+                strip.fill((red, green, blue), i + 1, i + size + 1)
                 strip.setPixelColorRGB(
                     i + size + 1,
                     *(
@@ -179,45 +131,32 @@ def bounce(strip, queue, color, delay, brightness_manager, *args, **kwargs):
                         int(math.floor(white / 10)),
                     )
                 )
-                strip.show()
-                if not q_poll_milli_sleep(delay, queue):
-                    return
+                yield delay
 
 
-def random_single(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def random_single(strip, color, delay, brightness_manager, *args, **kwargs):
+    brightness_manager.reset_brightness()
+    strip.setPixelsFromPalette(
+        WHEEL, new_indices([random.randint(0, 255) for _ in range(strip.numPixels())])
+    )
+    yield delay
+
     while True:
-        brightness_manager.reset_brightness()
-        for p in range(strip.numPixels()):
-            strip.setPixelColorRGB(p, *wheel(random.randint(0, 255)))
-        strip.show()
-        while True:
-            strip.setPixelColorRGB(
-                random.randint(0, strip.numPixels()), *wheel(random.randint(0, 255))
-            )
-            strip.show()
-            if not q_poll_milli_sleep(delay, queue):
-                return
+        strip.setPixelColorRGB(
+            random.randint(0, strip.numPixels()), *wheel(random.randint(0, 255))
+        )
+        yield delay
 
 
-def blink(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def blink(strip, color, delay, brightness_manager, *args, **kwargs):
     while True:
+        brightness_manager.reset_brightness()
         for direction in DIRECTIONS:
-            solid_color(
-                strip=strip,
-                queue=queue,
-                color=color if direction == "forward" else (0, 0, 0),
-                brightness_manager=brightness_manager,
-                wait=False,
-            )
-            for _ms in range(int(delay) // 2):
-                if not q_poll_milli_sleep(2, queue):
-                    # We do it this way so we can check the q more often, as for blink
-                    # delay may be high. Otherwise the effect may end up blocking the
-                    # server, when settings are saved, or it shuts down.
-                    return
+            strip.fill(color if direction == "forward" else (0, 0, 0))
+            yield delay
 
 
-def crossover(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def crossover(strip, color, delay, brightness_manager, *args, **kwargs):
     while True:
         brightness_manager.reset_brightness()
         num_pixels = strip.numPixels()
@@ -226,24 +165,15 @@ def crossover(strip, queue, color, delay, brightness_manager, *args, **kwargs):
             num_pixels -= 1
 
         for i in range(num_pixels):
-            solid_color(
-                strip=strip,
-                queue=queue,
-                color=(0, 0, 0),
-                brightness_manager=brightness_manager,
-                wait=False,
-                show=False,
-            )
+            strip.fill((0, 0, 0))
             strip.setPixelColorRGB(i, *color)
             strip.setPixelColorRGB(num_pixels - 1 - i, *color)
-            strip.show()
-            if not q_poll_milli_sleep(delay, queue):
-                return
+            yield delay
 
 
 # Credit to https://www.tweaking4all.com/hardware/arduino/adruino-led-strip-effects/#LEDStripEffectBouncingBalls
 # Translated from c++ to Python by me
-def bouncy_balls(strip, queue, color, delay, brightness_manager, *args, **kwargs):
+def bouncy_balls(strip, color, delay, brightness_manager, *args, **kwargs):
     brightness_manager.reset_brightness()
     ball_count = 2
     gravity = -9.81
@@ -285,14 +215,11 @@ def bouncy_balls(strip, queue, color, delay, brightness_manager, *args, **kwargs
 
             position[i] = int(round(height[i] * (strip.numPixels() - 1) / start_height))
 
-        for p in range(strip.numPixels()):
-            # Set to blank
-            strip.setPixelColorRGB(p, 0, 0, 0)
+        # Set to blank
+        strip.fill((0, 0, 0))
 
         for i in range(ball_count):
             # Light pixels that should be lit
             strip.setPixelColorRGB(position[i], *color)
 
-        strip.show()
-        if not q_poll_milli_sleep(delay, queue):
-            return
+        yield delay
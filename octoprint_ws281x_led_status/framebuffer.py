@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import ctypes
+from array import array
+from operator import itemgetter
+
+try:
+    # Optional, whole-frame operations are done in C when available
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    # Only available where rpi_ws281x is installed
+    import _rpi_ws281x as ws
+except ImportError:
+    ws = None
+
+from octoprint_ws281x_led_status.util import wheel
+
+# Pixels are stored the same way rpi_ws281x stores them, one 0xWWRRGGBB uint32 each
+PIXEL_BYTES = 4
+_TYPECODE = "I" if array(str("I")).itemsize == PIXEL_BYTES else "L"
+
+
+def pack(red, green, blue, white=0):
+    """Pack a colour into the 32 bit value used by rpi_ws281x"""
+    return (white << 24) | (red << 16) | (green << 8) | blue
+
+
+def unpack(value):
+    """
+    :return tuple r, g, b, w from 0-255
+    """
+    return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF, (value >> 24) & 0xFF
+
+
+def new_pixels(values):
+    """
+    Create a pixel buffer
+    :param values: sequence of packed colours
+    :return: numpy.ndarray if numpy is available, array.array otherwise
+    """
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.uint32)
+    return array(str(_TYPECODE), values)
+
+
+def filled_pixels(value, count):
+    """
+    Create a pixel buffer with every pixel set to the same packed colour
+    """
+    if numpy is not None:
+        return numpy.full(count, value, dtype=numpy.uint32)
+    return array(str(_TYPECODE), [value]) * count
+
+
+def as_pixels(values):
+    """
+    Get a pixel buffer that can be copied from, only converting `values` if necessary
+    :param values: pixel buffer, or any sequence of packed colours
+    """
+    if numpy is not None:
+        return numpy.ascontiguousarray(values, dtype=numpy.uint32)
+    if isinstance(values, array) and values.typecode == _TYPECODE:
+        return values
+    return new_pixels(values)
+
+
+def new_indices(values):
+    """
+    Create an index buffer, for use with `FrameBuffer.setPixelsFromPalette`
+    """
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.intp)
+    return tuple(values)
+
+
+def palette(colors):
+    """
+    Create a palette of 256 colours, for use with `FrameBuffer.setPixelsFromPalette`
+    :param colors: sequence of 256 (r, g, b) or (r, g, b, w) tuples
+    """
+    return new_pixels([pack(*color) for color in colors])
+
+
+WHEEL = palette([wheel(pos) for pos in range(256)])
+
+
+def buffer_address(pixels):
+    if numpy is not None and isinstance(pixels, numpy.ndarray):
+        return pixels.ctypes.data
+    return pixels.buffer_info()[0]
+
+
+def led_memory(strip):
+    """
+    Find the address of a started PixelStrip's LED buffer, so frames can be copied
+    into it in one go instead of a call into the library per pixel.
+    :return: (int) address, or None if it is not available
+    """
+    led_address = getattr(strip, "led_address", None)
+    if led_address is not None:
+        # VirtualStrip, see runner.backends
+        return led_address()
+
+    if ws is None:
+        return None
+
+    try:
+        leds = ws.ws2811_channel_t_leds_get(strip._channel)
+    except Exception:
+        # Not a PixelStrip, or it has been cleaned up
+        return None
+
+    if leds is None:
+        # Not started yet
+        return None
+    return int(leds)
+
+
+class FrameBuffer:
+    """
+    Pixel buffer that effects render frames into. It has the same interface as
+    PixelStrip for single pixels, and some whole-frame operations which are done in C
+    (using numpy if available, the array module otherwise) instead of per pixel.
+
+    `commit()` copies the frame into the strip it was created for in one go, or through
+    the strip's own `setPixels` if it has one. It is called by the EffectThread
+    before show(), effects should not call it.
+
+    Like rpi_ws281x, writes to pixels past the end of the buffer are ignored.
+    """
+
+    def __init__(self, strip, start=0, num=None):
+        """
+        :param strip: PixelStrip or StripSegment to commit frames to
+        :param start: (int) first pixel of the strip this buffer covers
+        :param num: (int) number of pixels, defaults to the rest of the strip
+        """
+        self.strip = strip
+        self.start = start
+        self.num_pixels = num if num is not None else strip.numPixels() - start
+        self.pixels = new_pixels([0] * self.num_pixels)
+
+    def numPixels(self):
+        return self.num_pixels
+
+    def setPixelColor(self, index, color):
+        if index < self.num_pixels:
+            self.pixels[index] = color
+
+    def setPixelColorRGB(self, index, red, green, blue, white=0):
+        if index < self.num_pixels:
+            self.pixels[index] = pack(red, green, blue, white)
+
+    def getPixelColor(self, index):
+        return int(self.pixels[index])
+
+    def getPixelColorRGBW(self, index):
+        return unpack(int(self.pixels[index]))
+
+    def fill(self, color, start=0, end=None):
+        """
+        Set a range of pixels (default all) to one colour
+        :param color: tuple (r, g, b) or (r, g, b, w)
+        """
+        end = self.num_pixels if end is None else min(end, self.num_pixels)
+        if end <= start:
+            return
+
+        value = pack(*color)
+        if numpy is not None:
+            self.pixels[start:end] = value
+        else:
+            self.pixels[start:end] = filled_pixels(value, end - start)
+
+    def setPixels(self, start, values):
+        """
+        Set consecutive pixels from packed colours
+        :param start: (int) first pixel to set
+        :param values: pixel buffer, see `new_pixels`
+        """
+        end = min(start + len(values), self.num_pixels)
+        self.pixels[start:end] = values[: end - start]
+
+    def setPixelsFromPalette(self, colors, indices, shift=0):
+        """
+        Set every pixel to a palette colour, `pixel[i] = colors[(indices[i] + shift) & 255]`
+        :param colors: 256 colour palette, see `palette`
+        :param indices: palette position per pixel, see `new_indices`
+        :param shift: (int) rotates the palette
+        """
+        if numpy is not None:
+            self.pixels[:] = colors[(indices + shift) & 255]
+            return
+
+        shift &= 255
+        rotated = colors[shift:] + colors[:shift]
+        if len(indices) == 1:
+            self.pixels[0] = rotated[indices[0]]
+        else:
+            self.pixels[:] = array(str(_TYPECODE), itemgetter(*indices)(rotated))
+
+    def fingerprint(self):
+        """
+        Snapshot of the frame, equal for two frames with the same pixels
+        :return: (bytes)
+        """
+        if numpy is None and not hasattr(self.pixels, "tobytes"):
+            # Py2 array
+            return self.pixels.tostring()
+        return self.pixels.tobytes()
+
+    def commit(self):
+        """
+        Copy the frame into the strip, without showing it
+        """
+        address = led_memory(self.strip)
+        if address is not None:
+            ctypes.memmove(
+                address + self.start * PIXEL_BYTES,
+                buffer_address(self.pixels),
+                self.num_pixels * PIXEL_BYTES,
+            )
+        elif hasattr(self.strip, "setPixels"):
+            self.strip.setPixels(self.start, self.pixels)
+        else:
+            for index, value in enumerate(self.pixels):
+                self.strip.setPixelColor(self.start + index, int(value))
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import pickle
+import struct
+
+try:
+    # Py3
+    from queue import Empty, Full
+except ImportError:
+    # Py2
+    from Queue import Empty, Full
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Py < 3.8
+    shared_memory = None
+
+import octoprint_ws281x_led_status_runner as runner_process
+from octoprint_ws281x_led_status import constants
+
+# Ring buffer header: total bytes ever written & read. Both only increase, their
+# difference is what is queued and each modulo the capacity is where it is in the ring
+HEADER = struct.Struct(str("<QQ"))
+# Each message is a record of payload length, message code & the time it was sent
+RECORD = struct.Struct(str("<IBd"))
+STRING_LENGTH = struct.Struct(str("<H"))
+INTEGER = struct.Struct(str("<q"))
+
+# Message codes
+KILL = 0
+PICKLED = 0x7F  # Anything without a compact format, eg. reconfigure
+SENT_FLAG = 0x80  # Set on the code when the record has the time the message was sent
+
+# Messages with a compact format, type: (code, fields in the order they are packed)
+MESSAGE_FORMATS = {
+    "lights": (1, (("action", str),)),
+    "progress": (2, (("effect", str), ("value", int))),
+    "M150": (3, (("command", str),)),
+    "standard": (4, (("effect", str),)),
+    "custom": (
+        5,
+        (("effect", str), ("color", str), ("delay", int), ("trigger", str)),
+    ),
+}
+MESSAGE_TYPES = {
+    code: (msg_type, fields) for msg_type, (code, fields) in MESSAGE_FORMATS.items()
+}
+
+
+def pack_fields(msg, fields):
+    parts = []
+    for key, kind in fields:
+        if kind is str:
+            value = msg[key].encode("utf-8")
+            parts.append(STRING_LENGTH.pack(len(value)))
+            parts.append(value)
+        else:
+            parts.append(INTEGER.pack(msg[key]))
+    return b"".join(parts)
+
+
+def unpack_fields(payload, fields):
+    values = {}
+    offset = 0
+    for key, kind in fields:
+        if kind is str:
+            (length,) = STRING_LENGTH.unpack_from(payload, offset)
+            offset += STRING_LENGTH.size
+            values[key] = payload[offset : offset + length].decode("utf-8")
+            offset += length
+        else:
+            (values[key],) = INTEGER.unpack_from(payload, offset)
+            offset += INTEGER.size
+    return values
+
+
+def encode(msg):
+    """
+    Pack a message into a record. Messages are packed in a compact format when they
+    have exactly the fields of one in MESSAGE_FORMATS, of exactly the right types, so
+    they are the same once decoded. Anything else is pickled.
+    :param msg: (dict) message, or constants.KILL_MSG
+    :return: (bytes) record, see decode
+    """
+    if msg == constants.KILL_MSG:
+        return RECORD.pack(0, KILL, 0.0)
+
+    msg_format = sent = None
+    if isinstance(msg, dict):
+        msg_format = MESSAGE_FORMATS.get(msg.get("type"))
+        sent = msg.get("sent")
+        if type(sent) is not float:
+            sent = None
+
+    if msg_format is not None:
+        code, fields = msg_format
+        if len(msg) == len(fields) + (2 if sent is not None else 1) and all(
+            type(msg.get(key)) is kind for key, kind in fields
+        ):
+            try:
+                payload = pack_fields(msg, fields)
+            except struct.error:
+                # Out of range, a string too long or an integer too big
+                pass
+            else:
+                if sent is not None:
+                    return RECORD.pack(len(payload), code | SENT_FLAG, sent) + payload
+                return RECORD.pack(len(payload), code, 0.0) + payload
+
+    payload = pickle.dumps(msg, pickle.HIGHEST_PROTOCOL)
+    return RECORD.pack(len(payload), PICKLED, 0.0) + payload
+
+
+def decode(code, sent, payload):
+    """
+    :param code: (int) message code from the record
+    :param sent: (float) time sent from the record
+    :param payload: (bytes) the record's payload
+    :return: the message, as it was encoded
+    """
+    if code == KILL:
+        return constants.KILL_MSG
+
+    if code == PICKLED:
+        return pickle.loads(payload)
+
+    msg_type, fields = MESSAGE_TYPES[code & ~SENT_FLAG]
+    msg = unpack_fields(payload, fields)
+    msg["type"] = msg_type
+    if code & SENT_FLAG:
+        msg["sent"] = sent
+    return msg
+
+
+class LockTimeout(Full):
+    """
+    The queue's lock wasn't released within IPC_LOCK_TIMEOUT, so the runner is stuck
+    or died while holding it, and the queue can't be used any more
+    """
+
+
+class MessageTooLarge(ValueError):
+    """
+    The message is larger than the whole ring, so there will never be room for it
+    """
+
+
+class RingBufferQueue:
+    """
+    Queue between the plugin & the effect runner, over a fixed size ring buffer in
+    shared memory. Messages are written straight into the ring by put(), rather than
+    pickled and sent down a pipe by multiprocessing.Queue's feeder thread, and most are
+    packed into a few bytes (see encode) instead of being pickled.
+
+    A lock guards the ring's header & data, and a semaphore counts the messages in it
+    so a blocking get() sleeps until one is put. Has the same interface as
+    multiprocessing.Queue, as far as the plugin & runner use it. Like a bounded
+    Queue, put() raises Full when there is no room left in the ring, or LockTimeout
+    if the lock can't be taken. Unlike one, it raises MessageTooLarge for a message
+    that would never fit.
+    """
+
+    def __init__(self, context, size=constants.IPC_QUEUE_SIZE):
+        self.capacity = size
+        self._shm = shared_memory.SharedMemory(create=True, size=HEADER.size + size)
+        self._owner = True
+        self._lock = context.Lock()
+        self._count = context.Semaphore(0)
+
+        HEADER.pack_into(self._shm.buf, 0, 0, 0)
+
+    def __reduce__(self):
+        # Only when starting the runner process, which attaches to the same memory
+        return (
+            runner_process.attach_queue,
+            (self._shm.name, self.capacity, self._lock, self._count),
+        )
+
+    @classmethod
+    def attach(cls, name, capacity, lock, count):
+        """
+        The runner's end of a queue created by the plugin, see __reduce__
+        """
+        queue = cls.__new__(cls)
+        queue.capacity = capacity
+        queue._shm = shared_memory.SharedMemory(name=name)
+        queue._owner = False
+        queue._lock = lock
+        queue._count = count
+        return queue
+
+    def put(self, msg, block=True, timeout=None):
+        """
+        Never waits for room in the ring, block & timeout are only for compatibility
+        with multiprocessing.Queue.put
+        """
+        record = encode(msg)
+        if len(record) > self.capacity:
+            raise MessageTooLarge(
+                "{} byte message, the queue only holds {}".format(
+                    len(record), self.capacity
+                )
+            )
+
+        if not self._lock.acquire(timeout=constants.IPC_LOCK_TIMEOUT):
+            # The runner is stuck, or died while reading. Don't hang the plugin too
+            raise LockTimeout("Timed out waiting for the queue's lock")
+        try:
+            write_pos, read_pos = HEADER.unpack_from(self._shm.buf, 0)
+            if write_pos - read_pos + len(record) > self.capacity:
+                raise Full(
+                    "{} bytes queued, no room for {} more".format(
+                        write_pos - read_pos, len(record)
+                    )
+                )
+            self._write(write_pos, record)
+            HEADER.pack_into(self._shm.buf, 0, write_pos + len(record), read_pos)
+        finally:
+            self._lock.release()
+
+        self._count.release()
+
+    def get(self, block=True, timeout=None):
+        if not self._count.acquire(block, timeout):
+            raise Empty
+
+        # Each message is counted once it is complete, so there is one to read
+        if not self._lock.acquire(timeout=constants.IPC_LOCK_TIMEOUT):
+            # Leave it for the next get()
+            self._count.release()
+            raise Empty
+        try:
+            write_pos, read_pos = HEADER.unpack_from(self._shm.buf, 0)
+            length, code, sent = RECORD.unpack(self._read(read_pos, RECORD.size))
+            payload = self._read(read_pos + RECORD.size, length)
+            HEADER.pack_into(
+                self._shm.buf, 0, write_pos, read_pos + RECORD.size + length
+            )
+        finally:
+            self._lock.release()
+
+        return decode(code, sent, payload)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def close(self):
+        """
+        Detach from the shared memory, and free it if this is the plugin's end
+        """
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def _write(self, pos, data):
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        buf = self._shm.buf
+        buf[HEADER.size + start : HEADER.size + start + first] = data[:first]
+        if first < len(data):
+            # Wraps around to the start of the ring
+            buf[HEADER.size : HEADER.size + len(data) - first] = data[first:]
+
+    def _read(self, pos, length):
+        start = pos % self.capacity
+        first = min(length, self.capacity - start)
+        buf = self._shm.buf
+        data = bytes(buf[HEADER.size + start : HEADER.size + start + first])
+        if first < length:
+            data += bytes(buf[HEADER.size : HEADER.size + length - first])
+        return data
+
+
+def create_queue(context):
+    """
+    :param context: multiprocessing context the runner is started with
+    :return: RingBufferQueue, or a bounded multiprocessing.Queue where shared memory
+        isn't available (Py < 3.8)
+    """
+    if shared_memory is None:
+        return context.Queue(constants.IPC_QUEUE_MAXSIZE)
+    return RingBufferQueue(context)
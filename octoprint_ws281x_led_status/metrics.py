@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+# Prometheus text exposition format, https://prometheus.io/docs/instrumenting/exposition_formats/
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "ws281x_led_status_"
+
+# Runner histograms, per effect: (metric name, key in the effect's stats, help)
+EFFECT_HISTOGRAMS = [
+    ("render_seconds", "render", "Time taken to render & commit a frame"),
+    ("show_seconds", "show", "Time taken by strip.show()"),
+    ("frame_lateness_seconds", "overshoot", "How late animated frames were started"),
+]
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsWriter:
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, metric_type, help_text):
+        self.lines.append("# HELP {}{} {}".format(PREFIX, name, help_text))
+        self.lines.append("# TYPE {}{} {}".format(PREFIX, name, metric_type))
+
+    def sample(self, name, value, labels=None):
+        if labels:
+            name += "{{{}}}".format(
+                ",".join(
+                    '{}="{}"'.format(label, escape_label(label_value))
+                    for label, label_value in sorted(labels.items())
+                )
+            )
+        self.lines.append("{}{} {}".format(PREFIX, name, float(value)))
+
+    def histogram(self, name, summary, labels=None):
+        """
+        Samples of a runner histogram, see runner.stats.Histogram.summary
+        """
+        labels = labels if labels is not None else {}
+        cumulative = 0
+        for bound_ms, count in summary["buckets"]:
+            cumulative += count
+            le = "+Inf" if bound_ms is None else repr(bound_ms / 1000)
+            self.sample(name + "_bucket", cumulative, dict(labels, le=le))
+        self.sample(name + "_sum", summary["total_ms"] / 1000, labels)
+        self.sample(name + "_count", summary["count"], labels)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def prometheus_text(state, runner):
+    """
+    :param state: (dict) the plugin's state, lights_on & torch_on
+    :param runner: (dict) see the plugin's get_runner_status
+    :return: (str) the plugin's metrics in Prometheus' text format
+    """
+    writer = MetricsWriter()
+
+    writer.metric("lights_on", "gauge", "Whether the lights are on")
+    writer.sample("lights_on", state["lights_on"])
+    writer.metric("torch_on", "gauge", "Whether the torch is on")
+    writer.sample("torch_on", state["torch_on"])
+    writer.metric("runner_up", "gauge", "Whether the effect runner is running")
+    writer.sample("runner_up", runner["alive"])
+
+    writer.metric("queue_sent_total", "counter", "Messages sent to the runner")
+    writer.sample("queue_sent_total", runner["queue"]["sent"])
+    writer.metric(
+        "queue_suppressed_total",
+        "counter",
+        "Messages not sent to the runner, since they would not change anything",
+    )
+    writer.sample("queue_suppressed_total", runner["queue"]["suppressed"])
+    writer.metric(
+        "queue_dropped_total",
+        "counter",
+        "Messages dropped, since the runner wasn't running or stuck, superseded "
+        "while the queue was full, or too large for the queue",
+    )
+    writer.sample("queue_dropped_total", runner["queue"]["dropped"])
+    writer.metric(
+        "runner_restarts_total",
+        "counter",
+        "Times the watchdog restarted the runner, after it exited or stopped responding",
+    )
+    writer.sample("runner_restarts_total", runner["watchdog"]["restarts"])
+    writer.metric(
+        "runner_failures", "gauge", "Times in a row the runner has failed recently"
+    )
+    writer.sample("runner_failures", runner["watchdog"]["failures"])
+
+    stats = runner["stats"]
+    if stats is None:
+        # Runner hasn't reported yet
+        return writer.text()
+
+    if stats["current_effect"] is not None:
+        # Left out before the first effect, rather than naming it "None"
+        writer.metric(
+            "runner_current_effect_info", "gauge", "Effect the runner is running"
+        )
+        writer.sample(
+            "runner_current_effect_info", 1, {"effect": stats["current_effect"]}
+        )
+    writer.metric(
+        "runner_fps",
+        "gauge",
+        "Frames shown per second, averaged over the time each effect has been running",
+    )
+    for effect, effect_stats in sorted(stats["effects"].items()):
+        writer.sample("runner_fps", effect_stats["fps"], {"effect": effect})
+    writer.metric("runner_frames_total", "counter", "Frames shown")
+    for effect, effect_stats in sorted(stats["effects"].items()):
+        writer.sample("runner_frames_total", effect_stats["frames"], {"effect": effect})
+    writer.metric(
+        "runner_frames_dropped_total", "counter", "Frames dropped to catch up"
+    )
+    for effect, effect_stats in sorted(stats["effects"].items()):
+        writer.sample(
+            "runner_frames_dropped_total", effect_stats["dropped"], {"effect": effect}
+        )
+    writer.metric(
+        "runner_shows_skipped_total",
+        "counter",
+        "Frames not shown, since they were the same as the last",
+    )
+    writer.sample("runner_shows_skipped_total", stats["skipped_shows"])
+
+    writer.metric("runner_messages_received_total", "counter", "Messages received")
+    writer.sample("runner_messages_received_total", stats["messages_received"])
+    writer.metric(
+        "runner_messages_coalesced_total",
+        "counter",
+        "Messages skipped, since a newer one of the same class was queued",
+    )
+    for message_class, count in sorted(stats["messages_coalesced"].items()):
+        writer.sample(
+            "runner_messages_coalesced_total", count, {"class": message_class}
+        )
+    writer.metric(
+        "runner_queue_lag_seconds",
+        "histogram",
+        "Time from a message being sent until the runner received it",
+    )
+    writer.histogram("runner_queue_lag_seconds", stats["queue_lag"])
+
+    for name, key, help_text in EFFECT_HISTOGRAMS:
+        writer.metric("runner_" + name, "histogram", help_text)
+        for effect, effect_stats in sorted(stats["effects"].items()):
+            writer.histogram("runner_" + name, effect_stats[key], {"effect": effect})
+
+    writer.metric(
+        "runner_last_error_timestamp_seconds",
+        "gauge",
+        "Time the runner last logged an error, 0 if it hasn't",
+    )
+    last_error = stats["last_error"]
+    writer.sample(
+        "runner_last_error_timestamp_seconds",
+        last_error["time"] if last_error else 0,
+    )
+    writer.metric(
+        "runner_stats_timestamp_seconds", "gauge", "Time the runner sent these stats"
+    )
+    writer.sample("runner_stats_timestamp_seconds", stats["time"])
+
+    return writer.text()
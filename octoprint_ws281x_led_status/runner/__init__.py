@@ -7,32 +7,44 @@ __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the ter
 
 import logging
 import math
-import multiprocessing
+import multiprocessing.util
 import threading
 import time
 
 try:
     # Py3
-    from queue import Queue
+    from logging.handlers import QueueHandler, QueueListener
+    from queue import Empty, Queue
     from typing import Optional
 except ImportError:
     # Py2
-    from Queue import Queue
+    from Queue import Empty
 
-# noinspection PyPackageRequirements
-from octoprint.logging.handlers import CleaningTimedRotatingFileHandler
-from rpi_ws281x import PixelStrip
+    QueueHandler = QueueListener = None
 
 from octoprint_ws281x_led_status import constants
-from octoprint_ws281x_led_status.effects import error_handled_effect
-from octoprint_ws281x_led_status.runner import segments
+from octoprint_ws281x_led_status.debug_ring import (
+    DebugRing,
+    DumpOnErrorHandler,
+    message_fields,
+)
+from octoprint_ws281x_led_status.effects import (
+    error_handled_effect,
+    error_handled_frame,
+)
+from octoprint_ws281x_led_status.framebuffer import FrameBuffer
+from octoprint_ws281x_led_status.runner import backends, segments
+from octoprint_ws281x_led_status.runner.stats import (
+    FrameStats,
+    Histogram,
+    LastErrorHandler,
+)
 from octoprint_ws281x_led_status.runner import timer as active_times
 from octoprint_ws281x_led_status.util import (
-    apply_color_correction,
-    clear_queue,
+    ColorCorrection,
     hex_to_rgb,
     int_0_255,
-    milli_sleep,
+    monotonic,
     recursively_log,
     start_daemon_thread,
     start_daemon_timer,
@@ -50,9 +62,13 @@ class EffectRunner:
         previous_state,
         log_path,
         saved_lights_on,
+        stats_conn=None,
+        heartbeat=None,
     ):
 
         self._logger = logging.getLogger("octoprint.plugins.ws281x_led_status.runner")
+        # Recent events, written to the log when an error is logged or the plugin asks
+        self.debug_ring = DebugRing()
         self.setup_custom_logger(log_path, debug)
         self._logger.debug("Starting WS281x LED Status Effect runner")
 
@@ -61,23 +77,12 @@ class EffectRunner:
             # cause the process to crash but nobody would know about it, it died silently.
 
             self.segment_manager = None  # type Optional[segments.SegmentManager]
+            # Frame buffers effects render into, for the whole strip & segment 1
+            self.strip_buffer = None  # type: Optional[FrameBuffer]
+            self.segment_buffer = None  # type: Optional[FrameBuffer]
 
             # Save settings to class
-            self.strip_settings = strip_settings
-            self.effect_settings = effect_settings
-            self.features_settings = features_settings
-            self.active_times_settings = features_settings["active_times"]
-            self.transition_settings = features_settings["transitions"]
-            self.max_brightness = int(
-                round((float(strip_settings["brightness"]) / 100) * 255)
-            )
-            self.color_correction = {
-                "red": self.strip_settings["adjustment"]["R"],
-                "green": self.strip_settings["adjustment"]["G"],
-                "blue": self.strip_settings["adjustment"]["B"],
-                "white_override": self.strip_settings["white_override"],
-                "white_brightness": self.strip_settings["white_brightness"],
-            }
+            self.load_settings(strip_settings, effect_settings, features_settings)
 
             # Create segment settings
             # Segments are EXPERIMENTAL and only enabled for certain conditions
@@ -105,9 +110,20 @@ class EffectRunner:
             self.active_times_state = True
             self.turn_off_timer = None
 
-            self.queue = queue  # type: multiprocessing.Queue
+            # Number of messages skipped by coalescing, per message class
+            self.coalesced_count = {key: 0 for key in COALESCE_CLASSES.values()}
+
+            self.queue = queue  # type: ipc.RingBufferQueue
+            # Sending end of a pipe to the plugin, for the stats from get_stats()
+            self.stats_conn = stats_conn
+            # Shared double, the plugin's watchdog restarts the runner if it gets old
+            self.heartbeat = heartbeat
+            self._stats_due = 0
+            self.messages_received = 0
+            # Time from the plugin sending each message until it was received here
+            self.queue_lag = Histogram()
             try:
-                self.strip = self.start_strip()  # type: PixelStrip
+                self.strip = self.start_strip()  # type: rpi_ws281x.PixelStrip
             except (StripFailedError, segments.InvalidSegmentError):
                 self._logger.error("Exiting the effect process")
                 return
@@ -116,13 +132,14 @@ class EffectRunner:
                 self._logger.error("Exiting the effect process")
                 return
 
-            self.effect_queue = Queue()
-            self.effect_thread = None  # type: Optional[threading.Thread]
-
             self.brightness_manager = BrightnessManager(
                 self.strip, self.max_brightness, self.transition_settings
             )
 
+            self.effect_thread = EffectThread(
+                self.strip, self.brightness_manager, self._logger, self.debug_ring
+            )
+
             # Create 'Active Times' background timers
             self.active_times_timer = active_times.ActiveTimer(
                 self.active_times_settings, self.switch_lights
@@ -157,15 +174,29 @@ class EffectRunner:
 
             self._logger.info("Starting main loop")
             while True:
-                msg = self.queue.get()
-                self._logger.debug("New message: {}".format(msg))
-                if msg:
-                    if msg == constants.KILL_MSG:
-                        self.kill()
-                        # Exit the process
-                        return
+                self.beat(monotonic())
+                messages = self.get_messages()
+                if constants.KILL_MSG in messages:
+                    # Anything else queued up is irrelevant now
+                    self.kill()
+                    # Exit the process
+                    return
+
+                to_process = coalesce_messages(messages, self.coalesced_count)
+                if len(to_process) < len(messages):
+                    self.debug_ring.record(
+                        "coalesced", received=len(messages), processed=len(to_process)
+                    )
+
+                # Each message received is in the debug ring, see get_messages
+                for msg in to_process:
                     self.parse_q_msg(msg)  # Effects are run from parse_q_msg
 
+                now = monotonic()
+                if now >= self._stats_due:
+                    self.publish_stats(now)
+                    self._stats_due = now + constants.RUNNER_STATS_INTERVAL
+
         except KeyboardInterrupt:
             self.kill()
             return
@@ -174,13 +205,146 @@ class EffectRunner:
             self._logger.exception(e)
             raise
 
+    def get_messages(self):
+        """
+        Wait for a message, then drain anything else that has piled up behind it
+        :return: (list) messages in the order they were sent, empty if there were none
+            for RUNNER_STATS_INTERVAL
+        """
+        try:
+            messages = [self.queue.get(timeout=constants.RUNNER_STATS_INTERVAL)]
+        except Empty:
+            return []
+
+        while True:
+            try:
+                messages.append(self.queue.get_nowait())
+            except Empty:
+                break
+
+        # The monotonic clock is system wide, so it can be compared with the plugin's
+        received = monotonic()
+        for msg in messages:
+            fields = message_fields(msg)
+            if isinstance(msg, dict) and "sent" in msg:
+                lag = received - msg["sent"]
+                self.queue_lag.add(lag)
+                fields["lag_ms"] = lag * 1000
+            self.debug_ring.record("received", **fields)
+        self.messages_received += len(messages)
+
+        return [msg for msg in messages if msg]
+
+    def beat(self, now):
+        """
+        Tell the plugin's watchdog the runner is still working. The main loop beats at
+        least every RUNNER_STATS_INTERVAL, while waiting for messages.
+        """
+        if self.heartbeat is None:
+            return
+        busy_since = self.effect_thread.busy_since
+        # A frame stuck rendering or showing holds the heartbeat back to when it started
+        self.heartbeat.value = now if busy_since is None else min(now, busy_since)
+
+    def get_stats(self, now):
+        """
+        :return: (dict) health & performance counters of the runner
+        """
+        effects = self.effect_thread.frame_stats.summary(now)
+        current_effect = self.effect_thread.current_effect
+        return {
+            "time": time.time(),
+            "current_effect": current_effect,
+            # Averaged over the time the current effect has been running
+            "fps": effects[current_effect]["fps"] if current_effect in effects else 0.0,
+            "dropped_frames": self.effect_thread.dropped_frames,
+            "skipped_shows": self.effect_thread.skipped_shows,
+            "messages_received": self.messages_received,
+            "messages_coalesced": dict(self.coalesced_count),
+            "queue_lag": self.queue_lag.summary(),
+            "last_error": self.last_error_handler.last_error,
+            "effects": effects,
+        }
+
+    def publish_stats(self, now):
+        if self.stats_conn is None:
+            return
+
+        try:
+            self.stats_conn.send(self.get_stats(now))
+        except (OSError, IOError, ValueError):
+            # Broken or closed, the plugin isn't listening any more
+            self._logger.debug("Stats pipe closed, no longer publishing stats")
+            self.stats_conn = None
+
+    def load_settings(self, strip_settings, effect_settings, features_settings):
+        self.strip_settings = strip_settings
+        self.effect_settings = effect_settings
+        self.features_settings = features_settings
+        self.active_times_settings = features_settings["active_times"]
+        self.transition_settings = features_settings["transitions"]
+        self.max_brightness = int(
+            round((float(strip_settings["brightness"]) / 100) * 255)
+        )
+        self.color_correction = ColorCorrection(self.strip_settings)
+
+    def reconfigure(self, msg):
+        """
+        Apply changed settings in place, without restarting the strip. Changes to the
+        strip's hardware setup restart the runner instead, see the plugin's
+        `apply_runner_settings`.
+        :param msg: (dict) reconfigure message, with the new settings, the current
+            state and whether the lights are on
+        """
+        self._logger.info("Settings changed, reconfiguring the effect runner")
+        self.debug_ring.record("reconfigure")
+
+        # Keep the < 6 LED workaround, the count can't change here
+        msg["strip"]["count"] = self.strip_settings["count"]
+        self.load_settings(msg["strip"], msg["effects"], msg["features"])
+        self._logger.setLevel(logging.DEBUG if msg["debug"] else logging.INFO)
+
+        self.strip.setGamma(self.color_correction.gamma)
+        # Gamma is applied as the data is sent, so even an unchanged frame needs showing
+        self.effect_thread.refresh()
+        self.brightness_manager.reconfigure(
+            self.max_brightness, self.transition_settings
+        )
+
+        self.active_times_timer.end_timer()
+        self.active_times_timer = active_times.ActiveTimer(
+            self.active_times_settings, self.switch_lights
+        )
+        self.active_times_timer.start_timer()
+
+        if msg["debug"]:
+            self.log_settings()
+
+        # Show the current state again, with the new settings
+        self.previous_state = msg["state"]
+        if self.lights_on and msg["lights_on"]:
+            self.parse_q_msg(self.previous_state)
+        else:
+            self.switch_lights(msg["lights_on"])
+
     def kill(self):
         self._logger.debug("Kill message received, shutting down...")
         self.blank_leds()
         self.stop_effect()
         self.active_times_timer.end_timer()
+        self._logger.debug(
+            "Frames dropped: {}, shows skipped: {}, messages coalesced: {}".format(
+                self.effect_thread.dropped_frames,
+                self.effect_thread.skipped_shows,
+                self.coalesced_count,
+            )
+        )
+        self.log_frame_stats(self._logger.debug)
         self._logger.info("Effect runner shutdown. Bye!")
 
+    def log_frame_stats(self, log):
+        self.effect_thread.frame_stats.log_summary(log, monotonic())
+
     def parse_q_msg(self, msg):
         if msg["type"] == "lights":
             if msg["action"] == "on":
@@ -202,6 +366,16 @@ class EffectRunner:
         elif msg["type"] == "custom":
             self.custom_effect(msg["effect"], msg["color"], msg["delay"])
 
+        elif msg["type"] == "reconfigure":
+            self.reconfigure(msg)
+
+        elif msg["type"] == "frame_stats":
+            self.log_frame_stats(self._logger.info)
+
+        elif msg["type"] == "debug_ring":
+            if not self.debug_ring.dump(self._logger.info, "requested by the plugin"):
+                self._logger.info("Debug ring: no events since it was last written")
+
     def switch_lights(self, state):
         # state: target state for lights
         # Only run when current state must change, since it will interrupt the currently running effect
@@ -209,6 +383,7 @@ class EffectRunner:
             return
 
         self._logger.info("Switching lights {}".format("on" if state else "off"))
+        self.debug_ring.record("lights", on=state)
 
         if state:
             self.turn_lights_on()
@@ -218,27 +393,27 @@ class EffectRunner:
     def turn_lights_on(self):
         if not self.active_times_timer.active:
             # Active times are not now, don't do anything
-            self._logger.debug("LED switch on blocked by active times")
+            self.debug_ring.record("lights_on_blocked", reason="active times")
             self.parse_q_msg(self.previous_state)
             return
 
-        if self.turn_off_timer and self.turn_off_timer.is_alive():
+        fading_out = self.turn_off_timer is not None and self.turn_off_timer.is_alive()
+        if fading_out:
             self.turn_off_timer.cancel()
 
         self.lights_on = True
 
         if self.transition_settings["fade"]["enabled"]:
-            start_daemon_thread(
-                target=self.brightness_manager.do_fade_in, name="Fade in"
-            )
+            # Only a fade out that was cut short carries on from where it got to
+            self.brightness_manager.start_fade_in(from_off=not fading_out)
+            self.effect_thread.wake()
         self.parse_q_msg(self.previous_state)
 
     def turn_lights_off(self):
         if self.transition_settings["fade"]["enabled"]:
             # Start fading brightness out
-            start_daemon_thread(
-                target=self.brightness_manager.do_fade_out, name="Fade out thread"
-            )
+            self.brightness_manager.start_fade_out()
+            self.effect_thread.wake()
             # Set timer to turn LEDs off after fade
             self.turn_off_timer = start_daemon_timer(
                 interval=float(self.transition_settings["fade"]["time"]) / 1000,
@@ -252,7 +427,7 @@ class EffectRunner:
         self.lights_on = False
 
     def progress_msg(self, progress_effect, value):
-        self._logger.debug("Changing effect to {}, {}%".format(progress_effect, value))
+        self.debug_ring.record("change_effect", effect=progress_effect, value=value)
         self.progress_effect(progress_effect, min(max(int(value), 0), 100))
 
     def parse_m150(self, msg):
@@ -292,10 +467,8 @@ class EffectRunner:
                 "type": "M150",
                 "command": "M150",  # Chop the parameters, so it is not parsed again
             }
-            self._logger.debug(
-                "Parsed new M150: M150 R{red} G{green} B{blue} (brightness: {brightness})".format(
-                    **locals()
-                )
+            self.debug_ring.record(
+                "m150", red=red, green=green, blue=blue, brightness=brightness
             )
 
         if self.lights_on:  # Respect lights on/off
@@ -303,11 +476,10 @@ class EffectRunner:
             self.brightness_manager.set_brightness(self.previous_m150["brightness"])
 
             # Work out the colour - if specified W, use that if available. Falls back on auto-detection
-            if self.color_correction["white_override"] and self.previous_m150["w"]:
+            if self.color_correction.white_override and self.previous_m150["w"]:
                 color = (0, 0, 0, int(self.previous_m150["w"]))
             else:
-                color = apply_color_correction(
-                    self.color_correction,
+                color = self.color_correction.apply(
                     self.previous_m150["r"],
                     self.previous_m150["g"],
                     self.previous_m150["b"],
@@ -317,7 +489,6 @@ class EffectRunner:
             self.run_effect(
                 target=constants.EFFECTS["Solid Color"],
                 kwargs={
-                    "queue": self.effect_queue,
                     "color": color,
                     "brightness_manager": self.brightness_manager,
                 },
@@ -332,14 +503,13 @@ class EffectRunner:
             self.run_effect(
                 target=constants.PROGRESS_EFFECTS[effect_settings["effect"]],
                 kwargs={
-                    "queue": self.effect_queue,
                     "brightness_manager": self.brightness_manager,
                     "value": int(value),
-                    "progress_color": apply_color_correction(
-                        self.color_correction, *hex_to_rgb(effect_settings["color"])
+                    "progress_color": self.color_correction.apply(
+                        *hex_to_rgb(effect_settings["color"])
                     ),
-                    "base_color": apply_color_correction(
-                        self.color_correction, *hex_to_rgb(effect_settings["base"])
+                    "base_color": self.color_correction.apply(
+                        *hex_to_rgb(effect_settings["base"])
                     ),
                     "reverse": self.strip_settings["reverse"],
                 },
@@ -349,8 +519,7 @@ class EffectRunner:
             self.blank_leds(whole_strip=False)
 
     def standard_effect(self, mode):
-        # Log if the effect is changing
-        self._logger.debug("Changing effect to {}".format(mode))
+        self.debug_ring.record("change_effect", effect=mode)
 
         if (self.lights_on and not mode == "blank") or (
             mode == "torch" and self.effect_settings["torch"]["override_timer"]
@@ -359,9 +528,8 @@ class EffectRunner:
             self.run_effect(
                 target=constants.EFFECTS[effect_settings["effect"]],
                 kwargs={
-                    "queue": self.effect_queue,
-                    "color": apply_color_correction(
-                        self.color_correction, *hex_to_rgb(effect_settings["color"])
+                    "color": self.color_correction.apply(
+                        *hex_to_rgb(effect_settings["color"])
                     ),
                     "delay": effect_settings["delay"],
                     "brightness_manager": self.brightness_manager,
@@ -372,16 +540,13 @@ class EffectRunner:
             self.blank_leds(whole_strip=False)
 
     def custom_effect(self, effect, color, delay):
-        self._logger.debug("Changing effect to {}".format(effect))
+        self.debug_ring.record("change_effect", effect=effect)
 
         if self.lights_on:
             self.run_effect(
                 target=constants.EFFECTS[effect],
                 kwargs={
-                    "queue": self.effect_queue,
-                    "color": apply_color_correction(
-                        self.color_correction, *hex_to_rgb(color)
-                    ),
+                    "color": self.color_correction.apply(*hex_to_rgb(color)),
                     "delay": delay,
                     "brightness_manager": self.brightness_manager,
                 },
@@ -395,61 +560,43 @@ class EffectRunner:
             kwargs = {}
 
         if "strip" not in kwargs:
-            kwargs["strip"] = self.segment_manager.get_segment(1)
-
-        self.stop_effect()
+            kwargs["strip"] = self.segment_buffer
 
-        # Targets error handler, which passes off to the effect with effect_args
-        self.effect_thread = start_daemon_thread(
-            target=error_handled_effect,
-            kwargs={"target": target, "logger": self._logger, "effect_args": kwargs},
-            name=name,
-        )
+        self.effect_thread.swap(target, kwargs, name)
 
     def stop_effect(self):
-        if self.effect_thread and self.effect_thread.is_alive():
-            self.effect_queue.put(constants.KILL_MSG)
-            self.effect_thread.join()
-            clear_queue(self.effect_queue)
+        self.effect_thread.stop()
 
     def blank_leds(self, whole_strip=True):
-        """Set LEDs to off, wait 0.1secs to prevent CPU burn"""
-        strip = self.strip
+        """Set LEDs to off"""
+        strip = self.strip_buffer
         if not whole_strip:
             # Use a segment, not whole strip
-            strip = self.segment_manager.get_segment(1)
+            strip = self.segment_buffer
 
-        self._logger.debug("Blanking LEDs")
+        self.debug_ring.record("blank", whole_strip=whole_strip)
 
         self.run_effect(
             target=constants.EFFECTS["Solid Color"],
             kwargs={
                 "strip": strip,
-                "queue": self.effect_queue,
                 "color": (0, 0, 0),
                 "brightness_manager": self.brightness_manager,
-                "wait": False,
             },
             name="Solid Color",
         )
-        if self.queue.empty():
-            time.sleep(0.1)
 
     def start_strip(self):
         """
-        Start PixelStrip and SegmentManager object
-        :returns strip: (rpi_ws281x.PixelStrip) The initialised strip object
+        Start the strip, with the configured backend, and SegmentManager object
+        :returns strip: (rpi_ws281x.PixelStrip) The initialised strip object, or a
+            backends.VirtualStrip
         """
         try:
-            strip = PixelStrip(
-                num=int(self.strip_settings["count"]),
-                pin=int(self.strip_settings["pin"]),
-                freq_hz=int(self.strip_settings["freq_hz"]),
-                dma=int(self.strip_settings["dma"]),
-                invert=bool(self.strip_settings["invert"]),
-                brightness=int(self.strip_settings["brightness"]),
-                channel=int(self.strip_settings["channel"]),
-                strip_type=constants.STRIP_TYPES[self.strip_settings["type"]],
+            backend = backends.get_backend(self.strip_settings)
+            self._logger.debug("Using the {} strip backend".format(backend))
+            strip = backends.create_strip(
+                backend, self.strip_settings, gamma=self.color_correction.gamma
             )
             strip.begin()
         except Exception as e:  # Probably wrong settings...
@@ -464,9 +611,17 @@ class EffectRunner:
         except segments.InvalidSegmentError:
             self._logger.error("Segment configuration error. Please report this issue!")
             raise
+
+        self.strip_buffer = FrameBuffer(strip)
+        # Committed through StripSegment.setPixels
+        self.segment_buffer = FrameBuffer(self.segment_manager.get_segment(1))
         return strip
 
     def setup_custom_logger(self, path, debug):
+        # Only the handler is needed from OctoPrint, the runner doesn't import the rest
+        # noinspection PyPackageRequirements
+        from octoprint.logging.handlers import CleaningTimedRotatingFileHandler
+
         # Cleaning handler will remove old logs, defined by 'backupCount'
         # 'D' specifies to roll over each day
         effect_runner_handler = CleaningTimedRotatingFileHandler(
@@ -477,7 +632,27 @@ class EffectRunner:
         )
         effect_runner_handler.setLevel(logging.DEBUG)
 
-        self._logger.addHandler(effect_runner_handler)
+        # Ahead of the QueueHandler, which changes the record itself on Py < 3.8
+        self.last_error_handler = LastErrorHandler()
+        self._logger.addHandler(self.last_error_handler)
+        # The events leading up to an error are written just before it
+        self._logger.addHandler(DumpOnErrorHandler(self.debug_ring, self._logger.info))
+
+        if QueueListener is not None:
+            # Records are queued, and formatted & written to the file on the
+            # listener's thread, so a slow SD card or a rollover doesn't stall effects
+            log_queue = Queue()
+            self.log_listener = QueueListener(
+                log_queue, effect_runner_handler, respect_handler_level=True
+            )
+            self.log_listener.start()
+            # Stopping the listener writes out anything still queued, this runs when
+            # the process exits however the runner ended
+            multiprocessing.util.Finalize(self, self.log_listener.stop, exitpriority=10)
+            self._logger.addHandler(QueueHandler(log_queue))
+        else:
+            self._logger.addHandler(effect_runner_handler)
+
         self._logger.setLevel(logging.DEBUG if debug else logging.INFO)
         self._logger.propagate = False
 
@@ -502,6 +677,290 @@ class EffectRunner:
         self._logger.debug("\n".join(lines))
 
 
+# Messages that supersede earlier ones of the same class, see coalesce_messages
+COALESCE_CLASSES = {
+    "lights": "lights",
+    "standard": "state",
+    "progress": "state",
+    "custom": "custom",
+    "M150": "M150",
+}
+
+
+def coalesce_messages(messages, counts):
+    """
+    Reduce a burst of queued messages to the ones that affect the final state
+
+    Only the latest message of each class is kept, so stale progress values or M150
+    colours are never rendered. The survivors keep their relative order, so
+    eg. an M150 followed by a state effect still ends on the state effect.
+    :param messages: (list) messages in the order they were received
+    :param counts: (dict) counter of messages dropped per class, updated in place
+    :return: (list) messages to process, in order
+    """
+    if len(messages) < 2:
+        return messages
+
+    latest = {}  # class: (position, message)
+    result = []  # Unknown messages are never coalesced
+    for position, msg in enumerate(messages):
+        msg_class = COALESCE_CLASSES.get(msg["type"])
+        if msg_class is None:
+            result.append((position, msg))
+            continue
+
+        if msg_class in latest:
+            counts[msg_class] += 1
+            previous = latest[msg_class][1]
+            if (
+                msg_class == "M150"
+                and msg["command"].upper() == "M150"
+                and previous["command"].upper() != "M150"
+            ):
+                # A bare M150 repeats the previous colour, which would be lost
+                msg = previous
+
+        latest[msg_class] = (position, msg)
+
+    result.extend(latest.values())
+    return [msg for _position, msg in sorted(result, key=lambda item: item[0])]
+
+
+class EffectThread:
+    """
+    Long-lived thread that every effect is rendered on, and the frame clock for the strip.
+
+    Switching effect is a hand-off: the new effect is stored under the lock and the
+    thread is woken, so there is no join, no new thread and nothing to drain.
+
+    Frames are scheduled against a monotonic deadline, so an effect's delay is the
+    real frame period regardless of how long rendering and show() take. If a frame
+    runs late the next one is rendered straight away to catch up, if it is more than
+    a whole frame behind the missed frames are dropped (and counted) instead. Fade
+    steps from the BrightnessManager are applied on the same clock, and each tick
+    calls show() once for the whole strip.
+
+    Effects render into a FrameBuffer, which is committed to the strip just before
+    show() when a new frame has been rendered. If neither the pixels nor the brightness
+    have changed since the last show() it is skipped (and counted), since it would
+    send exactly the same data down the wire.
+
+    Render time, show() time and how late each animated frame started are recorded
+    per effect in `frame_stats`, and a summary is logged every FRAME_STATS_INTERVAL.
+    Effects starting and frames dropped are recorded in `debug_ring`.
+
+    `clock` is the time source for all of the above, util.monotonic unless testing.
+    """
+
+    def __init__(
+        self,
+        strip,
+        brightness_manager,
+        logger,
+        debug_ring=None,
+        max_fps=constants.MAX_FPS,
+        clock=monotonic,
+    ):
+        self._logger = logger
+        self._clock = clock
+        self.debug_ring = debug_ring if debug_ring is not None else DebugRing()
+        self.strip = strip
+        self.brightness_manager = brightness_manager
+        self.min_frame_time = 1.0 / max_fps
+
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._pending = None  # type: Optional[tuple]
+        self._refresh = False
+        self._stopping = False
+
+        # Only touched by the render thread
+        self._frames = None  # Generator of the running animated effect
+        self._effect_args = {}  # type: dict
+        self._frame_due = None  # type: Optional[float]
+        self._fade_due = None  # type: Optional[float]
+
+        self._committed = None  # (FrameBuffer, fingerprint) last committed
+        self._shown = None  # (committed, brightness) last shown
+
+        self.current_effect = None  # type: Optional[str]
+        # When the current tick started, None while waiting for the next one
+        self.busy_since = None  # type: Optional[float]
+        self.dropped_frames = 0
+        self.skipped_shows = 0
+        self.frame_stats = FrameStats()
+        self._stats_due = self._clock() + constants.FRAME_STATS_INTERVAL
+
+        self._thread = start_daemon_thread(
+            target=self._render_loop, name="WS281x LED Status render thread"
+        )
+
+    def swap(self, target, kwargs, name):
+        """
+        Replace the running effect, returns immediately
+        :param target: effect function from constants.EFFECTS or PROGRESS_EFFECTS
+        :param kwargs: (dict) arguments for the effect
+        :param name: (str) name of the effect, for logging
+        """
+        with self._lock:
+            # Only the latest effect matters, anything not yet started is replaced
+            self._pending = (target, kwargs, name)
+            self._wake_event.set()
+
+    def wake(self):
+        """
+        Re-evaluate what is due now, eg. after a fade has been started
+        """
+        self._wake_event.set()
+
+    def refresh(self):
+        """
+        Show the next frame even if it is the same as the last one shown
+        """
+        with self._lock:
+            self._refresh = True
+            self._wake_event.set()
+
+    def stop(self):
+        """
+        Finish any pending effect (eg. blanking the LEDs), then end the thread
+        """
+        with self._lock:
+            self._stopping = True
+            self._wake_event.set()
+        self._thread.join()
+
+    def _next_tick(self):
+        due = [t for t in (self._frame_due, self._fade_due) if t is not None]
+        return min(due) if due else None
+
+    def _render_loop(self):
+        while True:
+            self.busy_since = None
+            next_tick = self._next_tick()
+            if next_tick is None:
+                # Nothing animated running, sleep until something changes
+                self._wake_event.wait()
+            else:
+                timeout = next_tick - self._clock()
+                if timeout > 0:
+                    self._wake_event.wait(timeout)
+            self.busy_since = self._clock()
+
+            with self._lock:
+                effect = self._pending
+                self._pending = None
+                refresh = self._refresh
+                self._refresh = False
+                self._wake_event.clear()
+                stopping = self._stopping
+
+            if refresh:
+                self._shown = None
+
+            rendered = False
+            render_time = 0.0
+            if effect is not None:
+                start = self._clock()
+                self._start_effect(*effect)
+                start_time = self._clock() - start
+                # Static effects have rendered their only frame already
+                rendered = self._frames is None
+                if rendered:
+                    render_time = start_time
+                self.debug_ring.record(
+                    "effect", name=effect[2], start_ms=start_time * 1000
+                )
+
+            now = self._clock()
+            if self._frame_due is not None and now >= self._frame_due:
+                self.frame_stats.add_overshoot(now - self._frame_due)
+                self._render_frame(now)
+                rendered = True
+                render_time += self._clock() - now
+
+            show = rendered or refresh
+
+            if self.brightness_manager.fade_active:
+                if self._fade_due is None or now >= self._fade_due:
+                    self.brightness_manager.fade_step()
+                    self._fade_due = now + (constants.FADE_STEP_MS / 1000)
+                    show = True
+            else:
+                self._fade_due = None
+
+            if show:
+                try:
+                    if rendered:
+                        start = self._clock()
+                        self._commit(self._effect_args["strip"])
+                        self.frame_stats.add_render(render_time + self._clock() - start)
+                    self._show()
+                except Exception as e:
+                    self._logger.error("Error showing frame")
+                    self._logger.exception(e)
+
+            if now >= self._stats_due:
+                self.frame_stats.log_summary(self._logger.debug, now)
+                self._stats_due = now + constants.FRAME_STATS_INTERVAL
+
+            if stopping:
+                return
+
+    def _commit(self, frame_buffer):
+        committed = (frame_buffer, frame_buffer.fingerprint())
+        if committed != self._committed:
+            frame_buffer.commit()
+            self._committed = committed
+
+    def _show(self):
+        shown = (self._committed, self.strip.getBrightness())
+        if shown == self._shown:
+            self.skipped_shows += 1
+            return
+
+        start = self._clock()
+        self.strip.show()
+        self.frame_stats.add_show(self._clock() - start)
+        self._shown = shown
+
+    def _start_effect(self, target, kwargs, name):
+        self.current_effect = name
+        self.frame_stats.start_effect(name, self._clock())
+        self._effect_args = kwargs
+        self._frames = error_handled_effect(
+            target=target, logger=self._logger, effect_args=kwargs
+        )
+        self._frame_due = self._clock() if self._frames is not None else None
+
+    def _render_frame(self, now):
+        delay = error_handled_frame(self._frames, self._logger, self._effect_args)
+        if delay is None:
+            # Effect has finished or errored, the last frame stays on the strip
+            self._frames = None
+            self._frame_due = None
+            return
+
+        period = max(float(delay) / 1000, self.min_frame_time)
+        frame_due = self._frame_due + period
+
+        behind = now - frame_due
+        if behind >= period:
+            # Too far behind to catch up, skip the frames we missed
+            missed = int(behind // period)
+            self.dropped_frames += missed
+            self.frame_stats.add_dropped(missed)
+            self.debug_ring.record(
+                "dropped_frames",
+                effect=self.current_effect,
+                missed=missed,
+                behind_ms=behind * 1000,
+            )
+            frame_due += missed * period
+
+        self._frame_due = frame_due
+
+
 class BrightnessManager:
     def __init__(self, strip, max_brightness, transition_settings):
         self.strip = strip
@@ -514,6 +973,7 @@ class BrightnessManager:
 
         # State flags
         self.fade_active = False
+        self._fade = iter(())
 
     def get_brightness(self):
         """
@@ -521,7 +981,7 @@ class BrightnessManager:
         """
         return self.current_brightness
 
-    def set_brightness(self, value, show=True):
+    def set_brightness(self, value):
         if not isinstance(value, int):
             value = int(value)
 
@@ -529,61 +989,70 @@ class BrightnessManager:
         if not self.fade_active:
             self.current_brightness = value
             self.strip.setBrightness(self.current_brightness)
-            if show:
-                self.strip.show()
 
     def reset_brightness(self):
         if not self.fade_active:
+            self.current_brightness = self.max_brightness
             self.strip.setBrightness(self.max_brightness)
 
+    def reconfigure(self, max_brightness, transition_settings):
+        self.max_brightness = max_brightness
+        self.transition_settings = transition_settings
+        self.fade_steps = self.calculate_fade_in()
+
     def calculate_fade_in(self):
         """
-        Calculate a list of brightness values per ms, based on sine curve
+        Calculate a list of brightness values per fade step, based on sine curve
         """
         fade_time = int(self.transition_settings["fade"]["time"])  # Fade time in ms
-        step = (math.pi / 2) / (fade_time / 20)
-        # Difference between steps, in radians (per 20ms)
+        step_count = int(fade_time / constants.FADE_STEP_MS)
+        step = (math.pi / 2) / (fade_time / constants.FADE_STEP_MS)
+        # Difference between steps, in radians
 
-        # Work out brightness value per ms, based on sine curve
+        # Work out brightness value per step, based on sine curve
         steps = []
-        for i in range(0, int(fade_time / 20)):
-            steps.append(math.sin(i * step) * self.max_brightness)
+        for i in range(0, step_count):
+            steps.append(int(round(math.sin(i * step) * self.max_brightness, 0)))
 
         return steps
 
-    def do_fade_in(self):
+    def start_fade_in(self, from_off=False):
         """
-        Step through fade values to produce fade in effect
+        Fade up from the current brightness, replacing any fade in progress
+        :param from_off: (bool) fade up from 0, as the LEDs are blank. Blanking
+            resets the brightness to max, so it can't be faded up from
         """
-        while self.fade_active:
-            # Wait for any previous fade to finish
-            milli_sleep(10)
-
-        self.fade_active = True
-        for step in self.fade_steps:
-            self.current_brightness = int(round(step, 0))
-            self.strip.setBrightness(self.current_brightness)
-            self.strip.show()
-            milli_sleep(20)
-
-        self.fade_active = False
+        start = 0 if from_off else self.current_brightness
+        self.start_fade(
+            [step for step in self.fade_steps if step >= start] + [self.max_brightness]
+        )
 
-    def do_fade_out(self):
+    def start_fade_out(self):
         """
-        Step through fade values to produce fade out effect
+        Fade down from the current brightness, replacing any fade in progress
         """
-        while self.fade_active:
-            # Wait for any previous fade to finish
-            milli_sleep(10)
+        self.start_fade(
+            [
+                step
+                for step in reversed(self.fade_steps)
+                if step <= self.current_brightness
+            ]
+        )
 
+    def start_fade(self, steps):
+        self._fade = iter(steps)
         self.fade_active = True
-        for step in reversed(self.fade_steps):
-            self.current_brightness = int(round(step, 0))
-            self.strip.setBrightness(self.current_brightness)
-            self.strip.show()
-            milli_sleep(20)
 
-        self.fade_active = False
+    def fade_step(self):
+        """
+        Apply the next step of the active fade, called on the EffectThread's clock
+        """
+        try:
+            self.current_brightness = next(self._fade)
+        except StopIteration:
+            self.fade_active = False
+            return
+        self.strip.setBrightness(self.current_brightness)
 
 
 class StripFailedError(Exception):
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import ctypes
+import os
+import time
+from array import array
+
+from octoprint_ws281x_led_status.framebuffer import PIXEL_BYTES, pack, unpack
+from octoprint_ws281x_led_status.util import monotonic
+
+# Strip backends, all have the same interface as rpi_ws281x.PixelStrip
+HARDWARE = "rpi_ws281x"  # The real thing, only works on a Pi
+VIRTUAL = "virtual"  # Records frames in memory, for testing & benchmarking off-Pi
+BACKENDS = [HARDWARE, VIRTUAL]
+
+# Overrides the strip's backend setting when set, eg. WS281X_LED_STATUS_BACKEND=virtual
+BACKEND_ENV_VAR = "WS281X_LED_STATUS_BACKEND"
+
+# Strip types with a white channel, sent as 32 bits per LED instead of 24
+RGBW_STRIP_TYPES = [
+    "SK6812W_STRIP",
+    "SK6812_STRIP_RGBW",
+    "SK6812_STRIP_RBGW",
+    "SK6812_STRIP_GRBW",
+    "SK6812_STRIP_GBRW",
+    "SK6812_STRIP_BRGW",
+    "SK6812_STRIP_BGRW",
+]
+# Low time that latches the data into the LEDs after each frame, as rpi_ws281x uses
+RESET_TIME = 55e-6
+
+
+def get_backend(strip_settings):
+    """
+    :return: (str) name of the backend to use, the environment variable if it is set
+        or the strip settings otherwise
+    """
+    backend = os.environ.get(BACKEND_ENV_VAR) or strip_settings.get("backend", HARDWARE)
+    if backend not in BACKENDS:
+        raise ValueError("Unknown strip backend '{}'".format(backend))
+    return backend
+
+
+def create_strip(backend, strip_settings, gamma=None):
+    """
+    Create the strip, it still has to be started with begin()
+    :param backend: (str) one of BACKENDS, see get_backend
+    :param strip_settings: (dict) the plugin's strip settings
+    :param gamma: gamma lookup table, see util.ColorCorrection
+    :return: PixelStrip or VirtualStrip
+    """
+    if backend == VIRTUAL:
+        return VirtualStrip(
+            num=int(strip_settings["count"]),
+            freq_hz=int(strip_settings["freq_hz"]),
+            brightness=int(strip_settings["brightness"]),
+            strip_type=strip_settings["type"],
+            gamma=gamma,
+        )
+
+    # Only imported when used, so that everything else can run where it isn't installed
+    import rpi_ws281x
+
+    return rpi_ws281x.PixelStrip(
+        num=int(strip_settings["count"]),
+        pin=int(strip_settings["pin"]),
+        freq_hz=int(strip_settings["freq_hz"]),
+        dma=int(strip_settings["dma"]),
+        invert=bool(strip_settings["invert"]),
+        brightness=int(strip_settings["brightness"]),
+        channel=int(strip_settings["channel"]),
+        strip_type=getattr(rpi_ws281x, strip_settings["type"]),
+        gamma=gamma,
+    )
+
+
+def wire_time(num, freq_hz, strip_type=None):
+    """
+    :return: (float) seconds taken to send a frame down the wire to `num` LEDs
+    """
+    bits = 32 if strip_type in RGBW_STRIP_TYPES else 24
+    return num * bits / freq_hz + RESET_TIME
+
+
+class VirtualStrip:
+    """
+    Pure Python strip with the same interface as rpi_ws281x.PixelStrip, that doesn't
+    need a Pi. Each frame shown is recorded, along with its brightness and the time it
+    was shown, into ring buffers allocated up front that hold the last `history` frames.
+
+    Like rpi_ws281x, show() returns once the frame has started sending and only waits
+    for the previous frame to finish, so a frame takes as long as it would on the wire.
+    The LED buffer is a ctypes array, so frames are committed to it the same way as
+    to a PixelStrip's (see framebuffer.led_memory).
+    """
+
+    def __init__(
+        self,
+        num,
+        freq_hz=800000,
+        brightness=255,
+        strip_type=None,
+        gamma=None,
+        history=256,
+        simulate_wire_time=True,
+    ):
+        self.num_pixels = num
+        self.brightness = brightness
+        self.gamma = gamma
+        self.history = history
+        self.wire_time = (
+            wire_time(num, freq_hz, strip_type) if simulate_wire_time else 0
+        )
+
+        self.leds = (ctypes.c_uint32 * num)()
+        self.frame_pixels = (ctypes.c_uint32 * (num * history))()
+        self.frame_brightness = array(str("B"), [0] * history)
+        self.frame_times = array(str("d"), [0.0] * history)
+        # Total shown, the latest frame is at (frame_count - 1) % history
+        self.frame_count = 0
+
+        self._sent = 0.0
+
+    def begin(self):
+        pass
+
+    def show(self):
+        now = monotonic()
+        if now < self._sent:
+            # Previous frame is still being sent
+            time.sleep(self._sent - now)
+            now = monotonic()
+
+        slot = self.frame_count % self.history
+        ctypes.memmove(
+            ctypes.addressof(self.frame_pixels) + slot * self.num_pixels * PIXEL_BYTES,
+            self.leds,
+            self.num_pixels * PIXEL_BYTES,
+        )
+        self.frame_brightness[slot] = self.brightness
+        self.frame_times[slot] = now
+        self.frame_count += 1
+
+        self._sent = now + self.wire_time
+
+    def frames(self, count=None):
+        """
+        Frames still held in the history, oldest first
+        :param count: (int) number of the latest frames to get, default all
+        :return: list of tuples (time shown, pixels as packed colours, brightness)
+        """
+        available = min(self.frame_count, self.history)
+        count = available if count is None else min(count, available)
+
+        frames = []
+        for index in range(self.frame_count - count, self.frame_count):
+            slot = index % self.history
+            start = slot * self.num_pixels
+            frames.append(
+                (
+                    self.frame_times[slot],
+                    self.frame_pixels[start : start + self.num_pixels],
+                    self.frame_brightness[slot],
+                )
+            )
+        return frames
+
+    def led_address(self):
+        """
+        :return: (int) address of the LED buffer
+        """
+        return ctypes.addressof(self.leds)
+
+    def numPixels(self):
+        return self.num_pixels
+
+    def setPixelColor(self, n, color):
+        if n < self.num_pixels:
+            self.leds[n] = color
+
+    def setPixelColorRGB(self, n, red, green, blue, white=0):
+        self.setPixelColor(n, pack(red, green, blue, white))
+
+    def getPixelColor(self, n):
+        return self.leds[n]
+
+    def getPixelColorRGB(self, n):
+        return unpack(self.leds[n])[:3]
+
+    def getPixelColorRGBW(self, n):
+        return unpack(self.leds[n])
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+
+    def getBrightness(self):
+        return self.brightness
+
+    def setGamma(self, gamma):
+        self.gamma = gamma
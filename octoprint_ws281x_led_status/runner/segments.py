@@ -5,6 +5,18 @@ __author__ = "Charlie Powell <cp2004.github@gmail.com"
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
 
+import ctypes
+
+from octoprint_ws281x_led_status.framebuffer import (
+    PIXEL_BYTES,
+    as_pixels,
+    buffer_address,
+    filled_pixels,
+    led_memory,
+    new_pixels,
+    pack,
+)
+
 
 class SegmentManager:
     def __init__(self, strip, settings):
@@ -66,17 +78,62 @@ class StripSegment:
     def setPixelColorRGB(self, index, r, g, b, w=0):
         self.strip.setPixelColorRGB(index + self.start, r, g, b, w)
 
+    def setPixels(self, start, colors):
+        """
+        Set consecutive pixels in one go, anything past the end of the segment is ignored
+        :param start: (int) first pixel of the segment to set
+        :param colors: packed colours, ideally a pixel buffer (see framebuffer.new_pixels)
+        """
+        count = min(len(colors), self.num_pixels - start)
+        if count <= 0:
+            return
+
+        address = led_memory(self.strip)
+        if address is None:
+            # Strip not started (or not a PixelStrip), go the slow way
+            for index in range(count):
+                self.strip.setPixelColor(self.start + start + index, int(colors[index]))
+            return
+
+        colors = as_pixels(colors)
+        ctypes.memmove(
+            address + (self.start + start) * PIXEL_BYTES,
+            buffer_address(colors),
+            count * PIXEL_BYTES,
+        )
+
+    def fill(self, color):
+        """
+        Set every pixel in the segment to one colour
+        :param color: tuple (r, g, b) or (r, g, b, w)
+        """
+        self.setPixels(0, filled_pixels(pack(*color), self.num_pixels))
+
     def getPixels(self):
-        raise NotImplementedError
+        """
+        Get the segment's pixels, as packed colours. Once the strip has been started
+        this is a view of its LED buffer, so it is not copied and reflects any changes.
+        :return: ctypes array, which supports the buffer protocol (eg. numpy.frombuffer),
+            or a copy if the strip's LED buffer is not available
+        """
+        address = led_memory(self.strip)
+        if address is None:
+            return new_pixels(
+                [self.getPixelColor(index) for index in range(self.num_pixels)]
+            )
+
+        return (ctypes.c_uint32 * self.num_pixels).from_address(
+            address + self.start * PIXEL_BYTES
+        )
 
     def getPixelColor(self, index):
         return self.strip.getPixelColor(index + self.start)
 
     def getPixelColorRGB(self, index):
-        self.strip.getPixelColorRGB(index + self.start)
+        return self.strip.getPixelColorRGB(index + self.start)
 
     def getPixelColorRGBW(self, index):
-        self.strip.getPixelColorRGBW(index + self.start)
+        return self.strip.getPixelColorRGBW(index + self.start)
 
 
 class InvalidSegmentError(Exception):
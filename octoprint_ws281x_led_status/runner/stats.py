@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import logging
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets in ms, roughly logarithmic from well under a
+# frame at MAX_FPS up to clearly stuck. Anything longer goes in one more bucket.
+BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+_BUCKETS = tuple(bound / 1000 for bound in BUCKETS_MS)
+
+
+class Histogram:
+    """
+    Fixed size histogram of durations, recording one is a bisect and a few additions
+    so it is cheap enough to do for every frame.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        :return: (float) upper bound in ms of the bucket the percentile falls in, or
+            the maximum if that is lower
+        """
+        if not self.count:
+            return 0.0
+
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                break
+        max_ms = self.max * 1000
+        if index >= len(BUCKETS_MS):
+            return max_ms
+        return min(BUCKETS_MS[index], max_ms)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": self.max * 1000,
+            # Bucket upper bound in ms (None for the overflow bucket): count
+            "buckets": list(zip(BUCKETS_MS + (None,), self.counts)),
+        }
+
+
+class EffectStats:
+    __slots__ = ("render", "show", "overshoot", "frames", "dropped", "time")
+
+    def __init__(self):
+        self.render = Histogram()  # Rendering & committing a frame
+        self.show = Histogram()  # strip.show()
+        self.overshoot = Histogram()  # How late each animated frame was started
+        self.frames = 0  # Shown
+        self.dropped = 0
+        self.time = 0.0  # Seconds the effect has been running, until it was replaced
+
+
+class FrameStats:
+    """
+    Frame timing of each effect the EffectThread has run, keyed by effect name. Only
+    the render thread records, summaries can be taken from any thread.
+    """
+
+    def __init__(self):
+        self.effects = {}
+        self._current = None
+        self._started = None
+
+    def start_effect(self, name, now):
+        if self._current is not None:
+            self._current.time += now - self._started
+
+        self._current = self.effects.get(name)
+        if self._current is None:
+            self._current = self.effects[name] = EffectStats()
+        self._started = now
+
+    def add_render(self, seconds):
+        self._current.render.add(seconds)
+
+    def add_show(self, seconds):
+        if self._current is None:
+            # Fade before any effect has been started
+            return
+        self._current.show.add(seconds)
+        self._current.frames += 1
+
+    def add_overshoot(self, seconds):
+        self._current.overshoot.add(seconds)
+
+    def add_dropped(self, count):
+        self._current.dropped += count
+
+    def summary(self, now):
+        """
+        :return: (dict) effect name: timings, frames & achieved fps
+        """
+        summary = {}
+        current, started = self._current, self._started
+        for name, stats in list(self.effects.items()):
+            running = stats.time
+            if stats is current:
+                running += now - started
+
+            summary[name] = {
+                "frames": stats.frames,
+                "dropped": stats.dropped,
+                # Over at least a second, or a static effect that has just been
+                # shown would be thousands of fps
+                "fps": stats.frames / max(running, 1.0),
+                "render": stats.render.summary(),
+                "show": stats.show.summary(),
+                "overshoot": stats.overshoot.summary(),
+            }
+        return summary
+
+    def log_summary(self, log, now):
+        """
+        Log a line per effect with the achieved fps and p50/p95/max of each timing
+        :param log: logging function, eg. logger.debug
+        """
+        for name, stats in sorted(self.summary(now).items()):
+            log(
+                "Frame stats for {}: {:.1f} fps, {} frames, {} dropped, ms "
+                "p50/p95/max - render {}, show {}, overshoot {}".format(
+                    name,
+                    stats["fps"],
+                    stats["frames"],
+                    stats["dropped"],
+                    format_timing(stats["render"]),
+                    format_timing(stats["show"]),
+                    format_timing(stats["overshoot"]),
+                )
+            )
+
+
+def format_timing(summary):
+    return "{p50_ms:.2f}/{p95_ms:.2f}/{max_ms:.2f}".format(**summary)
+
+
+class LastErrorHandler(logging.Handler):
+    """
+    Keeps the last error logged, to be reported to the plugin
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self, level=logging.ERROR)
+        self.last_error = None
+
+    def emit(self, record):
+        message = record.getMessage()
+        if record.exc_info and record.exc_info[0] is not None:
+            message = "{}: {}".format(record.exc_info[0].__name__, message)
+        self.last_error = {"message": message, "time": record.created}
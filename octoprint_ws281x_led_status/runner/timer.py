@@ -9,8 +9,6 @@ __copyright__ = (
 
 from datetime import datetime
 
-from octoprint.util import RepeatedTimer
-
 # TODO Test this whole module in Python 2...
 
 
@@ -30,6 +28,9 @@ class ActiveTimer:
 
         if settings["enabled"]:
             # Only create the timer if necessary, as minimal logic as possible
+            # Imported here, so the runner only loads OctoPrint's utilities if needed
+            from octoprint.util import RepeatedTimer
+
             self.timer = self.timer = RepeatedTimer(
                 30,
                 self.check_times,
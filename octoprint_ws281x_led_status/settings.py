@@ -5,6 +5,8 @@ __author__ = "Charlie Powell <cp2004.github@gmail.com"
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
 
+from collections import namedtuple
+
 # noinspection PyPackageRequirements
 from octoprint.util import dict_merge
 
@@ -24,6 +26,8 @@ defaults = {
         "adjustment": {"R": 100, "G": 100, "B": 100},
         "white_override": False,
         "white_brightness": 50,
+        "gamma": 1.0,
+        "backend": "rpi_ws281x",
     },
     "effects": {
         "startup": {
@@ -133,6 +137,61 @@ defaults = {
 }
 
 
+class SettingsSnapshot(
+    namedtuple(
+        "SettingsSnapshot",
+        [
+            "enabled_effects",  # frozenset of effect names
+            "torch_toggle",  # bool
+            "torch_timer",  # int
+            "idle_timeout",  # int
+            "return_to_idle",  # int
+            "tool_key",  # str
+            "cooling_heater",  # str, "tool" or "bed"
+            "cooling_threshold",  # int
+            "progress_temp_start",  # int
+            "at_command_reaction",  # bool
+            "intercept_m150",  # bool
+        ],
+    )
+):
+    """
+    Settings used by the hooks, progress & effect changes, read once instead of through
+    OctoPrint's settings layers on every call. Immutable, it is replaced in one go when
+    settings are saved so other threads never see it half updated.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        :param settings: octoprint.plugin.PluginSettings
+        :return: SettingsSnapshot
+        """
+        return cls(
+            enabled_effects=frozenset(
+                effect
+                for effect in defaults["effects"].keys()
+                if settings.get_boolean(["effects", effect, "enabled"])
+            ),
+            torch_toggle=settings.get_boolean(["effects", "torch", "toggle"]),
+            torch_timer=settings.get_int(["effects", "torch", "timer"]),
+            idle_timeout=settings.get_int(["effects", "idle", "timeout"]),
+            return_to_idle=settings.get_int(["effects", "success", "return_to_idle"]),
+            tool_key=str(settings.get(["effects", "progress_heatup", "tool_key"])),
+            cooling_heater=settings.get(["effects", "progress_cooling", "bed_or_tool"]),
+            cooling_threshold=settings.get_int(
+                ["effects", "progress_cooling", "threshold"]
+            ),
+            progress_temp_start=settings.get_int(["progress_temp_start"]),
+            at_command_reaction=settings.get_boolean(
+                ["features", "at_command_reaction"]
+            ),
+            intercept_m150=settings.get_boolean(["features", "intercept_m150"]),
+        )
+
+
 def migrate_settings(target, current, settings):
     if current is None and target == 1:
         # None => 1
@@ -101,6 +101,22 @@ $(function () {
                     type: "warning",
                     hide: false,
                 });
+            } else if (data.type === "runner_watchdog") {
+                // The effect runner failed & was restarted, or will be shortly
+                new PNotify({
+                    title: "WS281x LED Status: LED effect runner failed",
+                    text:
+                        "<p>" +
+                        _.escape(data.payload.last_failure.reason) +
+                        ".</p><p>" +
+                        (data.payload.restart_in === null
+                            ? "It has been restarted"
+                            : "Restarting it in " + Math.round(data.payload.restart_in) + " seconds") +
+                        " (" +
+                        data.payload.failures +
+                        " failures in a row), check the plugin's debug log for details.</p>",
+                    type: "error",
+                });
             }
         };
 
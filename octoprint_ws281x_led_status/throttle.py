@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import logging
+import threading
+
+from octoprint_ws281x_led_status import constants
+from octoprint_ws281x_led_status.ipc import Full, LockTimeout, MessageTooLarge
+from octoprint_ws281x_led_status.debug_ring import message_fields
+from octoprint_ws281x_led_status.util import monotonic, start_daemon_timer
+
+
+class ThrottledQueue:
+    """
+    Wraps the effect queue, so that messages which would not change anything are not
+    pickled, queued and rendered again.
+
+    * Duplicates of the last message sent are dropped. Duplicates are compared by
+      `key(msg)`, so messages that differ but render the same can be dropped too.
+    * Message types with a minimum interval are rate limited. A message arriving too
+      soon is held back and sent when the interval expires (trailing edge), unless
+      something newer replaces it first, so the final value is never lost.
+
+    Lights, KILL and messages asking the runner to log something always go straight
+    through, see constants.UNTHROTTLED_MESSAGES. Switching the lights forgets the last
+    message sent, as the runner goes back to its previous state, which might not be
+    the same thing (custom effects are never kept as the state).
+
+    With `timestamp`, messages are sent with the monotonic time they were sent under
+    the "sent" key, so the runner can measure how long they waited in the queue.
+
+    The queue is bounded, and nothing already in it is taken back out. When it is
+    full, messages are held back in order and sent as soon as there is room again. A
+    held state message (see constants.STATE_MESSAGE_CLASSES) is dropped when a newer
+    one of the same class is held, so only superseded states are ever lost. Lights,
+    reconfigure & KILL messages are never dropped for room.
+
+    Messages are dropped, and counted:
+    * When `is_alive()` says the runner is not running, since nothing would read them.
+      It starts from the plugin's current state when it is started again.
+    * When they are superseded while held back, as above.
+    * When they are too large to ever fit in the queue (ipc.MessageTooLarge), rather
+      than holding up everything after them.
+    * Once the queue's lock has timed out (ipc.LockTimeout), as the runner is stuck.
+      Nothing more is sent until the runner has been restarted and `reset()` called,
+      so each message doesn't wait for the lock again.
+
+    Messages sent and dropped are recorded in `debug_ring`, if given.
+    """
+
+    def __init__(
+        self,
+        queue,
+        intervals=None,
+        key=None,
+        timestamp=False,
+        is_alive=None,
+        debug_ring=None,
+    ):
+        self._logger = logging.getLogger("octoprint.plugins.ws281x_led_status.throttle")
+
+        self.queue = queue
+        self.intervals = intervals if intervals is not None else {}
+        self.key = key if key is not None else lambda msg: msg
+        self.timestamp = timestamp
+        self.is_alive = is_alive
+        self.debug_ring = debug_ring
+
+        self._lock = threading.Lock()
+        self._last_sent_key = None
+        self._last_sent_time = {}  # msg type: time
+        self._pending = None
+        self._flush_timer = None  # type: threading.Timer
+        # Held back while the queue is full, oldest first
+        self._held = []  # type: list
+        self._retry_timer = None  # type: threading.Timer
+        # The queue's lock timed out, see ipc.LockTimeout
+        self._stuck = False
+        # Whether dropping has been logged since the runner was (re)started
+        self._drop_logged = False
+
+        # Counters
+        self.sent = 0
+        self.suppressed = 0
+        self.dropped = 0
+
+    def put(self, msg):
+        with self._lock:
+            if (
+                msg == constants.KILL_MSG
+                or msg["type"] in constants.UNTHROTTLED_MESSAGES
+            ):
+                if msg == constants.KILL_MSG:
+                    self._cancel_pending()
+                self._send(msg)
+                return
+
+            if self.key(msg) == self._last_sent_key:
+                # Anything held back is older, and what is displayed is already right
+                self._cancel_pending()
+                self.suppressed += 1
+                return
+
+            interval = self.intervals.get(msg["type"], 0)
+            if interval:
+                wait = self._last_sent_time.get(msg["type"], 0) + interval - monotonic()
+                if wait > 0:
+                    if self._pending is not None:
+                        # Replaced before it was sent
+                        self.suppressed += 1
+                    self._pending = msg
+                    if self._flush_timer is None:
+                        self._flush_timer = start_daemon_timer(wait, self._flush)
+                    return
+
+            # Sending now, anything held back is older than this
+            self._cancel_pending()
+            self._send(msg)
+
+    def reset(self):
+        """
+        Forget the last message sent, eg. when the runner has been restarted
+        """
+        with self._lock:
+            self._cancel_pending()
+            self._drop_held()
+            self._stuck = False
+            self._last_sent_key = None
+            self._last_sent_time = {}
+            self._drop_logged = False
+
+    def replace_queue(self, queue):
+        """
+        Send to a new queue from now on, eg. for a restarted runner
+        :return: the old queue
+        """
+        with self._lock:
+            old_queue, self.queue = self.queue, queue
+        return old_queue
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "dropped": self.dropped,
+        }
+
+    def _send(self, msg):
+        if (
+            msg != constants.KILL_MSG
+            and self.is_alive is not None
+            and not self.is_alive()
+        ):
+            self._drop("the effect runner is not running")
+            return
+
+        if not self._stuck:
+            # Anything held back goes first, to keep the order
+            self._send_held()
+            if (self._held or not self._put(msg)) and not self._stuck:
+                self._hold(msg)
+        if self._stuck:
+            self._drop("the effect queue's lock timed out")
+            return
+
+        if msg != constants.KILL_MSG and msg["type"] == "lights":
+            # What is displayed after this is up to the runner
+            self._last_sent_key = None
+        elif (
+            msg != constants.KILL_MSG
+            and msg["type"] not in constants.UNTHROTTLED_MESSAGES
+        ):
+            self._last_sent_key = self.key(msg)
+            self._last_sent_time[msg["type"]] = monotonic()
+
+    def _put(self, msg):
+        """
+        Put without blocking
+        :return: (bool) whether the message is done with, False if the queue is full
+            or its lock timed out
+        """
+        queued = msg
+        if self.timestamp and msg != constants.KILL_MSG:
+            queued = dict(msg, sent=monotonic())
+        try:
+            self.queue.put(queued, False)
+        except LockTimeout:
+            self._logger.error(
+                "Timed out waiting for the effect queue's lock, not sending anything "
+                "more until the effect runner has been restarted"
+            )
+            self._stuck = True
+            self._drop_held()
+            return False
+        except MessageTooLarge as e:
+            self._logger.error(
+                "Not sending a {} message to the effect runner: {}".format(
+                    message_fields(msg)["type"], e
+                )
+            )
+            self._drop("the message is too large for the effect queue")
+            return True
+        except Full:
+            return False
+
+        self.sent += 1
+        if self.debug_ring is not None:
+            self.debug_ring.record("sent", **message_fields(msg))
+        return True
+
+    def _hold(self, msg):
+        msg_class = None
+        if msg != constants.KILL_MSG:
+            msg_class = constants.STATE_MESSAGE_CLASSES.get(msg["type"])
+        if msg_class is not None:
+            for held in self._held:
+                if held != constants.KILL_MSG and self._supersedes(
+                    msg, msg_class, held
+                ):
+                    self._held.remove(held)
+                    self._drop("the effect queue is full, replaced by a newer state")
+                    # Only ever one held per class
+                    break
+
+        if self.debug_ring is not None:
+            self.debug_ring.record("held", **message_fields(msg))
+        self._held.append(msg)
+        if self._retry_timer is None:
+            self._retry_timer = start_daemon_timer(
+                constants.IPC_FULL_RETRY_INTERVAL, self._retry
+            )
+
+    @staticmethod
+    def _supersedes(msg, msg_class, held):
+        if constants.STATE_MESSAGE_CLASSES.get(held["type"]) != msg_class:
+            return False
+        # A bare M150 repeats the previous colour, which would be lost
+        return not (
+            msg_class == "M150"
+            and msg["command"].upper() == "M150"
+            and held["command"].upper() != "M150"
+        )
+
+    def _send_held(self):
+        while self._held and self._put(self._held[0]):
+            self._held.pop(0)
+
+    def _retry(self):
+        with self._lock:
+            self._retry_timer = None
+            if self.is_alive is not None and not self.is_alive():
+                # Nothing will make room, the restarted runner gets the current state
+                self._drop_held()
+                return
+            self._send_held()
+            if self._held:
+                self._retry_timer = start_daemon_timer(
+                    constants.IPC_FULL_RETRY_INTERVAL, self._retry
+                )
+
+    def _drop_held(self):
+        for _msg in self._held:
+            self._drop("the effect runner was restarted or is stuck")
+        self._held = []
+        if self._retry_timer is not None:
+            self._retry_timer.cancel()
+            self._retry_timer = None
+
+    def _drop(self, reason):
+        self.dropped += 1
+        if self.debug_ring is not None:
+            self.debug_ring.record("dropped", reason=reason)
+        if not self._drop_logged:
+            self._logger.warning(
+                "Dropping messages for the effect runner, {} ({} dropped so far)".format(
+                    reason, self.dropped
+                )
+            )
+            self._drop_logged = True
+        else:
+            self._logger.debug(
+                "Dropped a message for the effect runner, {}".format(reason)
+            )
+
+    def _flush(self):
+        with self._lock:
+            self._flush_timer = None
+            if self._pending is not None:
+                msg = self._pending
+                self._pending = None
+                self._send(msg)
+
+    def _cancel_pending(self):
+        if self._pending is not None:
+            self.suppressed += 1
+            self._pending = None
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
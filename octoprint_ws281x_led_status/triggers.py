@@ -3,6 +3,10 @@ import logging
 import re
 
 from octoprint.events import all_events
+from octoprint.util.comm import gcode_command_for_cmd
+
+# References to groups by number, which change when patterns are combined
+NUMBERED_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?\(\d")
 
 """
 TODOs
@@ -25,6 +29,14 @@ class Trigger:
         self.gcode_exact_subscriptions = []
         self.gcode_regex_subscriptions = []
 
+        # Built from the subscriptions by compile_gcode_subscriptions
+        self.gcode_command_index = {}  # G/M code: message
+        self.gcode_exact_index = {}  # line: message
+        self.gcode_regex_rules = []  # (compiled pattern, message)
+        self.gcode_regex = None  # All the rules in one pattern, if they can be combined
+        # G/M codes a line needs to match any gcode rule, None if any line could match
+        self.gcodes = frozenset()
+
         self.effect_queue = effect_queue
 
     def register_atcommand_handler(self, match, effect, color, delay):
@@ -136,6 +148,67 @@ class Trigger:
                 )
                 self._logger.exception(e)
 
+        self.compile_gcode_subscriptions()
+
+    def compile_gcode_subscriptions(self):
+        """
+        Index the gcode subscriptions, since they are checked against every line sent
+        to the printer. The first subscription of each type that matches wins, same as
+        checking them in order.
+        """
+        self.gcode_command_index = {}
+        for subscription in self.gcode_command_subscriptions:
+            self.gcode_command_index.setdefault(
+                subscription["match"],
+                gcode_message(subscription, "gcode match"),
+            )
+
+        self.gcode_exact_index = {}
+        for subscription in self.gcode_exact_subscriptions:
+            self.gcode_exact_index.setdefault(
+                subscription["match"],
+                gcode_message(subscription, "gcode exact"),
+            )
+
+        self.gcode_regex_rules = []
+        self.gcode_regex = None
+        self.gcodes = frozenset(self.gcode_command_index.keys()) | frozenset(
+            gcode_command_for_cmd(line) for line in self.gcode_exact_index.keys()
+        )
+        for subscription in self.gcode_regex_subscriptions:
+            try:
+                compiled = re.compile(subscription["match"])
+            except re.error as e:
+                self._logger.warning(
+                    "Invalid regex ({}), ignoring: {}".format(subscription["match"], e)
+                )
+                continue
+            self.gcode_regex_rules.append(
+                (compiled, gcode_message(subscription, "gcode regex"))
+            )
+            # Could match anything
+            self.gcodes = None
+
+        if not self.gcode_regex_rules or any(
+            NUMBERED_GROUP_REFERENCE.search(compiled.pattern)
+            for compiled, _message in self.gcode_regex_rules
+        ):
+            # Group numbers change when patterns are combined, check one by one
+            return
+
+        # Only used to rule out lines that match nothing, which is almost all of them.
+        # Non-capturing groups, since re can't optimise alternations of capturing ones.
+        try:
+            self.gcode_regex = re.compile(
+                "|".join(
+                    "(?:{})".format(compiled.pattern)
+                    for compiled, _message in self.gcode_regex_rules
+                )
+            )
+        except re.error:
+            # eg. global flags or clashing group names
+            self.gcode_regex = None
+
     def on_event(self, event):
         for event in self.event_subscriptions:
             if event["match"] == event:
@@ -166,47 +239,32 @@ class Trigger:
                 )
 
     def on_gcode_command(self, gcode, cmd):
-        # TODO any performance optimisations?
-        for gcode_command in self.gcode_command_subscriptions:
-            # Match only G/M code
-            if gcode_command["match"] == gcode:
-                self.effect_queue.put(
-                    {
-                        "type": "custom",
-                        "effect": gcode_command["effect"],
-                        "color": gcode_command["color"],
-                        "delay": gcode_command["delay"],
-                        "trigger": "gcode match: {}".format(gcode_command["match"]),
-                    }
-                )
-                # Once we have a match, we can stop looking
-                break
-        for gcode_exact in self.gcode_exact_subscriptions:
-            # Match whole line sent to printer
-            if gcode_exact["match"] == cmd:
-                self.effect_queue.put(
-                    {
-                        "type": "custom",
-                        "effect": gcode_exact["effect"],
-                        "color": gcode_exact["color"],
-                        "delay": gcode_exact["delay"],
-                        "trigger": "gcode exact: {}".format(gcode_exact["match"]),
-                    }
-                )
-                # Once we have a match, we can stop looking
-                break
+        # Match only G/M code
+        message = self.gcode_command_index.get(gcode)
+        if message is not None:
+            self.effect_queue.put(dict(message))
 
-        for gcode_regex in self.gcode_regex_subscriptions:
-            # Match cmd by regex
-            if re.match(gcode_regex["match"], cmd):
-                self.effect_queue.put(
-                    {
-                        "type": "custom",
-                        "effect": gcode_regex["effect"],
-                        "color": gcode_regex["color"],
-                        "delay": gcode_regex["delay"],
-                        "trigger": "gcode regex: {}".format(gcode_regex["match"]),
-                    }
-                )
-                # Once we have a match, we can stop looking
-                break
+        # Match whole line sent to printer
+        message = self.gcode_exact_index.get(cmd)
+        if message is not None:
+            self.effect_queue.put(dict(message))
+
+        # Match cmd by regex
+        if self.gcode_regex_rules and (
+            self.gcode_regex is None or self.gcode_regex.match(cmd)
+        ):
+            for compiled, message in self.gcode_regex_rules:
+                if compiled.match(cmd):
+                    self.effect_queue.put(dict(message))
+                    # Once we have a match, we can stop looking
+                    break
+
+
+def gcode_message(subscription, trigger):
+    return {
+        "type": "custom",
+        "effect": subscription["effect"],
+        "color": subscription["color"],
+        "delay": subscription["delay"],
+        "trigger": "{}: {}".format(trigger, subscription["match"]),
+    }
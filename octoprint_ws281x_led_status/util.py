@@ -7,10 +7,27 @@ __copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the ter
 
 import logging
 import threading
-from time import sleep, tzname
+from time import tzname
 
-from octoprint.util import ResettableTimer
-from octoprint.util.commandline import CommandlineCaller
+try:
+    # Py3
+    from time import monotonic  # noqa: F401
+except ImportError:
+    # Py2
+    from time import time as monotonic  # noqa: F401
+
+try:
+    # Py3
+    import queue
+except ImportError:
+    # Py2
+    import Queue as queue
+
+# Unbounded FIFO, SimpleQueue is implemented in C and much cheaper to put to (Py3.7+)
+SimpleQueue = getattr(queue, "SimpleQueue", queue.Queue)
+
+# OctoPrint's utilities are imported where they are used, this module is also imported
+# by the effect runner which should not have to load them
 
 
 def hex_to_rgb(h):
@@ -20,17 +37,53 @@ def hex_to_rgb(h):
     return tuple(int(h[i : i + 2], 16) for i in (0, 2, 4))
 
 
-def apply_color_correction(settings, r, g, b):
-    red = blue = green = white = 0
-    # Use white LEDs if white override is enabled
-    if r == g == b == 255 and settings["white_override"] is True:
-        white = int((int(settings["white_brightness"]) / 100) * 255)
-    else:
-        red = int_0_255(r * (int(settings["red"]) / 100))
-        green = int_0_255(g * (int(settings["green"]) / 100))
-        blue = int_0_255(b * (int(settings["blue"]) / 100))
+def channel_table(percent):
+    """
+    Lookup table to scale a colour channel by a percentage
+    :param percent: adjustment for the channel, 100 is unchanged
+    :return: (list) 256 values 0-255
+    """
+    scale = int(percent) / 100
+    return [int_0_255(value * scale) for value in range(256)]
+
+
+def gamma_table(gamma):
+    """
+    Lookup table for a gamma curve, in the form rpi_ws281x takes
+    :param gamma: (float) 1.0 is linear
+    :return: (list) 256 values 0-255
+    """
+    gamma = float(gamma)
+    return [int_0_255(round(((value / 255) ** gamma) * 255)) for value in range(256)]
+
+
+class ColorCorrection:
+    """
+    Colour correction from the strip settings, as lookup tables so nothing is
+    worked out again for each colour. Build a new one when the settings change.
+    """
+
+    def __init__(self, strip_settings):
+        self.red = channel_table(strip_settings["adjustment"]["R"])
+        self.green = channel_table(strip_settings["adjustment"]["G"])
+        self.blue = channel_table(strip_settings["adjustment"]["B"])
+        self.white_override = strip_settings["white_override"] is True
+        self.white_brightness = int_0_255(
+            (int(strip_settings["white_brightness"]) / 100) * 255
+        )
+        # Applied to every pixel by rpi_ws281x when the frame is sent
+        self.gamma = gamma_table(strip_settings.get("gamma", 1.0))
+
+    def apply(self, r, g, b):
+        """
+        :param r, g, b: colour channels, 0-255
+        :return: tuple r, g, b, w from 0-255
+        """
+        # Use white LEDs if white override is enabled
+        if r == g == b == 255 and self.white_override:
+            return 0, 0, 0, self.white_brightness
 
-    return int_0_255(red), int_0_255(green), int_0_255(blue), int_0_255(white)
+        return self.red[int(r)], self.green[int(g)], self.blue[int(b)], 0
 
 
 def blend_two_colors(colour1, colour2, percent_of_c1=None):
@@ -50,40 +103,6 @@ def average(a, b):
     return int((a + b) / 2)
 
 
-def milli_sleep(m_secs):
-    if not isinstance(m_secs, float):
-        m_secs = float(m_secs)
-    sleep(m_secs / 1000)
-
-
-def q_poll_sleep(secs, queue):
-    """
-    Polls the queue before sleeping, so that we can abort effect if necessary
-    :param secs: time in seconds
-    :param queue: multiprocessing.queue() object
-    :return: bool: False if we should not proceed, true if we can
-    """
-    if not isinstance(secs, float):
-        secs = float(secs)
-    if not queue.empty():
-        return False
-    else:
-        sleep(secs)
-        return True
-
-
-def q_poll_milli_sleep(m_secs, queue):
-    """
-    Polls the queue before sleeping, so that we can abort effect if necessary
-    :param m_secs: time in milliseconds
-    :param queue: multiprocessing.queue() object
-    :return: bool: False if we should not proceed, true if we can
-    """
-    if not isinstance(m_secs, int):
-        m_secs = int(m_secs)
-    return q_poll_sleep(m_secs / 1000, queue)
-
-
 def wheel(pos):
     """Get a 3 tuple r, g, b value for a position 0-255
     From Adafruit's strandtest.py
@@ -100,6 +119,8 @@ def wheel(pos):
 
 
 def run_system_command(command, password=None):
+    from octoprint.util.commandline import CommandlineCaller
+
     logger = logging.getLogger("octoprint.plugins.ws281x_led_status.commandline")
     caller = CommandlineCaller()
     try:
@@ -166,11 +187,6 @@ def int_0_255(value):
     return max(min(int(value), 255), 0)
 
 
-def clear_queue(q):
-    while not q.empty():
-        q.get(False)
-
-
 def recursively_log(config, prefix=""):
     lines = []
     for key, value in config.items():
@@ -215,6 +231,8 @@ class RestartableTimer:
             self.timer.cancel()
 
     def create_timer(self):
+        from octoprint.util import ResettableTimer
+
         self.stop()
 
         self.timer = ResettableTimer(
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import logging
+import threading
+import time
+
+from octoprint_ws281x_led_status import constants
+from octoprint_ws281x_led_status.util import monotonic, start_daemon_thread
+
+
+class RunnerWatchdog:
+    """
+    Checks on the effect runner every RUNNER_WATCHDOG_INTERVAL, and restarts it with
+    the plugin's current state if it has exited or stopped responding.
+
+    The runner beats by writing the monotonic time into the plugin's shared
+    `runner_heartbeat`, from its main loop, held back to when a frame started if the
+    render thread is stuck on it. Without a beat for RUNNER_HEARTBEAT_TIMEOUT (or
+    RUNNER_START_TIMEOUT for the first) it is considered hung, and terminated.
+
+    Repeated failures back off exponentially, so a runner that can't start (eg. a
+    misconfigured strip) isn't restarted in a tight loop.
+    """
+
+    def __init__(self, plugin):
+        self._logger = logging.getLogger("octoprint.plugins.ws281x_led_status.watchdog")
+        self.plugin = plugin
+
+        self._stop_event = threading.Event()
+        self._thread = None  # type: threading.Thread
+
+        self.started = None  # Monotonic time the runner was last started
+        self.restart_due = None  # Monotonic time of the next restart, when backing off
+        self.failures = 0  # In a row, see RUNNER_STABLE_TIME
+        self.restarts = 0
+        self.last_failure = None  # type: dict
+
+    def start(self):
+        self._thread = start_daemon_thread(
+            target=self._run, name="WS281x LED Status runner watchdog"
+        )
+
+    def stop(self):
+        self._stop_event.set()
+
+    def runner_started(self, now):
+        """
+        Called by the plugin whenever it starts the runner
+        """
+        self.started = now
+        self.restart_due = None
+
+    def status(self, now):
+        """
+        :return: (dict) restarts, failures in a row, the last failure & seconds until
+            the next restart if one is waiting
+        """
+        return {
+            "restarts": self.restarts,
+            "failures": self.failures,
+            "last_failure": self.last_failure,
+            "restart_in": (
+                max(self.restart_due - now, 0) if self.restart_due is not None else None
+            ),
+        }
+
+    def check(self, now):
+        with self.plugin.runner_lock:
+            process = self.plugin.current_effect_process
+            if process is None:
+                # Not started yet
+                return
+
+            if self.restart_due is not None:
+                if now >= self.restart_due:
+                    self.restart(now)
+                return
+
+            reason = self.find_failure(process, now)
+            if reason is None:
+                if self.failures and now - self.started >= constants.RUNNER_STABLE_TIME:
+                    self._logger.info("Effect runner has been running fine again")
+                    self.failures = 0
+                return
+
+            self.failed(process, reason, now)
+
+    def find_failure(self, process, now):
+        """
+        :return: (str) reason the runner has failed, None if it is fine
+        """
+        if not process.is_alive():
+            return "the runner exited unexpectedly, exit code {}".format(
+                process.exitcode
+            )
+
+        beat = self.plugin.runner_heartbeat.value
+        if beat > self.started:
+            if now - beat > constants.RUNNER_HEARTBEAT_TIMEOUT:
+                return "the runner stopped responding {:.0f} seconds ago".format(
+                    now - beat
+                )
+        elif now - self.started > constants.RUNNER_START_TIMEOUT:
+            return "the runner did not finish starting within {} seconds".format(
+                constants.RUNNER_START_TIMEOUT
+            )
+
+        return None
+
+    def failed(self, process, reason, now):
+        self.failures += 1
+        self.last_failure = {"reason": reason, "time": time.time()}
+        self.plugin.debug_ring.record("runner_failed", reason=reason)
+
+        if process.is_alive():
+            # Hung, so it won't read a KILL message
+            process.terminate()
+            process.join(constants.RUNNER_STOP_TIMEOUT)
+
+        backoff = self.backoff()
+        self._logger.error(
+            "Effect runner failed, {}. Restarting it {} ({} failures in a row), see "
+            "the plugin's debug log for details".format(
+                reason,
+                "in {} seconds".format(backoff) if backoff else "now",
+                self.failures,
+            )
+        )
+        if backoff:
+            self.restart_due = now + backoff
+            self.send_status(now)
+        else:
+            self.restart(now)
+
+    def backoff(self):
+        """
+        :return: (int) seconds to wait before restarting after the latest failure
+        """
+        if self.failures <= 1:
+            return 0
+        return min(
+            constants.RUNNER_RESTART_BACKOFF * 2 ** (self.failures - 2),
+            constants.RUNNER_RESTART_BACKOFF_MAX,
+        )
+
+    def restart(self, now):
+        self.restarts += 1
+        self.plugin.start_effect_process()
+        self.send_status(now)
+
+    def send_status(self, now):
+        self.plugin._send_UI_msg("runner_watchdog", self.status(now))
+
+    def _run(self):
+        while not self._stop_event.wait(constants.RUNNER_WATCHDOG_INTERVAL):
+            try:
+                self.check(monotonic())
+            except Exception:
+                self._logger.exception("Error checking on the effect runner")
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Entry point of the WS281x LED Status effect runner process
+
+The runner is started in a fresh interpreter ('spawn'), instead of a fork of OctoPrint
+that would share (and, as refcounts change, slowly copy) OctoPrint's whole heap. This
+module is what the new interpreter imports to start it. It is kept outside of the
+plugin's package, since importing that would import OctoPrint's plugin system too.
+"""
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import importlib
+import multiprocessing
+import sys
+import types
+
+PACKAGE = "octoprint_ws281x_led_status"
+
+# 'spawn' rather than 'forkserver', which would keep a server process running as well
+START_METHOD = "spawn"
+
+
+def get_context():
+    """
+    :return: multiprocessing context to create the runner process & its queue with
+    """
+    try:
+        return multiprocessing.get_context(START_METHOD)
+    except AttributeError:
+        # Py2, only fork is available
+        return multiprocessing
+
+
+def import_package_module(name):
+    """
+    Import a module of the plugin's package, without the package __init__ if it
+    hasn't already been imported (eg. by forking OctoPrint)
+    :param name: (str) module name, relative to the package
+    :return: the module
+    """
+    if PACKAGE not in sys.modules:
+        from importlib.util import find_spec
+
+        # Stands in for the package, so the runner's modules can be imported from it
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = list(find_spec(PACKAGE).submodule_search_locations)
+        sys.modules[PACKAGE] = package
+
+    return importlib.import_module("{}.{}".format(PACKAGE, name))
+
+
+def import_runner():
+    """
+    :return: EffectRunner class
+    """
+    return import_package_module("runner").EffectRunner
+
+
+def attach_queue(name, capacity, lock, count):
+    """
+    Rebuild the plugin's ipc.RingBufferQueue in the runner process. The queue is
+    pickled as a call to this, so unpickling the runner's arguments doesn't import
+    the plugin's package __init__ (and OctoPrint with it) before `run`.
+    """
+    return import_package_module("ipc").RingBufferQueue.attach(
+        name, capacity, lock, count
+    )
+
+
+def run(**kwargs):
+    """
+    Target of the runner process, see EffectRunner for the arguments
+    """
+    import_runner()(**kwargs)
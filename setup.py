@@ -63,7 +63,11 @@ plugin_ignored_packages = []
 # Example:
 #     plugin_requires = ["someDependency==dev"]
 #     additional_setup_parameters = {"dependency_links": ["https://github.com/someUser/someRepo/archive/master.zip#egg=someDependency-dev"]}
-additional_setup_parameters = {}
+additional_setup_parameters = {
+    # Entry point of the effect runner process, outside the plugin package so that
+    # starting it doesn't import the plugin (& OctoPrint's plugin system)
+    "py_modules": ["octoprint_ws281x_led_status_runner"]
+}
 
 ########################################################################################################################
 
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import os
+import time
+import unittest
+
+import mock
+
+STRIP_SETTINGS = {
+    "count": 10,
+    "freq_hz": 800000,
+    "brightness": 50,
+    "type": "WS2811_STRIP_GRB",
+}
+
+
+class GetBackendTestCase(unittest.TestCase):
+    def test_setting(self):
+        from octoprint_ws281x_led_status.runner import backends
+
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(backends.get_backend({}), backends.HARDWARE)
+            self.assertEqual(
+                backends.get_backend({"backend": "virtual"}), backends.VIRTUAL
+            )
+
+    def test_environment_variable(self):
+        from octoprint_ws281x_led_status.runner import backends
+
+        with mock.patch.dict(os.environ, {backends.BACKEND_ENV_VAR: "virtual"}):
+            self.assertEqual(
+                backends.get_backend({"backend": "rpi_ws281x"}), backends.VIRTUAL
+            )
+
+    def test_unknown(self):
+        from octoprint_ws281x_led_status.runner import backends
+
+        with mock.patch.dict(os.environ, clear=True):
+            with self.assertRaises(ValueError):
+                backends.get_backend({"backend": "unknown"})
+
+    def test_create_virtual(self):
+        from octoprint_ws281x_led_status.runner import backends
+
+        strip = backends.create_strip(backends.VIRTUAL, STRIP_SETTINGS)
+        self.assertIsInstance(strip, backends.VirtualStrip)
+        self.assertEqual(strip.numPixels(), 10)
+        self.assertEqual(strip.getBrightness(), 50)
+
+
+class VirtualStripTestCase(unittest.TestCase):
+    def test_frames(self):
+        from octoprint_ws281x_led_status.runner.backends import VirtualStrip
+
+        strip = VirtualStrip(3, history=2, simulate_wire_time=False)
+        for value in range(1, 4):
+            strip.setPixelColor(0, value)
+            strip.setBrightness(value * 10)
+            strip.show()
+
+        # Only the last two are held
+        self.assertEqual(strip.frame_count, 3)
+        frames = strip.frames()
+        self.assertEqual([frame[1] for frame in frames], [[2, 0, 0], [3, 0, 0]])
+        self.assertEqual([frame[2] for frame in frames], [20, 30])
+        self.assertEqual(strip.frames(1)[0][1], [3, 0, 0])
+
+    def test_pixels(self):
+        from octoprint_ws281x_led_status.runner.backends import VirtualStrip
+
+        strip = VirtualStrip(3)
+        strip.setPixelColorRGB(1, 1, 2, 3, 4)
+        # Ignored, like rpi_ws281x
+        strip.setPixelColor(3, 0xFFFFFF)
+
+        self.assertEqual(strip.getPixelColor(1), 0x04010203)
+        self.assertEqual(strip.getPixelColorRGB(1), (1, 2, 3))
+        self.assertEqual(strip.getPixelColorRGBW(1), (1, 2, 3, 4))
+
+    def test_wire_time(self):
+        from octoprint_ws281x_led_status.runner.backends import VirtualStrip, wire_time
+
+        # 24 bits per LED at 800kHz is 30us
+        self.assertAlmostEqual(wire_time(100, 800000), 0.003055)
+        self.assertAlmostEqual(wire_time(100, 800000, "SK6812_STRIP_RGBW"), 0.004055)
+
+        strip = VirtualStrip(1000)
+        start = time.time()
+        for _ in range(4):
+            strip.show()
+        # The last frame is still being sent, so only three are waited for
+        self.assertGreaterEqual(time.time() - start, 3 * strip.wire_time)
+
+    def test_frame_buffer_commit(self):
+        from octoprint_ws281x_led_status.framebuffer import FrameBuffer, led_memory
+        from octoprint_ws281x_led_status.runner.backends import VirtualStrip
+        from octoprint_ws281x_led_status.runner.segments import StripSegment
+
+        strip = VirtualStrip(6, simulate_wire_time=False)
+        self.assertEqual(led_memory(strip), strip.led_address())
+
+        frame_buffer = FrameBuffer(StripSegment(strip, 1, end=5))
+        frame_buffer.fill((1, 2, 3))
+        frame_buffer.commit()
+        strip.show()
+
+        self.assertEqual(strip.frames()[0][1], [0] + [0x010203] * 4 + [0])
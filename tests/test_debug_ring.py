@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import logging
+import unittest
+
+
+class DebugRingTestCase(unittest.TestCase):
+    def test_dump(self):
+        from octoprint_ws281x_led_status.debug_ring import DebugRing
+
+        ring = DebugRing(size=3)
+        lines = []
+
+        self.assertEqual(ring.dump(lines.append, "test"), 0)
+        self.assertEqual(lines, [])
+
+        ring.record("received", type="standard", effect="idle", lag_ms=0.4162)
+        self.assertEqual(ring.dump(lines.append, "test"), 1)
+        dumped = lines[-1].splitlines()
+        self.assertEqual(dumped[0], "Debug ring, test: 1 events")
+        self.assertTrue(
+            dumped[1].endswith(" received type=standard effect=idle lag_ms=0.42")
+        )
+
+        # Only what is new since the last dump, noting what has been overwritten
+        for value in range(5):
+            ring.record("received", type="progress", value=value)
+        self.assertEqual(ring.dump(lines.append, "test"), 3)
+        dumped = lines[-1].splitlines()
+        self.assertEqual(
+            dumped[0], "Debug ring, test: 3 events (2 older were overwritten)"
+        )
+        self.assertTrue(dumped[1].endswith(" received type=progress value=2"))
+        self.assertTrue(dumped[3].endswith(" received type=progress value=4"))
+
+    def test_message_fields(self):
+        from octoprint_ws281x_led_status.debug_ring import message_fields
+
+        self.assertEqual(message_fields("KILL"), {"type": "KILL"})
+        self.assertEqual(
+            message_fields(
+                {
+                    "type": "reconfigure",
+                    "state": {"type": "standard", "effect": "idle"},
+                    "debug": False,
+                }
+            ),
+            {"type": "reconfigure"},
+        )
+
+    def test_dump_on_error(self):
+        from octoprint_ws281x_led_status.debug_ring import (
+            DebugRing,
+            DumpOnErrorHandler,
+        )
+
+        ring = DebugRing()
+        lines = []
+        logger = logging.getLogger("test.debug_ring")
+        logger.propagate = False
+        handler = DumpOnErrorHandler(ring, lines.append)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        ring.record("lights", on=True)
+        logger.warning("Not an error")
+        self.assertEqual(lines, [])
+
+        logger.error("Error showing frame")
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("Debug ring, error logged: 1 events"))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import unittest
+
+import mock
+
+
+class PixelListStrip:
+    def __init__(self, num):
+        self.pixels = [0] * num
+
+    def numPixels(self):
+        return len(self.pixels)
+
+    def setPixelColor(self, n, color):
+        self.pixels[n] = color
+
+
+class FrameBufferTestCase(unittest.TestCase):
+    use_numpy = True
+
+    def setUp(self):
+        from octoprint_ws281x_led_status import framebuffer
+
+        if not self.use_numpy:
+            patcher = mock.patch.object(framebuffer, "numpy", None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        elif framebuffer.numpy is None:
+            self.skipTest("numpy is not installed")
+
+        self.framebuffer = framebuffer
+
+    def pixels(self, frame_buffer):
+        return [int(value) for value in frame_buffer.pixels]
+
+    def test_fill(self):
+        frame_buffer = self.framebuffer.FrameBuffer(PixelListStrip(6))
+        frame_buffer.fill((255, 0, 0))
+        frame_buffer.fill((0, 0, 255, 10), 2, 4)
+        frame_buffer.fill((0, 255, 0), 5, 100)
+
+        self.assertEqual(
+            self.pixels(frame_buffer),
+            [0xFF0000, 0xFF0000, 0x0A0000FF, 0x0A0000FF, 0xFF0000, 0x00FF00],
+        )
+
+    def test_out_of_range_ignored(self):
+        frame_buffer = self.framebuffer.FrameBuffer(PixelListStrip(3))
+        frame_buffer.setPixelColorRGB(3, 255, 255, 255)
+
+        self.assertEqual(self.pixels(frame_buffer), [0, 0, 0])
+
+    def test_palette(self):
+        from octoprint_ws281x_led_status.util import wheel
+
+        wheel_palette = self.framebuffer.palette([wheel(pos) for pos in range(256)])
+        frame_buffer = self.framebuffer.FrameBuffer(PixelListStrip(4))
+        frame_buffer.setPixelsFromPalette(
+            wheel_palette, self.framebuffer.new_indices([0, 100, 200, 255]), 60
+        )
+
+        self.assertEqual(
+            [frame_buffer.getPixelColorRGBW(i)[:3] for i in range(4)],
+            [wheel(60), wheel(160), wheel(4), wheel(59)],
+        )
+
+    def test_commit(self):
+        strip = PixelListStrip(5)
+        frame_buffer = self.framebuffer.FrameBuffer(strip, 1, 3)
+        frame_buffer.fill((1, 2, 3))
+        frame_buffer.commit()
+
+        self.assertEqual(strip.pixels, [0, 0x010203, 0x010203, 0x010203, 0])
+
+
+class FrameBufferArrayTestCase(FrameBufferTestCase):
+    use_numpy = False
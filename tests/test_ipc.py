@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import multiprocessing
+import time
+import unittest
+
+MESSAGES = [
+    "KILL",
+    {"type": "lights", "action": "on"},
+    {"type": "progress", "effect": "progress_print", "value": 42},
+    {"type": "M150", "command": "M150 R255 U0 B0"},
+    {"type": "standard", "effect": "success"},
+    {
+        "type": "custom",
+        "effect": "Solid Color",
+        "color": "#ff0000",
+        "delay": 10,
+        "trigger": "gcode match: M600",
+    },
+]
+
+
+def decode(record):
+    from octoprint_ws281x_led_status import ipc
+
+    length, code, sent = ipc.RECORD.unpack_from(record)
+    return code, ipc.decode(code, sent, record[ipc.RECORD.size :])
+
+
+def echo(queue, conn):
+    # Runner end of the queue, sends back what it gets until KILL
+    while True:
+        msg = queue.get(timeout=10)
+        conn.send(msg)
+        if msg == "KILL":
+            break
+
+
+class EncodeTestCase(unittest.TestCase):
+    def test_compact(self):
+        from octoprint_ws281x_led_status import ipc
+
+        for msg in MESSAGES:
+            code, decoded = decode(ipc.encode(msg))
+            self.assertNotEqual(code, ipc.PICKLED)
+            self.assertEqual(decoded, msg)
+
+            if msg != "KILL":
+                sent = dict(msg, sent=1234.5)
+                code, decoded = decode(ipc.encode(sent))
+                self.assertTrue(code & ipc.SENT_FLAG)
+                self.assertEqual(decoded, sent)
+
+    def test_pickled(self):
+        from octoprint_ws281x_led_status import ipc
+
+        messages = [
+            # No compact format
+            {"type": "reconfigure", "state": {"type": "standard"}, "debug": True},
+            {"type": "frame_stats", "sent": 1234.5},
+            # Extra or missing fields
+            {"type": "standard", "effect": "idle", "extra": None},
+            {
+                "type": "custom",
+                "effect": "Solid Color",
+                "color": "#ff0000",
+                "delay": 10,
+            },
+            # Types that would not survive the compact format
+            {"type": "progress", "effect": "progress_print", "value": True},
+            {"type": "progress", "effect": "progress_print", "value": 2**64},
+            {"type": "standard", "effect": "idle", "sent": 1234},
+        ]
+        for msg in messages:
+            code, decoded = decode(ipc.encode(msg))
+            self.assertEqual(code, ipc.PICKLED)
+            self.assertEqual(decoded, msg)
+            self.assertEqual(
+                [type(value) for value in decoded.values()],
+                [type(value) for value in msg.values()],
+            )
+
+
+class RingBufferQueueTestCase(unittest.TestCase):
+    def create_queue(self, size):
+        from octoprint_ws281x_led_status.ipc import RingBufferQueue
+
+        queue = RingBufferQueue(multiprocessing, size)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_wrap_around(self):
+        queue = self.create_queue(100)
+
+        # Records of varying lengths, so they wrap at different points in the ring
+        for value in range(200):
+            msg = {
+                "type": "progress",
+                "effect": "progress_print" * (value % 3),
+                "value": value,
+            }
+            queue.put(msg)
+            self.assertEqual(queue.get_nowait(), msg)
+
+        queue.put(MESSAGES[1])
+        queue.put(MESSAGES[2])
+        self.assertEqual(queue.get(timeout=1), MESSAGES[1])
+        self.assertEqual(queue.get(timeout=1), MESSAGES[2])
+
+    def test_empty(self):
+        from octoprint_ws281x_led_status.ipc import Empty
+
+        queue = self.create_queue(100)
+
+        self.assertRaises(Empty, queue.get_nowait)
+        self.assertRaises(Empty, queue.get, timeout=0.01)
+
+    def test_full(self):
+        from octoprint_ws281x_led_status.ipc import Full
+
+        queue = self.create_queue(100)
+        msg = {"type": "standard", "effect": "x" * 20}  # 35 bytes
+
+        queue.put(msg)
+        queue.put(msg)
+        self.assertRaises(Full, queue.put, msg)
+
+        # Nothing was written, and there is room again once one is read
+        queue.get_nowait()
+        queue.put(msg)
+        self.assertEqual(queue.get_nowait(), msg)
+        self.assertEqual(queue.get_nowait(), msg)
+
+    def test_too_large(self):
+        from octoprint_ws281x_led_status.ipc import MessageTooLarge
+
+        queue = self.create_queue(100)
+        msg = {"type": "reconfigure", "strip": "x" * 100}
+
+        # Not Full, as there would never be room for it
+        self.assertRaises(MessageTooLarge, queue.put, msg)
+        queue.put(MESSAGES[1])
+        self.assertEqual(queue.get_nowait(), MESSAGES[1])
+
+    def test_between_processes(self):
+        from octoprint_ws281x_led_status.ipc import Full, RingBufferQueue
+
+        context = multiprocessing.get_context("spawn")
+        queue = RingBufferQueue(context, 256)
+        self.addCleanup(queue.close)
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=echo, args=(queue, sender))
+        process.start()
+
+        # Far more than fits in the ring at once
+        messages = MESSAGES[1:] * 20 + ["KILL"]
+        for msg in messages:
+            while True:
+                try:
+                    queue.put(msg)
+                    break
+                except Full:
+                    time.sleep(0.001)
+
+        received = []
+        while not received or received[-1] != "KILL":
+            received.append(receiver.recv())
+        process.join(10)
+
+        self.assertEqual(received, messages)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import unittest
+
+STATE = {"lights_on": True, "torch_on": False}
+
+
+def runner_status(stats=None):
+    return {
+        "alive": True,
+        "queue": {"sent": 12, "suppressed": 3, "dropped": 1},
+        "stats": stats,
+        "watchdog": {
+            "restarts": 2,
+            "failures": 1,
+            "last_failure": None,
+            "restart_in": None,
+        },
+    }
+
+
+def runner_stats():
+    from octoprint_ws281x_led_status.runner.stats import FrameStats, Histogram
+
+    frame_stats = FrameStats()
+    frame_stats.start_effect('say "hi"', 0)
+    frame_stats.add_render(0.0004)
+    frame_stats.add_show(0.003)
+    queue_lag = Histogram()
+    queue_lag.add(0.002)
+    return {
+        "time": 1600000000.0,
+        "current_effect": 'say "hi"',
+        "fps": 0.5,
+        "dropped_frames": 0,
+        "skipped_shows": 2,
+        "messages_received": 9,
+        "messages_coalesced": {"state": 1},
+        "queue_lag": queue_lag.summary(),
+        "last_error": None,
+        "effects": frame_stats.summary(2),
+    }
+
+
+class PrometheusTextTestCase(unittest.TestCase):
+    def test_no_runner_stats(self):
+        from octoprint_ws281x_led_status.metrics import prometheus_text
+
+        text = prometheus_text(STATE, runner_status())
+        self.assertIn("ws281x_led_status_lights_on 1.0\n", text)
+        self.assertIn("ws281x_led_status_runner_up 1.0\n", text)
+        self.assertIn("ws281x_led_status_queue_suppressed_total 3.0\n", text)
+        self.assertIn("ws281x_led_status_queue_dropped_total 1.0\n", text)
+        self.assertIn("ws281x_led_status_runner_restarts_total 2.0\n", text)
+        self.assertNotIn("runner_fps", text)
+
+    def test_runner_stats(self):
+        from octoprint_ws281x_led_status.metrics import prometheus_text
+
+        lines = prometheus_text(STATE, runner_status(runner_stats())).splitlines()
+
+        effect = 'effect="say \\"hi\\""'
+        self.assertIn(
+            "ws281x_led_status_runner_current_effect_info{{{}}} 1.0".format(effect),
+            lines,
+        )
+        self.assertIn("ws281x_led_status_runner_fps{{{}}} 0.5".format(effect), lines)
+        self.assertIn("# TYPE ws281x_led_status_runner_render_seconds histogram", lines)
+        # Cumulative buckets
+        self.assertIn(
+            'ws281x_led_status_runner_show_seconds_bucket{{{},le="0.002"}} 0.0'.format(
+                effect
+            ),
+            lines,
+        )
+        self.assertIn(
+            'ws281x_led_status_runner_show_seconds_bucket{{{},le="0.005"}} 1.0'.format(
+                effect
+            ),
+            lines,
+        )
+        self.assertIn(
+            'ws281x_led_status_runner_show_seconds_bucket{{{},le="+Inf"}} 1.0'.format(
+                effect
+            ),
+            lines,
+        )
+        self.assertIn(
+            "ws281x_led_status_runner_show_seconds_count{{{}}} 1.0".format(effect),
+            lines,
+        )
+        self.assertIn(
+            'ws281x_led_status_runner_messages_coalesced_total{class="state"} 1.0',
+            lines,
+        )
+        self.assertIn("ws281x_led_status_runner_queue_lag_seconds_count 1.0", lines)
+        self.assertIn(
+            "ws281x_led_status_runner_last_error_timestamp_seconds 0.0", lines
+        )
+        for line in lines:
+            if not line.startswith("#"):
+                self.assertTrue(line.startswith("ws281x_led_status_"), line)
+
+    def test_no_effect_yet(self):
+        from octoprint_ws281x_led_status.metrics import prometheus_text
+
+        stats = dict(runner_stats(), current_effect=None, effects={})
+        text = prometheus_text(STATE, runner_status(stats))
+        self.assertNotIn("current_effect", text)
+        self.assertNotIn("None", text)
+        self.assertIn("ws281x_led_status_runner_messages_received_total 9.0\n", text)
@@ -54,3 +54,189 @@ class TestPlugin(unittest.TestCase):
         from octoprint_ws281x_led_status import determine_pi_version
 
         self.assertEqual(determine_pi_version(), "4")
+
+
+class HookTestCase(unittest.TestCase):
+    def setUp(self):
+        from octoprint_ws281x_led_status import WS281xLedStatusPlugin
+        from octoprint_ws281x_led_status.settings import SettingsSnapshot
+
+        self.plugin = WS281xLedStatusPlugin()
+        self.addCleanup(self.plugin.effect_queue.queue.close)
+        self.plugin._settings = mock.Mock()
+        self.plugin._settings.get_boolean.return_value = True
+        self.plugin._printer = mock.Mock()
+        self.plugin._printer.is_printing.return_value = True
+        self.plugin.update_effect = mock.Mock()
+        self.plugin.settings_snapshot = SettingsSnapshot.from_settings(
+            self.plugin._settings
+        )
+        self.plugin.custom_triggers = mock.Mock(gcodes=frozenset(["M106"]))
+        self.plugin.update_interesting_gcodes()
+
+    def run_worker(self):
+        # Runs everything queued, then stops
+        self.plugin.queue_hook_work(None)
+        self.plugin.run_hook_worker()
+
+    def gcode(self, cmd):
+        return self.plugin.process_gcode_q(None, "queuing", cmd, None, cmd.split()[0])
+
+    def test_gcode_queued(self):
+        self.assertIsNone(self.gcode("G1 X10"))
+        self.assertIsNone(self.gcode("M106 S255"))
+        # Suppressed straight away, not by the worker
+        self.assertEqual(self.gcode("M150 R255"), (None,))
+        self.plugin.custom_triggers.on_gcode_command.assert_not_called()
+        self.plugin.update_effect.assert_not_called()
+
+        self.run_worker()
+
+        self.plugin.custom_triggers.on_gcode_command.assert_called_once_with(
+            "M106", "M106 S255"
+        )
+        self.plugin.update_effect.assert_called_once_with(
+            {"type": "M150", "command": "M150 R255"}
+        )
+
+    def test_heating(self):
+        self.gcode("M109 S200")
+        self.assertTrue(self.plugin.heating)
+
+        # The end of heating is seen before the worker has run
+        self.gcode("G1 X10")
+        self.assertFalse(self.plugin.heating)
+
+        self.run_worker()
+
+        # Back to printing
+        self.plugin.update_effect.assert_called_once_with(
+            {"type": "standard", "effect": "printing"}
+        )
+
+    def test_worker_errors(self):
+        self.plugin._logger = mock.Mock()
+        self.plugin.queue_hook_work(self.plugin.update_effect, "first")
+        self.plugin.update_effect.side_effect = [ValueError, None]
+        self.plugin.queue_hook_work(self.plugin.update_effect, "second")
+
+        self.run_worker()
+
+        self.plugin._logger.exception.assert_called_once()
+        self.assertEqual(self.plugin.update_effect.call_count, 2)
+
+
+class SettingsSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        from octoprint.plugin import PluginSettings
+        from octoprint.settings import Settings
+
+        from octoprint_ws281x_led_status import settings
+
+        basedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, basedir)
+        self.plugin_settings = PluginSettings(
+            Settings(basedir=basedir), "ws281x_led_status", defaults=settings.defaults
+        )
+
+    def test_from_settings(self):
+        from octoprint_ws281x_led_status.settings import SettingsSnapshot
+
+        self.plugin_settings.set(["effects", "idle", "enabled"], False)
+        self.plugin_settings.set(["effects", "idle", "timeout"], "30")
+        self.plugin_settings.set(["effects", "progress_heatup", "tool_key"], 1)
+
+        snapshot = SettingsSnapshot.from_settings(self.plugin_settings)
+
+        self.assertNotIn("idle", snapshot.enabled_effects)
+        self.assertIn("success", snapshot.enabled_effects)
+        self.assertNotIn("printing", snapshot.enabled_effects)
+        self.assertEqual(snapshot.idle_timeout, 30)
+        self.assertEqual(snapshot.tool_key, "1")
+        self.assertEqual(snapshot.cooling_threshold, 40)
+        self.assertTrue(snapshot.intercept_m150)
+
+
+class RunnerSettingsTestCase(unittest.TestCase):
+    def setUp(self):
+        from octoprint_ws281x_led_status import WS281xLedStatusPlugin, settings
+
+        self.plugin = WS281xLedStatusPlugin()
+        self.addCleanup(self.plugin.effect_queue.queue.close)
+        self.plugin._logger = mock.Mock()
+        self.plugin.current_effect_process = mock.Mock()
+        self.plugin.current_effect_process.is_alive.return_value = True
+        self.plugin.effect_queue = mock.Mock()
+        self.plugin.restart_strip = mock.Mock()
+
+        self.previous = {
+            "debug": False,
+            "strip": dict(settings.defaults["strip"]),
+            "effects": {"idle": dict(settings.defaults["effects"]["idle"])},
+            "features": dict(settings.defaults["features"]),
+        }
+
+    def apply(self, path, value):
+        import copy
+
+        current = copy.deepcopy(self.previous)
+        current[path[0]][path[1]] = value
+        with mock.patch.object(
+            self.plugin, "get_runner_settings", return_value=current
+        ):
+            self.plugin.apply_runner_settings(self.previous)
+        return current
+
+    def test_reconfigure(self):
+        current = self.apply(["strip", "brightness"], 20)
+
+        self.plugin.restart_strip.assert_not_called()
+        msg = self.plugin.effect_queue.put.call_args[0][0]
+        self.assertEqual(msg["type"], "reconfigure")
+        self.assertEqual(msg["strip"], current["strip"])
+        self.assertEqual(msg["state"], self.plugin.current_state)
+
+    def test_restart(self):
+        self.apply(["strip", "pin"], 18)
+        self.apply(["features", "sacrifice_pixel"], True)
+
+        self.assertEqual(self.plugin.restart_strip.call_count, 2)
+        self.plugin.effect_queue.put.assert_not_called()
+
+    def test_unchanged(self):
+        self.apply(["strip", "brightness"], self.previous["strip"]["brightness"])
+
+        self.plugin.restart_strip.assert_not_called()
+        self.plugin.effect_queue.put.assert_not_called()
+
+        # Not running, eg. after the strip failed to start
+        self.plugin.current_effect_process.is_alive.return_value = False
+        self.apply(["strip", "brightness"], self.previous["strip"]["brightness"])
+
+        self.plugin.restart_strip.assert_called_once()
+
+
+class RunnerStatsTestCase(unittest.TestCase):
+    def test_receive_runner_stats(self):
+        import multiprocessing
+
+        from octoprint_ws281x_led_status import WS281xLedStatusPlugin
+
+        plugin = WS281xLedStatusPlugin()
+        self.addCleanup(plugin.effect_queue.queue.close)
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        sender.send({"current_effect": "idle"})
+        sender.send({"current_effect": "success"})
+        sender.close()
+
+        # Returns once the runner's end is closed
+        plugin.receive_runner_stats(receiver)
+
+        self.assertEqual(plugin.runner_stats, {"current_effect": "success"})
+        status = plugin.get_runner_status()
+        self.assertFalse(status["alive"])
+        self.assertEqual(status["queue"], {"sent": 0, "suppressed": 0, "dropped": 0})
+        self.assertEqual(status["watchdog"]["restarts"], 0)
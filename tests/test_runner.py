@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import logging
+import threading
+import time
+import unittest
+
+import mock
+
+from octoprint_ws281x_led_status.framebuffer import FrameBuffer
+from octoprint_ws281x_led_status.util import monotonic
+
+
+class MockStrip:
+    def __init__(self, num=10):
+        self.num = num
+        self.pixels = [(0, 0, 0, 0)] * num
+        self.brightness = 255
+        self.frames = []
+        self.shown = threading.Event()
+
+    def numPixels(self):
+        return self.num
+
+    def setPixelColor(self, n, color):
+        self.pixels[n] = (
+            (color >> 16) & 0xFF,
+            (color >> 8) & 0xFF,
+            color & 0xFF,
+            (color >> 24) & 0xFF,
+        )
+
+    def setPixelColorRGB(self, n, red, green, blue, white=0):
+        self.pixels[n] = (red, green, blue, white)
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+
+    def getBrightness(self):
+        return self.brightness
+
+    def show(self):
+        self.frames.append((time.time(), list(self.pixels), self.brightness))
+        self.shown.set()
+
+
+def create_effect_thread(strip, fade_time=100, **kwargs):
+    from octoprint_ws281x_led_status.runner import BrightnessManager, EffectThread
+
+    brightness_manager = BrightnessManager(
+        strip, 255, {"fade": {"enabled": True, "time": fade_time}}
+    )
+    return (
+        EffectThread(strip, brightness_manager, logging.getLogger("test"), **kwargs),
+        brightness_manager,
+    )
+
+
+class FakeClock:
+    """
+    Frame clock that only moves when the test says so. Starts on a whole number,
+    and tests step it by powers of 2 so frame deadlines land exactly on it.
+    """
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def settle(effect_thread):
+    """
+    Wait for the render thread to finish handling the last swap() or wake()
+    """
+    # The wake event is cleared after busy_since is set, which is only reset once
+    # the thread is back to waiting
+    for _ in range(1000):
+        if not effect_thread._wake_event.is_set() and effect_thread.busy_since is None:
+            return
+        time.sleep(0.001)
+    raise AssertionError("Render thread did not settle")
+
+
+def tick(effect_thread, clock, seconds):
+    clock.advance(seconds)
+    effect_thread.wake()
+    settle(effect_thread)
+
+
+class EffectThreadTestCase(unittest.TestCase):
+    def test_static_effect(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        effect_thread, brightness_manager = create_effect_thread(strip)
+        effect_thread.swap(
+            EFFECTS["Solid Color"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "brightness_manager": brightness_manager,
+            },
+            "Solid Color",
+        )
+        self.assertTrue(strip.shown.wait(1))
+        time.sleep(0.05)
+        effect_thread.stop()
+
+        # A static effect is shown exactly once
+        self.assertEqual(len(strip.frames), 1)
+        self.assertEqual(strip.frames[0][1], [(255, 0, 0, 0)] * strip.num)
+
+    def test_unchanged_frame_not_shown(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        effect_thread, brightness_manager = create_effect_thread(strip)
+        frame_buffer = FrameBuffer(strip)
+        for color in [(255, 0, 0, 0), (255, 0, 0, 0), (0, 255, 0, 0)]:
+            effect_thread.swap(
+                EFFECTS["Solid Color"],
+                {
+                    "strip": frame_buffer,
+                    "color": color,
+                    "brightness_manager": brightness_manager,
+                },
+                "Solid Color",
+            )
+            time.sleep(0.05)
+        effect_thread.stop()
+
+        # Same colour again does not need showing
+        self.assertEqual(len(strip.frames), 2)
+        self.assertEqual(effect_thread.skipped_shows, 1)
+
+    def test_refresh(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        effect_thread, brightness_manager = create_effect_thread(strip)
+        effect_thread.swap(
+            EFFECTS["Solid Color"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "brightness_manager": brightness_manager,
+            },
+            "Solid Color",
+        )
+        time.sleep(0.05)
+        effect_thread.refresh()
+        time.sleep(0.05)
+        effect_thread.stop()
+
+        # Shown again, although nothing changed
+        self.assertEqual(len(strip.frames), 2)
+        self.assertEqual(effect_thread.skipped_shows, 0)
+
+    def test_frame_period(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        clock = FakeClock()
+        effect_thread, brightness_manager = create_effect_thread(strip, clock=clock)
+        effect_thread.swap(
+            EFFECTS["Blink"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "delay": 125,
+                "brightness_manager": brightness_manager,
+            },
+            "Blink",
+        )
+        settle(effect_thread)
+        self.assertEqual(len(strip.frames), 1)
+
+        # One show per 125ms frame, not before it is due
+        for _ in range(8):
+            tick(effect_thread, clock, 0.0625)
+        self.assertEqual(len(strip.frames), 5)
+
+        # A late frame does not push back the ones after it, no drift
+        tick(effect_thread, clock, 0.1875)
+        self.assertEqual(len(strip.frames), 6)
+        tick(effect_thread, clock, 0.0625)
+        self.assertEqual(len(strip.frames), 7)
+        effect_thread.stop()
+
+        self.assertEqual(effect_thread.dropped_frames, 0)
+        # Blink alternates between the colour and off every frame
+        self.assertNotEqual(strip.frames[0][1], strip.frames[1][1])
+        self.assertEqual(strip.frames[0][1], strip.frames[2][1])
+
+    def test_dropped_frames(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        clock = FakeClock()
+        effect_thread, brightness_manager = create_effect_thread(strip, clock=clock)
+        effect_thread.swap(
+            EFFECTS["Blink"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "delay": 125,
+                "brightness_manager": brightness_manager,
+            },
+            "Blink",
+        )
+        settle(effect_thread)
+
+        # More than a whole frame behind, the late frame is shown then the missed
+        # ones are skipped, catching up with the one due now
+        tick(effect_thread, clock, 0.5)
+        effect_thread.stop()
+
+        self.assertEqual(effect_thread.dropped_frames, 2)
+        self.assertEqual(len(strip.frames), 3)
+
+    def test_frame_stats(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        clock = FakeClock()
+        effect_thread, brightness_manager = create_effect_thread(strip, clock=clock)
+        for effect, delay in [("Blink", 125), ("Solid Color", 0)]:
+            effect_thread.swap(
+                EFFECTS[effect],
+                {
+                    "strip": FrameBuffer(strip),
+                    "color": (255, 0, 0, 0),
+                    "delay": delay,
+                    "brightness_manager": brightness_manager,
+                },
+                effect,
+            )
+            settle(effect_thread)
+            for _ in range(9):
+                tick(effect_thread, clock, 0.125)
+        effect_thread.stop()
+
+        summary = effect_thread.frame_stats.summary(clock())
+        blink = summary["Blink"]
+        self.assertEqual(blink["frames"], 10)
+        self.assertEqual(blink["frames"], blink["render"]["count"])
+        self.assertEqual(blink["frames"], blink["show"]["count"])
+        self.assertEqual(blink["frames"], blink["overshoot"]["count"])
+        # Static effects render once, and there is no frame deadline to miss
+        self.assertEqual(summary["Solid Color"]["frames"], 1)
+        self.assertEqual(summary["Solid Color"]["overshoot"]["count"], 0)
+
+    def test_busy_since(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        release = threading.Event()
+        strip.show = lambda: release.wait()
+        effect_thread, brightness_manager = create_effect_thread(strip)
+        self.assertIsNone(effect_thread.busy_since)
+
+        start = monotonic()
+        effect_thread.swap(
+            EFFECTS["Solid Color"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "delay": 0,
+                "brightness_manager": brightness_manager,
+            },
+            "Solid Color",
+        )
+        time.sleep(0.1)
+        # Stuck showing the frame
+        self.assertGreaterEqual(effect_thread.busy_since, start)
+
+        release.set()
+        time.sleep(0.1)
+        self.assertIsNone(effect_thread.busy_since)
+        effect_thread.stop()
+
+    def test_switch_latency(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        clock = FakeClock()
+        effect_thread, brightness_manager = create_effect_thread(strip, clock=clock)
+        effect_thread.swap(
+            EFFECTS["Blink"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "delay": 1000,
+                "brightness_manager": brightness_manager,
+            },
+            "Blink",
+        )
+        settle(effect_thread)
+        self.assertEqual(len(strip.frames), 1)
+
+        # The slow effect is mid-frame, switching must not wait for it. The clock
+        # is not moved, so the new effect can only be shown if it doesn't
+        effect_thread.swap(
+            EFFECTS["Solid Color"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (0, 255, 0, 0),
+                "brightness_manager": brightness_manager,
+            },
+            "Solid Color",
+        )
+        settle(effect_thread)
+        self.assertEqual(len(strip.frames), 2)
+        self.assertEqual(strip.frames[-1][1], [(0, 255, 0, 0)] * strip.num)
+        effect_thread.stop()
+
+    def test_max_fps(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip(num=100)
+        clock = FakeClock()
+        effect_thread, brightness_manager = create_effect_thread(
+            strip, clock=clock, max_fps=8
+        )
+        effect_thread.swap(
+            EFFECTS["Color Wipe"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (255, 0, 0, 0),
+                "delay": 0,
+                "brightness_manager": brightness_manager,
+            },
+            "Color Wipe",
+        )
+        settle(effect_thread)
+        self.assertEqual(len(strip.frames), 1)
+
+        # No delay still waits 1/max_fps between frames
+        for _ in range(8):
+            tick(effect_thread, clock, 0.0625)
+        effect_thread.stop()
+
+        self.assertEqual(len(strip.frames), 5)
+
+    def test_stop_renders_pending(self):
+        from octoprint_ws281x_led_status.constants import EFFECTS
+
+        strip = MockStrip()
+        effect_thread, brightness_manager = create_effect_thread(strip)
+        effect_thread.swap(
+            EFFECTS["Rainbow Cycle"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (0, 0, 0, 0),
+                "delay": 10,
+                "brightness_manager": brightness_manager,
+            },
+            "Rainbow Cycle",
+        )
+        time.sleep(0.05)
+        effect_thread.swap(
+            EFFECTS["Solid Color"],
+            {
+                "strip": FrameBuffer(strip),
+                "color": (0, 0, 0),
+                "brightness_manager": brightness_manager,
+            },
+            "Solid Color",
+        )
+        effect_thread.stop()
+
+        self.assertEqual(strip.frames[-1][1], [(0, 0, 0, 0)] * strip.num)
+
+    def test_fade(self):
+        strip = MockStrip()
+        effect_thread, brightness_manager = create_effect_thread(strip, fade_time=100)
+        brightness_manager.current_brightness = 0
+        brightness_manager.start_fade_in()
+        effect_thread.wake()
+        time.sleep(0.3)
+        effect_thread.stop()
+
+        brightness = [frame[2] for frame in strip.frames]
+        self.assertEqual(brightness, sorted(brightness))
+        self.assertEqual(brightness[-1], 255)
+        self.assertFalse(brightness_manager.fade_active)
+
+
+class LightsTestCase(unittest.TestCase):
+    def create_runner(self, strip, clock):
+        from octoprint_ws281x_led_status.debug_ring import DebugRing
+        from octoprint_ws281x_led_status.runner import EffectRunner
+        from octoprint_ws281x_led_status.util import ColorCorrection
+
+        runner = EffectRunner.__new__(EffectRunner)
+        runner._logger = logging.getLogger("test")
+        runner.debug_ring = DebugRing()
+        runner.effect_thread, runner.brightness_manager = create_effect_thread(
+            strip, fade_time=100, clock=clock
+        )
+        runner.strip_buffer = runner.segment_buffer = FrameBuffer(strip)
+        runner.color_correction = ColorCorrection(
+            {
+                "adjustment": {"R": 100, "G": 100, "B": 100},
+                "white_override": False,
+                "white_brightness": 50,
+            }
+        )
+        runner.transition_settings = {"fade": {"enabled": True, "time": 100}}
+        runner.effect_settings = {
+            "idle": {"effect": "Solid Color", "color": "#ff0000", "delay": 10}
+        }
+        runner.active_times_timer = mock.Mock(active=True)
+        runner.turn_off_timer = None
+        runner.lights_on = True
+        runner.previous_state = {"type": "standard", "effect": "idle"}
+        return runner
+
+    def test_fade_in_after_blank(self):
+        from octoprint_ws281x_led_status.constants import FADE_STEP_MS
+
+        strip = MockStrip()
+        clock = FakeClock()
+        runner = self.create_runner(strip, clock)
+        runner.parse_q_msg(runner.previous_state)
+        settle(runner.effect_thread)
+
+        runner.switch_lights(False)
+        for _ in range(6):
+            tick(runner.effect_thread, clock, FADE_STEP_MS / 1000)
+        self.assertEqual(strip.brightness, 0)
+        # As the timer would once the fade has finished
+        runner.turn_off_timer.cancel()
+        runner.lights_off()
+        settle(runner.effect_thread)
+        # Messages while off blank the LEDs too
+        runner.parse_q_msg({"type": "standard", "effect": "idle"})
+        settle(runner.effect_thread)
+
+        shown = len(strip.frames)
+        runner.switch_lights(True)
+        for _ in range(6):
+            tick(runner.effect_thread, clock, FADE_STEP_MS / 1000)
+        runner.effect_thread.stop()
+
+        brightness = [frame[2] for frame in strip.frames[shown:]]
+        self.assertEqual(brightness[0], 0)
+        self.assertEqual(brightness, sorted(brightness))
+        self.assertGreater(len(set(brightness)), 2)
+        self.assertEqual(brightness[-1], 255)
+        self.assertEqual(strip.frames[-1][1], [(255, 0, 0, 0)] * strip.num)
+
+
+class CoalesceTestCase(unittest.TestCase):
+    def coalesce(self, messages):
+        from octoprint_ws281x_led_status.runner import coalesce_messages
+
+        counts = {"lights": 0, "state": 0, "custom": 0, "M150": 0}
+        return coalesce_messages(messages, counts), counts
+
+    def test_keeps_latest_per_class(self):
+        messages = [
+            {"type": "progress", "effect": "progress_heatup", "value": 10},
+            {"type": "lights", "action": "off"},
+            {"type": "progress", "effect": "progress_heatup", "value": 11},
+            {"type": "M150", "command": "M150 R255"},
+            {"type": "lights", "action": "on"},
+            {"type": "progress", "effect": "progress_heatup", "value": 12},
+            {"type": "M150", "command": "M150 B255"},
+        ]
+        result, counts = self.coalesce(messages)
+
+        self.assertEqual(
+            result,
+            [
+                {"type": "lights", "action": "on"},
+                {"type": "progress", "effect": "progress_heatup", "value": 12},
+                {"type": "M150", "command": "M150 B255"},
+            ],
+        )
+        self.assertEqual(counts, {"lights": 1, "state": 2, "custom": 0, "M150": 1})
+
+    def test_bare_m150(self):
+        messages = [
+            {"type": "M150", "command": "M150 R255"},
+            {"type": "standard", "effect": "idle"},
+            {"type": "M150", "command": "M150"},
+        ]
+        result, counts = self.coalesce(messages)
+
+        # Bare M150 repeats the last colour, so that colour must survive
+        self.assertEqual(
+            result,
+            [
+                {"type": "standard", "effect": "idle"},
+                {"type": "M150", "command": "M150 R255"},
+            ],
+        )
+
+    def test_unknown_messages_kept(self):
+        messages = [
+            {"type": "standard", "effect": "idle"},
+            {"type": "something_new"},
+            {"type": "something_new"},
+        ]
+        result, counts = self.coalesce(messages)
+
+        self.assertEqual(result, messages)
+
+
+class ProgressFrameKeyTestCase(unittest.TestCase):
+    def render(self, effect, value, num=24):
+        from octoprint_ws281x_led_status.constants import PROGRESS_EFFECTS
+
+        strip = MockStrip(num)
+        frame_buffer = FrameBuffer(strip)
+        brightness_manager = create_effect_thread(strip)[1]
+        PROGRESS_EFFECTS[effect](
+            strip=frame_buffer,
+            brightness_manager=brightness_manager,
+            value=value,
+            progress_color=(0, 255, 0, 0),
+            base_color=(255, 0, 0, 0),
+            reverse=False,
+        )
+        frame_buffer.commit()
+        return strip.pixels
+
+    def test_same_key_same_frame(self):
+        from octoprint_ws281x_led_status.constants import PROGRESS_EFFECTS
+        from octoprint_ws281x_led_status.effects.progress import frame_key
+
+        for effect in PROGRESS_EFFECTS:
+            for num in (24, 25):
+                frames = {}
+                for value in range(101):
+                    key = frame_key(effect, value, num, (0, 255, 0, 0), (255, 0, 0, 0))
+                    frame = self.render(effect, value, num)
+                    self.assertEqual(frames.setdefault(key, frame), frame)
+
+    def test_single_pixel_resolution(self):
+        from octoprint_ws281x_led_status.effects.progress import frame_key
+
+        keys = {
+            frame_key("Single Pixel", value, 24, (0, 255, 0, 0), (255, 0, 0, 0))
+            for value in range(101)
+        }
+        self.assertEqual(len(keys), 25)
+
+
+class RunnerLoggerTestCase(unittest.TestCase):
+    def test_logs_from_listener_thread(self):
+        import gc
+        import os
+        import shutil
+        import tempfile
+
+        from octoprint_ws281x_led_status.debug_ring import DebugRing
+        from octoprint_ws281x_led_status.runner import EffectRunner
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "runner.log")
+
+        runner = EffectRunner.__new__(EffectRunner)
+        runner._logger = logging.getLogger("test.runner_logger")
+        runner.debug_ring = DebugRing()
+        self.addCleanup(runner._logger.handlers.clear)
+        runner.setup_custom_logger(path, debug=True)
+
+        threads = []
+        file_handler = runner.log_listener.handlers[0]
+        original_emit = file_handler.emit
+
+        def emit(record):
+            threads.append(threading.current_thread())
+            original_emit(record)
+
+        file_handler.emit = emit
+        runner._logger.debug("New message: %s", {"type": "standard"})
+        runner.debug_ring.record("lights", on=True)
+        runner._logger.error("Error showing frame")
+        last_error_handler = runner.last_error_handler
+        # The listener is stopped, writing out what is queued, once the runner is gone
+        del runner
+        gc.collect()
+
+        with open(path) as log_file:
+            lines = log_file.read().splitlines()
+        self.assertTrue(lines[0].endswith("DEBUG: New message: {'type': 'standard'}"))
+        # The debug ring is written ahead of the error
+        self.assertTrue(lines[1].endswith("INFO: Debug ring, error logged: 1 events"))
+        self.assertTrue(lines[2].endswith(" lights on=True"))
+        self.assertTrue(lines[3].endswith("ERROR: Error showing frame"))
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(
+            last_error_handler.last_error["message"], "Error showing frame"
+        )
+
+    def test_effect_changes_only_in_debug_ring(self):
+        from octoprint_ws281x_led_status.debug_ring import DebugRing
+        from octoprint_ws281x_led_status.runner import EffectRunner
+
+        runner = EffectRunner.__new__(EffectRunner)
+        runner._logger = mock.Mock()
+        runner.debug_ring = DebugRing()
+        runner.lights_on = False
+        runner.blank_leds = mock.Mock()
+        runner.progress_effect = mock.Mock()
+
+        runner.parse_q_msg({"type": "standard", "effect": "idle"})
+        runner.parse_q_msg({"type": "progress", "effect": "progress_print", "value": 5})
+
+        # Not written to the log as they happen
+        runner._logger.debug.assert_not_called()
+        runner._logger.info.assert_not_called()
+        lines = []
+        runner.debug_ring.dump(lines.append, "test")
+        events = lines[0].splitlines()[1:]
+        self.assertTrue(events[0].endswith(" change_effect effect=idle"))
+        self.assertTrue(
+            events[1].endswith(" change_effect effect=progress_print value=5")
+        )
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+def imported_modules(queue, stats_conn, heartbeat, log_path):
+    import logging
+
+    import octoprint_ws281x_led_status_runner as runner_process
+
+    # Arguments have been unpickled by now, as they would be for the runner
+    EffectRunner = runner_process.import_runner()
+    msg = queue.get(timeout=30)
+
+    # What the runner needs from OctoPrint, its log handler & the active times timer
+    from octoprint_ws281x_led_status.debug_ring import DebugRing
+    from octoprint_ws281x_led_status.runner.timer import ActiveTimer
+
+    runner = EffectRunner.__new__(EffectRunner)
+    runner._logger = logging.getLogger("test.runner_process")
+    runner.debug_ring = DebugRing()
+    runner.setup_custom_logger(log_path, debug=False)
+    ActiveTimer(
+        {"enabled": True, "start": "00:00", "end": "23:59"}, lambda state: None
+    ).end_timer()
+
+    stats_conn.send((msg, heartbeat.value, sorted(sys.modules.keys())))
+
+
+class RunnerProcessTestCase(unittest.TestCase):
+    def test_import_runner(self):
+        import octoprint_ws281x_led_status_runner as runner_process
+        from octoprint_ws281x_led_status import constants, ipc
+
+        context = runner_process.get_context()
+        if context.get_start_method() != "spawn":
+            self.skipTest("Runner is forked on this platform")
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        # The same kinds of arguments the plugin starts the runner with
+        queue = ipc.create_queue(context)
+        self.addCleanup(queue.close)
+        stats_receiver, stats_sender = context.Pipe(duplex=False)
+        heartbeat = context.RawValue("d", 1.5)
+        process = context.Process(
+            target=imported_modules,
+            kwargs={
+                "queue": queue,
+                "stats_conn": stats_sender,
+                "heartbeat": heartbeat,
+                "log_path": os.path.join(directory, "runner.log"),
+            },
+        )
+        process.start()
+        queue.put(constants.ON_MSG)
+        self.assertTrue(stats_receiver.poll(30))
+        msg, beat, modules = stats_receiver.recv()
+        process.join()
+
+        self.assertEqual(msg, constants.ON_MSG)
+        self.assertEqual(beat, 1.5)
+        self.assertIn("octoprint_ws281x_led_status.runner", modules)
+        # Only OctoPrint's log handler & utilities are loaded, not the plugin's API,
+        # settings or OctoPrint's server
+        self.assertIn("octoprint.logging.handlers", modules)
+        self.assertIn("octoprint.util", modules)
+        for module in [
+            "octoprint_ws281x_led_status.api",
+            "octoprint_ws281x_led_status.settings",
+            "octoprint.plugin",
+            "octoprint.settings",
+            "octoprint.server",
+            "flask",
+        ]:
+            self.assertNotIn(module, modules)
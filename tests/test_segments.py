@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import ctypes
+import unittest
+
+import mock
+
+
+class PixelListStrip:
+    def __init__(self, num):
+        self.pixels = [0] * num
+
+    def numPixels(self):
+        return len(self.pixels)
+
+    def setPixelColor(self, n, color):
+        self.pixels[n] = color
+
+    def getPixelColor(self, n):
+        return self.pixels[n]
+
+    def getBrightness(self):
+        return 255
+
+    def show(self):
+        pass
+
+
+class StripSegmentTestCase(unittest.TestCase):
+    def create_segment(self, leds=None):
+        from octoprint_ws281x_led_status.runner import segments
+
+        if leds is not None:
+            # Stand in for a started PixelStrip's LED buffer
+            patcher = mock.patch.object(
+                segments, "led_memory", return_value=ctypes.addressof(leds)
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        strip = PixelListStrip(6)
+        return strip, segments.StripSegment(strip, 1, end=5)
+
+    def test_set_pixels(self):
+        strip, segment = self.create_segment()
+        segment.setPixels(2, [0x0A, 0x0B, 0x0C, 0x0D])
+        segment.fill((1, 2, 3))
+
+        self.assertEqual(strip.pixels, [0, 0x010203, 0x010203, 0x010203, 0x010203, 0])
+
+    def test_set_pixels_led_memory(self):
+        leds = (ctypes.c_uint32 * 6)()
+        strip, segment = self.create_segment(leds)
+        segment.fill((1, 2, 3))
+        segment.setPixels(2, [0x0A, 0x0B, 0x0C, 0x0D])
+
+        self.assertEqual(list(leds), [0, 0x010203, 0x010203, 0x0A, 0x0B, 0])
+        # Nothing went through the per pixel path
+        self.assertEqual(strip.pixels, [0] * 6)
+
+    def test_get_pixels_is_a_view(self):
+        leds = (ctypes.c_uint32 * 6)()
+        strip, segment = self.create_segment(leds)
+        pixels = segment.getPixels()
+        segment.fill((0, 0, 255))
+
+        self.assertEqual(len(pixels), 4)
+        self.assertEqual(list(pixels), [0xFF] * 4)
+
+    def test_get_pixels_copy(self):
+        strip, segment = self.create_segment()
+        strip.pixels = [1, 2, 3, 4, 5, 6]
+
+        self.assertEqual([int(pixel) for pixel in segment.getPixels()], [2, 3, 4, 5])
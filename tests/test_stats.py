@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import unittest
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_percentiles(self):
+        from octoprint_ws281x_led_status.runner.stats import Histogram
+
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.add(0.0008)
+        for _ in range(10):
+            histogram.add(0.015)
+
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["mean_ms"], 2.22)
+        # Upper bound of the bucket
+        self.assertEqual(summary["p50_ms"], 1)
+        self.assertEqual(summary["p95_ms"], 15)
+        self.assertEqual(summary["max_ms"], 15)
+        self.assertIn((1, 90), summary["buckets"])
+        self.assertIn((20, 10), summary["buckets"])
+
+    def test_overflow(self):
+        from octoprint_ws281x_led_status.runner.stats import Histogram
+
+        histogram = Histogram()
+        histogram.add(5)
+
+        self.assertEqual(histogram.summary()["buckets"][-1], (None, 1))
+        self.assertEqual(histogram.percentile(50), 5000)
+
+    def test_empty(self):
+        from octoprint_ws281x_led_status.runner.stats import Histogram
+
+        self.assertEqual(Histogram().percentile(95), 0)
+
+
+class FrameStatsTestCase(unittest.TestCase):
+    def test_fps(self):
+        from octoprint_ws281x_led_status.runner.stats import FrameStats
+
+        frame_stats = FrameStats()
+        frame_stats.start_effect("one", 0)
+        for _ in range(20):
+            frame_stats.add_show(0.001)
+        frame_stats.start_effect("two", 2)
+        frame_stats.add_show(0.001)
+        frame_stats.start_effect("one", 3)
+        for _ in range(10):
+            frame_stats.add_show(0.001)
+
+        summary = frame_stats.summary(4)
+        # 30 frames over 3 seconds running
+        self.assertEqual(summary["one"]["fps"], 10)
+        self.assertEqual(summary["two"]["fps"], 1)
+
+    def test_log_summary(self):
+        from octoprint_ws281x_led_status.runner.stats import FrameStats
+
+        frame_stats = FrameStats()
+        # Shown before any effect, not counted
+        frame_stats.add_show(0.001)
+        frame_stats.start_effect("idle", 0)
+        frame_stats.add_render(0.0005)
+        frame_stats.add_show(0.002)
+
+        lines = []
+        frame_stats.log_summary(lines.append, 1)
+        self.assertEqual(
+            lines,
+            [
+                "Frame stats for idle: 1.0 fps, 1 frames, 0 dropped, ms p50/p95/max - "
+                "render 0.50/0.50/0.50, show 2.00/2.00/2.00, overshoot 0.00/0.00/0.00"
+            ],
+        )
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import time
+import unittest
+
+
+class ListQueue:
+    def __init__(self, maxsize=0):
+        self.messages = []
+        self.maxsize = maxsize
+
+    def put(self, msg, block=True):
+        from octoprint_ws281x_led_status.ipc import Full
+
+        if self.maxsize and len(self.messages) >= self.maxsize:
+            raise Full
+        self.messages.append(msg)
+
+    def get_nowait(self):
+        from octoprint_ws281x_led_status.ipc import Empty
+
+        if not self.messages:
+            raise Empty
+        return self.messages.pop(0)
+
+
+def progress(value):
+    return {"type": "progress", "effect": "progress_heatup", "value": value}
+
+
+class ThrottledQueueTestCase(unittest.TestCase):
+    def create_queue(
+        self, intervals=None, key=None, timestamp=False, is_alive=None, maxsize=0
+    ):
+        from octoprint_ws281x_led_status.throttle import ThrottledQueue
+
+        queue = ListQueue(maxsize)
+        return queue, ThrottledQueue(queue, intervals, key, timestamp, is_alive)
+
+    def test_duplicates(self):
+        queue, throttled = self.create_queue()
+
+        throttled.put(progress(10))
+        throttled.put(progress(10))
+        throttled.put(progress(11))
+        throttled.put({"type": "lights", "action": "on"})
+        throttled.put({"type": "lights", "action": "on"})
+
+        self.assertEqual(
+            queue.messages,
+            [
+                progress(10),
+                progress(11),
+                {"type": "lights", "action": "on"},
+                {"type": "lights", "action": "on"},
+            ],
+        )
+        self.assertEqual(throttled.stats(), {"sent": 4, "suppressed": 1, "dropped": 0})
+
+    def test_repeat_after_lights(self):
+        queue, throttled = self.create_queue()
+        custom = {
+            "type": "custom",
+            "effect": "Solid Color",
+            "color": "#ff0000",
+            "delay": 10,
+        }
+
+        throttled.put(custom)
+        throttled.put({"type": "lights", "action": "off"})
+        throttled.put({"type": "lights", "action": "on"})
+        # The runner shows its previous state when the lights come on, not this
+        throttled.put(custom)
+
+        self.assertEqual(
+            queue.messages,
+            [
+                custom,
+                {"type": "lights", "action": "off"},
+                {"type": "lights", "action": "on"},
+                custom,
+            ],
+        )
+        self.assertEqual(throttled.stats(), {"sent": 4, "suppressed": 0, "dropped": 0})
+
+    def test_trailing_edge(self):
+        queue, throttled = self.create_queue({"progress": 0.1})
+
+        for value in range(10):
+            throttled.put(progress(value))
+
+        self.assertEqual(queue.messages, [progress(0)])
+        time.sleep(0.2)
+        # Final value is flushed once the interval has passed
+        self.assertEqual(queue.messages, [progress(0), progress(9)])
+        self.assertEqual(throttled.stats(), {"sent": 2, "suppressed": 8, "dropped": 0})
+
+    def test_newer_message_replaces_pending(self):
+        queue, throttled = self.create_queue({"progress": 0.1})
+
+        throttled.put(progress(0))
+        throttled.put(progress(1))
+        throttled.put({"type": "standard", "effect": "success"})
+        time.sleep(0.2)
+
+        # The held back progress must not overwrite the newer effect
+        self.assertEqual(
+            queue.messages, [progress(0), {"type": "standard", "effect": "success"}]
+        )
+
+    def test_reset(self):
+        queue, throttled = self.create_queue()
+
+        throttled.put(progress(10))
+        throttled.reset()
+        throttled.put(progress(10))
+
+        self.assertEqual(queue.messages, [progress(10), progress(10)])
+
+    def test_key(self):
+        # Only every 10% renders differently
+        queue, throttled = self.create_queue(
+            key=lambda msg: (msg["type"], msg.get("value", 0) // 10)
+        )
+
+        for value in range(25):
+            throttled.put(progress(value))
+
+        self.assertEqual(queue.messages, [progress(0), progress(10), progress(20)])
+        self.assertEqual(throttled.stats(), {"sent": 3, "suppressed": 22, "dropped": 0})
+
+    def test_timestamp(self):
+        from octoprint_ws281x_led_status.constants import KILL_MSG
+
+        queue, throttled = self.create_queue(timestamp=True)
+        msg = progress(10)
+        throttled.put(msg)
+        throttled.put(progress(10))
+        throttled.put(KILL_MSG)
+
+        self.assertEqual(len(queue.messages), 2)
+        self.assertEqual(queue.messages[0], dict(msg, sent=queue.messages[0]["sent"]))
+        # The original is not changed
+        self.assertNotIn("sent", msg)
+        self.assertEqual(queue.messages[1], KILL_MSG)
+
+    def test_runner_not_alive(self):
+        from octoprint_ws281x_led_status.constants import KILL_MSG, ON_MSG
+
+        alive = [False]
+        queue, throttled = self.create_queue(is_alive=lambda: alive[0])
+
+        throttled.put(progress(10))
+        throttled.put(ON_MSG)
+        throttled.put(KILL_MSG)
+        self.assertEqual(queue.messages, [KILL_MSG])
+        self.assertEqual(throttled.stats(), {"sent": 1, "suppressed": 0, "dropped": 2})
+
+        # Dropped messages are not suppressed as duplicates once it is running again
+        alive[0] = True
+        throttled.reset()
+        throttled.put(progress(10))
+        self.assertEqual(queue.messages, [KILL_MSG, progress(10)])
+
+    def test_hold_when_full(self):
+        from octoprint_ws281x_led_status.constants import OFF_MSG, ON_MSG
+
+        queue, throttled = self.create_queue(maxsize=3)
+        reconfigure = {"type": "reconfigure", "debug": False}
+
+        throttled.put(progress(0))
+        throttled.put(ON_MSG)
+        throttled.put(reconfigure)
+        # Held back in order, the first progress is superseded by the second
+        throttled.put(progress(1))
+        throttled.put(OFF_MSG)
+        throttled.put(progress(2))
+
+        # Nothing already queued is taken out
+        self.assertEqual(queue.messages, [progress(0), ON_MSG, reconfigure])
+        self.assertEqual(throttled.stats(), {"sent": 3, "suppressed": 0, "dropped": 1})
+
+        # The runner reads, then the held messages go ahead of the next one
+        queue.messages = []
+        throttled.put(progress(3))
+        self.assertEqual(queue.messages, [OFF_MSG, progress(2), progress(3)])
+        self.assertEqual(throttled.stats(), {"sent": 6, "suppressed": 0, "dropped": 1})
+
+    def test_held_bare_m150(self):
+        queue, throttled = self.create_queue(maxsize=1)
+
+        throttled.put(progress(0))
+        throttled.put({"type": "M150", "command": "M150 R255"})
+        # Repeats the colour held back, so it doesn't replace it
+        throttled.put({"type": "M150", "command": "M150"})
+
+        queue.messages = []
+        throttled._retry()
+        self.assertEqual(queue.messages, [{"type": "M150", "command": "M150 R255"}])
+        queue.messages = []
+        throttled._retry()
+        self.assertEqual(queue.messages, [{"type": "M150", "command": "M150"}])
+        self.assertEqual(throttled.dropped, 0)
+
+    def test_retry_when_full(self):
+        import multiprocessing
+
+        from octoprint_ws281x_led_status.ipc import RingBufferQueue
+        from octoprint_ws281x_led_status.throttle import ThrottledQueue
+
+        queue = RingBufferQueue(multiprocessing, 100)
+        self.addCleanup(queue.close)
+        throttled = ThrottledQueue(queue)
+
+        # 37 bytes each, only two fit
+        for value in range(5):
+            throttled.put(progress(value))
+
+        self.assertEqual(queue.get_nowait(), progress(0))
+        self.assertEqual(queue.get_nowait(), progress(1))
+        self.assertEqual(throttled.dropped, 2)
+        # The latest is sent by the retry timer, once there is room
+        self.assertEqual(queue.get(timeout=1), progress(4))
+
+    def test_too_large(self):
+        import multiprocessing
+
+        from octoprint_ws281x_led_status.constants import ON_MSG
+        from octoprint_ws281x_led_status.ipc import RingBufferQueue
+        from octoprint_ws281x_led_status.throttle import ThrottledQueue
+
+        queue = RingBufferQueue(multiprocessing, 100)
+        self.addCleanup(queue.close)
+        throttled = ThrottledQueue(queue)
+
+        throttled.put({"type": "reconfigure", "strip": "x" * 100})
+        # Dropped instead of held, so it doesn't hold up what comes after it
+        throttled.put(ON_MSG)
+
+        self.assertEqual(queue.get_nowait(), ON_MSG)
+        self.assertEqual(throttled.stats(), {"sent": 1, "suppressed": 0, "dropped": 1})
+        self.assertEqual(throttled._held, [])
+
+    def test_lock_timeout(self):
+        from octoprint_ws281x_led_status.ipc import LockTimeout
+
+        queue, throttled = self.create_queue()
+        puts = []
+
+        def put(msg, block=True):
+            puts.append(msg)
+            raise LockTimeout
+
+        queue.put = put
+        throttled.put(progress(0))
+        throttled.put(progress(1))
+        # Gave up on the queue after the first timeout
+        self.assertEqual(puts, [progress(0)])
+        self.assertEqual(throttled.dropped, 2)
+
+        del queue.put
+        throttled.reset()
+        throttled.put(progress(1))
+        self.assertEqual(queue.messages, [progress(1)])
+
+    def test_debug_ring(self):
+        from octoprint_ws281x_led_status.debug_ring import DebugRing
+        from octoprint_ws281x_led_status.throttle import ThrottledQueue
+
+        queue = ListQueue(maxsize=2)
+        ring = DebugRing()
+        throttled = ThrottledQueue(queue, debug_ring=ring)
+
+        throttled.put(progress(10))
+        # Asking the runner to log is never suppressed as a duplicate
+        throttled.put({"type": "debug_ring"})
+        throttled.put({"type": "debug_ring"})
+
+        lines = []
+        ring.dump(lines.append, "test")
+        events = lines[0].splitlines()[1:]
+        self.assertEqual(len(events), 3)
+        self.assertTrue(
+            events[0].endswith(" sent type=progress effect=progress_heatup value=10")
+        )
+        self.assertTrue(events[1].endswith(" sent type=debug_ring"))
+        self.assertTrue(events[2].endswith(" held type=debug_ring"))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import unittest
+
+
+class ListQueue:
+    def __init__(self):
+        self.messages = []
+
+    def put(self, msg):
+        self.messages.append(msg)
+
+
+def rule(match_type, match, effect):
+    return {
+        "match_type": match_type,
+        "match": match,
+        "effect": effect,
+        "color": "#ffffff",
+        "delay": 10,
+    }
+
+
+class GcodeTriggerTestCase(unittest.TestCase):
+    def create_trigger(self, gcode_rules):
+        from octoprint_ws281x_led_status.triggers import Trigger
+
+        queue = ListQueue()
+        trigger = Trigger(queue)
+        trigger.process_settings({"atcommand": [], "event": [], "gcode": gcode_rules})
+        return queue, trigger
+
+    def effects(self, queue):
+        return [msg["effect"] for msg in queue.messages]
+
+    def test_no_match(self):
+        queue, trigger = self.create_trigger(
+            [rule("gcode", "M106", "fan"), rule("regex", "M10[49]", "heat")]
+        )
+        trigger.on_gcode_command("G1", "G1 X10 Y10")
+
+        self.assertEqual(queue.messages, [])
+
+    def test_one_match_per_type(self):
+        queue, trigger = self.create_trigger(
+            [
+                rule("regex", "G1 X", "regex 1"),
+                rule("gcode", "G1", "gcode 1"),
+                rule("gcode", "G1", "gcode 2"),
+                rule("exact", "G1 X10", "exact 1"),
+                rule("regex", "G1", "regex 2"),
+            ]
+        )
+        trigger.on_gcode_command("G1", "G1 X10")
+
+        # In the same order as before they were indexed
+        self.assertEqual(self.effects(queue), ["gcode 1", "exact 1", "regex 1"])
+        self.assertEqual(queue.messages[2]["trigger"], "gcode regex: G1 X")
+
+    def test_regex_order(self):
+        queue, trigger = self.create_trigger(
+            [
+                rule("regex", "M1", "short"),
+                rule("regex", "(?P<code>M104) S(\\d+)", "groups"),
+                rule("regex", "M104 S200", "long"),
+            ]
+        )
+        trigger.on_gcode_command("M104", "M104 S200")
+        trigger.on_gcode_command("M140", "M140 S60")
+
+        self.assertIsNotNone(trigger.gcode_regex)
+        self.assertEqual(self.effects(queue), ["short", "short"])
+
+    def test_regex_not_combined(self):
+        queue, trigger = self.create_trigger(
+            [
+                rule("regex", "[", "invalid"),
+                rule("regex", "M(1)0\\1", "backreference"),
+                rule("regex", "M", "any"),
+            ]
+        )
+        self.assertIsNone(trigger.gcode_regex)
+
+        trigger.on_gcode_command("M101", "M101")
+        trigger.on_gcode_command("M104", "M104")
+
+        self.assertEqual(self.effects(queue), ["backreference", "any"])
+
+    def test_gcodes(self):
+        queue, trigger = self.create_trigger(
+            [rule("gcode", "M106", "fan"), rule("exact", "M117 Layer 5", "layer")]
+        )
+        self.assertEqual(trigger.gcodes, frozenset(["M106", "M117"]))
+
+        queue, trigger = self.create_trigger(
+            [rule("gcode", "M106", "fan"), rule("regex", "M10[49]", "heat")]
+        )
+        # Regex rules could match any line
+        self.assertIsNone(trigger.gcodes)
@@ -55,6 +55,27 @@ class WS281xUtilTestCase(unittest.TestCase):
         for test_case, test_result in tests.items():
             self.assertTupleEqual(wheel(test_case), test_result)
 
+    def test_color_correction(self):
+        from octoprint_ws281x_led_status.util import ColorCorrection
+
+        strip_settings = {
+            "adjustment": {"R": 100, "G": 50, "B": 150},
+            "white_override": False,
+            "white_brightness": 50,
+        }
+        color_correction = ColorCorrection(strip_settings)
+        self.assertEqual(color_correction.apply(200, 200, 200), (200, 100, 255, 0))
+        self.assertEqual(color_correction.apply(255, 255, 255), (255, 127, 255, 0))
+        self.assertEqual(color_correction.gamma, list(range(256)))
+
+        strip_settings["white_override"] = True
+        strip_settings["gamma"] = 2.2
+        color_correction = ColorCorrection(strip_settings)
+        self.assertEqual(color_correction.apply(255, 255, 255), (0, 0, 0, 127))
+        self.assertEqual(color_correction.gamma[0], 0)
+        self.assertEqual(color_correction.gamma[128], 56)
+        self.assertEqual(color_correction.gamma[255], 255)
+
     # def test_basic_system_command(self):
     #     expected_stdout = "pi : pi adm tty dialout cdrom sudo audio video plugdev games users input netdev spi i2c gpio"
     #     self.check_sys_command(
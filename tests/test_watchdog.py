@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, unicode_literals
+
+__author__ = "Charlie Powell <cp2004.github@gmail.com"
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (c) Charlie Powell 2020-2021 - released under the terms of the AGPLv3 License"
+
+import threading
+import unittest
+
+
+class MockProcess:
+    def __init__(self):
+        self.alive = True
+        self.exitcode = None
+        self.terminated = False
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+        self.alive = False
+        self.exitcode = -15
+
+    def join(self, timeout=None):
+        pass
+
+    def exit(self, exitcode=1):
+        self.alive = False
+        self.exitcode = exitcode
+
+
+class Heartbeat:
+    value = 0.0
+
+
+class MockPlugin:
+    def __init__(self):
+        from octoprint_ws281x_led_status.debug_ring import DebugRing
+        from octoprint_ws281x_led_status.watchdog import RunnerWatchdog
+
+        self.debug_ring = DebugRing()
+        self.runner_lock = threading.RLock()
+        self.runner_heartbeat = Heartbeat()
+        self.runner_watchdog = RunnerWatchdog(self)
+        self.current_effect_process = None
+        self.now = 0
+        self.starts = 0
+        self.ui_messages = []
+
+    def start_effect_process(self):
+        self.starts += 1
+        self.current_effect_process = MockProcess()
+        self.runner_watchdog.runner_started(self.now)
+
+    def _send_UI_msg(self, msg_type, payload):
+        self.ui_messages.append((msg_type, payload))
+
+    def check(self, now):
+        self.now = now
+        self.runner_watchdog.check(now)
+
+
+class RunnerWatchdogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.plugin = MockPlugin()
+        self.watchdog = self.plugin.runner_watchdog
+        self.plugin.start_effect_process()
+
+    def test_running(self):
+        self.plugin.runner_heartbeat.value = 1
+        self.plugin.check(5)
+        self.plugin.runner_heartbeat.value = 25
+        self.plugin.check(50)
+
+        self.assertEqual(self.plugin.starts, 1)
+        self.assertEqual(self.watchdog.status(50)["failures"], 0)
+        self.assertEqual(self.plugin.ui_messages, [])
+
+    def test_not_started_yet(self):
+        self.plugin.current_effect_process = None
+        self.plugin.check(100)
+        self.assertEqual(self.plugin.starts, 1)
+
+    def test_exited(self):
+        self.plugin.current_effect_process.exit(1)
+        self.plugin.check(5)
+
+        # First failure is restarted straight away
+        self.assertEqual(self.plugin.starts, 2)
+        status = self.watchdog.status(5)
+        self.assertEqual(status["restarts"], 1)
+        self.assertEqual(status["failures"], 1)
+        self.assertIn("exit code 1", status["last_failure"]["reason"])
+        self.assertIsNone(status["restart_in"])
+        self.assertEqual(self.plugin.ui_messages, [("runner_watchdog", status)])
+
+    def test_backoff(self):
+        # Fails again each time it is restarted, restarts wait 0, 5, 10, 20...
+        restarted = [0]
+        for now in range(1, 39):
+            if self.plugin.current_effect_process.is_alive():
+                self.plugin.current_effect_process.exit(1)
+            starts = self.plugin.starts
+            self.plugin.check(now)
+            if self.plugin.starts > starts:
+                restarted.append(now)
+
+        # Failed at 19 too, waiting until 39
+        self.assertEqual(restarted, [0, 1, 7, 18])
+        self.assertEqual(self.watchdog.status(38)["restart_in"], 1)
+
+    def test_backoff_max(self):
+        self.watchdog.failures = 30
+        self.assertEqual(self.watchdog.backoff(), 600)
+
+    def test_recovered(self):
+        self.watchdog.failures = 3
+        self.plugin.runner_heartbeat.value = 55
+        self.plugin.check(59)
+        self.assertEqual(self.watchdog.failures, 3)
+        self.plugin.check(60)
+        self.assertEqual(self.watchdog.failures, 0)
+
+    def test_hung(self):
+        process = self.plugin.current_effect_process
+        self.plugin.runner_heartbeat.value = 10
+        self.plugin.check(40)
+        self.assertEqual(self.plugin.starts, 1)
+
+        self.plugin.check(41)
+        self.assertTrue(process.terminated)
+        self.assertEqual(self.plugin.starts, 2)
+        self.assertIn(
+            "stopped responding 31 seconds ago",
+            self.watchdog.last_failure["reason"],
+        )
+
+    def test_start_timeout(self):
+        # Never beats
+        self.plugin.check(60)
+        self.assertEqual(self.plugin.starts, 1)
+        self.plugin.check(61)
+        self.assertEqual(self.plugin.starts, 2)
+        self.assertIn("did not finish starting", self.watchdog.last_failure["reason"])